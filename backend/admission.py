@@ -0,0 +1,250 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, FrozenSet, Optional
+
+from logs import get_logger
+from metrics import REGISTRY
+
+log = get_logger("admission")
+
+admission_queue_seconds = REGISTRY.histogram(
+    "admission_queue_seconds", "Time admitted requests waited for an LLM slot.", ["route"])
+admission_rejections = REGISTRY.counter(
+    "admission_rejections", "Requests shed with 429 before doing any work.", ["route", "reason"])
+budget_wait_seconds = REGISTRY.histogram(
+    "llm_budget_wait_seconds", "Time upstream calls waited for a provider concurrency slot.", ["provider"])
+budget_exhausted = REGISTRY.counter(
+    "llm_budget_exhausted", "Upstream calls that gave up waiting for a provider slot.", ["provider"])
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(reason)
+
+
+class BudgetExhausted(Exception):
+    pass
+
+
+# --- PER-CLIENT RATE LIMIT ---
+# One token bucket per client (a configured API key, else IP): `rate` tokens per second, up to `burst`.
+# Requests cost tokens by route, since a /generate is several upstream calls. With a
+# shared state backend the buckets live there, so every worker process enforces one limit.
+class TokenBucketLimiter:
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000, clock: Callable[[], float] = time.monotonic,
+                 state=None):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self.state = state
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # client -> [tokens, updated_at]
+
+    async def take(self, client: str, cost: float) -> float:
+        """Spends `cost` tokens and returns 0, or returns the seconds until they will be available."""
+        # The bucket never holds more than `burst`; a costlier request takes a full bucket instead
+        # of waiting forever.
+        cost = min(cost, self.burst)
+        if self.state is not None:
+            return await self.state.take_tokens(client, cost, self.rate, self.burst)
+        now = self.clock()
+        bucket = self._buckets.pop(client, None) or [self.burst, now]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        self._buckets[client] = bucket  # most recently used last
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / self.rate
+
+    def stats(self) -> dict:
+        if self.state is not None:
+            return {"backend": self.state.name, "rate": self.rate, "burst": self.burst}
+        return {"backend": "memory", "clients": len(self._buckets), "rate": self.rate, "burst": self.burst}
+
+
+# --- CONCURRENCY GATE ---
+# At most `limit` requests run at once; up to `max_queue` more wait, each for at most
+# `max_wait` seconds. Anything beyond that is shed immediately, so an overloaded
+# server answers 429 in milliseconds instead of timing out a minute later.
+class ConcurrencyGate:
+    def __init__(self, limit: int, max_queue: int, max_wait: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_use = 0
+        self.waiting = 0
+        self.service_time = 1.0  # moving average of slot hold time, for Retry-After
+        self.counters = {"admitted": 0, "queued": 0, "queue_full": 0, "queue_timeout": 0}
+
+    def retry_after(self) -> float:
+        return self.service_time * (self.waiting + 1) / self.limit
+
+    @asynccontextmanager
+    async def slot(self):
+        queued = self._semaphore.locked()
+        if queued:
+            if self.waiting >= self.max_queue:
+                self.counters["queue_full"] += 1
+                raise Overloaded("queue_full", self.retry_after())
+            self.counters["queued"] += 1
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            self.counters["queue_timeout"] += 1
+            raise Overloaded("queue_timeout", self.retry_after()) from None
+        finally:
+            self.waiting -= 1
+        self.counters["admitted"] += 1
+        self.in_use += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.in_use -= 1
+            self._semaphore.release()
+            self.service_time = 0.9 * self.service_time + 0.1 * (time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {**self.counters, "in_use": self.in_use, "waiting": self.waiting, "limit": self.limit,
+                "max_queue": self.max_queue, "service_time_s": round(self.service_time, 3)}
+
+
+# --- PROVIDER BUDGETS ---
+# A process-wide cap on concurrent calls to one upstream, so a burst of requests queues
+# here instead of turning into 429s from the provider (and a stampede onto the fallback).
+class ProviderBudget:
+    def __init__(self, name: str, limit: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_use = 0
+        self.waiting = 0
+        self.exhausted = 0
+
+    @classmethod
+    def from_env(cls, name: str) -> "ProviderBudget":
+        # e.g. OPENROUTER_MAX_CONCURRENCY, GEMINI_MAX_CONCURRENCY
+        return cls(name, limit=int(os.environ.get(f"{name.upper()}_MAX_CONCURRENCY", 16)),
+                   max_wait=float(os.environ.get("LLM_BUDGET_MAX_WAIT", 10)))
+
+    @asynccontextmanager
+    async def slot(self):
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            self.exhausted += 1
+            budget_exhausted.inc(provider=self.name)
+            raise BudgetExhausted(f"no {self.name} slot free after {self.max_wait:g}s ({self.limit} in use)") from None
+        finally:
+            self.waiting -= 1
+        budget_wait_seconds.observe(time.monotonic() - started, provider=self.name)
+        self.in_use += 1
+        try:
+            yield
+        finally:
+            self.in_use -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"in_use": self.in_use, "waiting": self.waiting, "limit": self.limit, "exhausted": self.exhausted}
+
+
+# --- ADMISSION CONTROL ---
+class AdmissionController:
+    def __init__(self, costs: Dict[str, float], limiter: Optional[TokenBucketLimiter], gate: Optional[ConcurrencyGate],
+                 api_keys: FrozenSet[str] = frozenset()):
+        self.costs = costs  # path -> tokens; only these paths are admission-controlled
+        self.limiter = limiter
+        self.gate = gate
+        self.api_keys = api_keys
+
+    @classmethod
+    def from_env(cls, costs: Dict[str, float], shared=None) -> "AdmissionController":
+        # ADMISSION_RATE=0 or ADMISSION_MAX_CONCURRENT=0 turns that part off. The rate limit is
+        # global when `shared` state is given; the concurrency gate is always per process.
+        rate = float(os.environ.get("ADMISSION_RATE", 2))
+        limit = int(os.environ.get("ADMISSION_MAX_CONCURRENT", 32))
+        burst = float(os.environ.get("ADMISSION_BURST", 20))
+        limiter = TokenBucketLimiter(rate, burst, state=shared) if rate > 0 else None
+        if limiter is not None and costs and burst < max(costs.values()):
+            log.warning("admission.burst_below_cost", burst=burst, max_cost=max(costs.values()))
+        gate = ConcurrencyGate(limit, int(os.environ.get("ADMISSION_MAX_QUEUE", 64)),
+                               float(os.environ.get("ADMISSION_MAX_WAIT", 10))) if limit > 0 else None
+        # Comma-separated keys issued to clients; only these get a bucket of their own.
+        api_keys = frozenset(k.strip() for k in os.environ.get("ADMISSION_API_KEYS", "").split(",") if k.strip())
+        return cls(costs, limiter, gate, api_keys)
+
+    def client_id(self, scope) -> str:
+        # The app doesn't authenticate, so an arbitrary x-api-key would be a free fresh bucket
+        # per request. Only configured keys count; everyone else is limited by IP.
+        if self.api_keys:
+            for name, value in scope.get("headers", []):
+                if name == b"x-api-key" and value.decode("latin-1") in self.api_keys:
+                    return "key:" + value.decode("latin-1")
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    def stats(self) -> dict:
+        return {"rate_limit": self.limiter.stats() if self.limiter else None,
+                "concurrency": self.gate.stats() if self.gate else None}
+
+
+class AdmissionMiddleware:
+    """Rate limits and queues the configured POST routes; rejects with 429 + Retry-After."""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        cost = self.controller.costs.get(scope.get("path")) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if cost is None:
+            await self.app(scope, receive, send)
+            return
+        route = scope["path"]
+        limiter, gate = self.controller.limiter, self.controller.gate
+        if limiter is not None:
+            try:
+                wait = await limiter.take(self.controller.client_id(scope), cost)
+            except Exception as e:
+                # Shared state unreachable: serve the request rather than fail it.
+                log.warning("admission.limiter_unavailable", error=str(e))
+                wait = 0.0
+            if wait > 0:
+                await self._reject(send, route, "rate_limited", wait)
+                return
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+        queued_at = time.perf_counter()
+        try:
+            async with gate.slot():
+                admission_queue_seconds.observe(time.perf_counter() - queued_at, route=route)
+                await self.app(scope, receive, send)  # streams hold the slot until their last byte
+        except Overloaded as e:
+            await self._reject(send, route, e.reason, e.retry_after)
+
+    @staticmethod
+    async def _reject(send, route: str, reason: str, retry_after: float):
+        admission_rejections.inc(route=route, reason=reason)
+        log.warning("admission.rejected", route=route, reason=reason, retry_after_s=round(retry_after, 2))
+        body = json.dumps({"detail": f"Too many requests ({reason.replace('_', ' ')}). Retry later."}).encode()
+        await send({"type": "http.response.start", "status": 429, "headers": [
+            (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode())]})
+        await send({"type": "http.response.body", "body": body})
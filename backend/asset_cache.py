@@ -0,0 +1,179 @@
+import os
+import hashlib
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Optional
+
+
+# --- MEDIA ASSET CACHE ---
+# Content-addressed files on local disk, shared by every render worker:
+#   search/      Pexels search responses (JSON, with a TTL)
+#   files/       downloaded source clips, keyed on Pexels video id + resolution
+#   normalized/  clips already converted to 1080x1920 @ 24fps
+#   tts/         synthesized narration, keyed on text + language + voice (see tts.py)
+# Writes go through a temp file + os.replace so readers never see partial files.
+# A render "leases" the files it uses; cleanup never evicts a leased file.
+NAMESPACES = ("search", "files", "normalized", "tts")
+
+
+class AssetCache:
+    def __init__(self, root: str, max_bytes: int = 2 * 1024**3, search_ttl: float = 24 * 3600,
+                 lease_max_age: float = 6 * 3600):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.search_ttl = search_ttl
+        self.lease_max_age = lease_max_age
+        self.leases_dir = self.root / "leases"
+        for namespace in NAMESPACES:
+            (self.root / namespace).mkdir(parents=True, exist_ok=True)
+        self.leases_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, default_root: str) -> "AssetCache":
+        return cls(os.environ.get("ASSET_CACHE_DIR", default_root),
+                   max_bytes=int(os.environ.get("ASSET_CACHE_MAX_BYTES", 2 * 1024**3)),
+                   search_ttl=float(os.environ.get("ASSET_CACHE_SEARCH_TTL", 24 * 3600)))
+
+    @staticmethod
+    def digest(*parts: Any) -> str:
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+    def path_for(self, namespace: str, name: str) -> Path:
+        return self.root / namespace / name
+
+    # --- search results ---
+    def get_search(self, query: str) -> Optional[Any]:
+        path = self.path_for("search", f"{self.digest(query.strip().lower())}.json")
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if entry.get("expires_at", 0) <= time.time():
+            return None
+        self._touch(path)
+        return entry["data"]
+
+    def put_search(self, query: str, data: Any):
+        path = self.path_for("search", f"{self.digest(query.strip().lower())}.json")
+        tmp_path = self._temp_path(path)
+        tmp_path.write_text(json.dumps({"query": query, "expires_at": time.time() + self.search_ttl, "data": data}), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    # --- media files ---
+    def get_file(self, namespace: str, name: str) -> Optional[Path]:
+        path = self.path_for(namespace, name)
+        if not path.exists():
+            return None
+        self._touch(path)
+        return path
+
+    def temp_path_for(self, namespace: str, name: str) -> Path:
+        return self._temp_path(self.path_for(namespace, name))
+
+    def commit_file(self, tmp_path: Path, namespace: str, name: str) -> Path:
+        path = self.path_for(namespace, name)
+        os.replace(tmp_path, path)
+        return path
+
+    @contextmanager
+    def lease(self, path: Path):
+        # Pins `path` against eviction for as long as the block runs, across processes.
+        lease_path = self.leases_dir / f"{self.digest(str(path))}.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+        lease_path.write_text(str(path), encoding="utf-8")
+        try:
+            yield path
+        finally:
+            try: lease_path.unlink()
+            except FileNotFoundError: pass
+
+    # --- eviction ---
+    def cleanup(self) -> dict:
+        """Evict least recently used files until the cache fits its byte budget. Safe to run during renders."""
+        now = time.time()
+        pinned = self._live_leases(now)
+        entries, total = [], 0
+        for namespace in NAMESPACES:
+            for path in (self.root / namespace).iterdir():
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if ".tmp-" in path.name:
+                    # Orphaned partial writes from a crashed worker.
+                    if now - stat.st_mtime > self.lease_max_age:
+                        self._remove(path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        evicted, freed = 0, 0
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if str(path) in pinned or self._claimed_since(path, mtime):
+                continue
+            if self._remove(path):
+                total -= size
+                freed += size
+                evicted += 1
+        return {"bytes": total, "evicted": evicted, "freed_bytes": freed, "pinned": len(pinned)}
+
+    def _live_leases(self, now: float) -> set:
+        pinned = set()
+        for lease_path in self.leases_dir.iterdir():
+            try:
+                pid = int(lease_path.name.split(".")[1])
+                stale = now - lease_path.stat().st_mtime > self.lease_max_age or not _pid_alive(pid)
+                if stale:
+                    self._remove(lease_path)
+                else:
+                    pinned.add(lease_path.read_text(encoding="utf-8"))
+            except (ValueError, IndexError, FileNotFoundError):
+                continue
+        return pinned
+
+    def _claimed_since(self, path: Path, mtime: float) -> bool:
+        # A render may have looked the file up (touching it) or leased it after the scan above;
+        # check again right before deleting rather than trusting the snapshot.
+        if any(self.leases_dir.glob(f"{self.digest(str(path))}.*")):
+            return True
+        try:
+            return path.stat().st_mtime > mtime
+        except FileNotFoundError:
+            return True
+
+    def _temp_path(self, path: Path) -> Path:
+        # Keep the real extension last: ffmpeg picks the container format from it.
+        return path.with_name(f"{path.stem}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}{path.suffix}")
+
+    @staticmethod
+    def _touch(path: Path):
+        # mtime doubles as the LRU clock (atime is unreliable on noatime mounts).
+        try: os.utime(path)
+        except FileNotFoundError: pass
+
+    @staticmethod
+    def _remove(path: Path) -> bool:
+        try:
+            path.unlink()
+            return True
+        except (FileNotFoundError, PermissionError):
+            # PermissionError: file still open by a reader on Windows; try again next sweep.
+            return False
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        # os.kill(pid, 0) sends CTRL_C on Windows; fall back to the lease age limit there.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+from benchmarks.harness import import_app, percentile
+from benchmarks.mock_openrouter import MockOpenRouter
+
+# Usage (from backend/):  python -m benchmarks.bench_batch_mode --versions 3 --rounds 20
+
+
+async def run_mode(main, server: MockOpenRouter, batch_mode: bool, num_versions: int, rounds: int):
+    server.reset_stats()
+    latencies, returned = [], 0
+    body = {"idea": "Launching a reusable coffee cup", "platform": "LinkedIn", "tone": "upbeat", "creativity": 50,
+            "formality": 50, "smart_emojis": True, "auto_hashtag": True, "contextual_suggestions": False,
+            "num_versions": num_versions, "batch_mode": batch_mode, "bypass_cache": True}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            response = await client.post("/generate", json=body)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+            returned += len(response.json()["versions"])
+    stats = server.stats()
+    return {
+        "mode": "batched" if batch_mode else "fan-out",
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "upstream_calls": stats["requests_served"] / rounds,
+        "prompt_tokens": stats["prompt_tokens"] / rounds,
+        "completion_tokens": stats["completion_tokens"] / rounds,
+        "versions": returned / rounds,
+    }
+
+
+async def main_async():
+    parser = argparse.ArgumentParser(description="Token usage and latency: one batched completion vs N fan-out calls.")
+    parser.add_argument("--versions", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Base mock latency per call (s).")
+    parser.add_argument("--per-token-latency", type=float, default=0.002, help="Mock seconds per completion token.")
+    parser.add_argument("--batch-shortfall", type=int, default=0, help="Versions the mock drops from batched answers.")
+    args = parser.parse_args()
+
+    async with MockOpenRouter(latency=args.latency, jitter=0.0, per_token_latency=args.per_token_latency,
+                              batch_shortfall=args.batch_shortfall) as server:
+        main = import_app(server.base_url)
+        async with main.lifespan(main.app):
+            results = [await run_mode(main, server, batch, args.versions, args.rounds) for batch in (False, True)]
+
+    print(f"{'mode':<8} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8} {'calls':>6} {'prompt tok':>11} {'compl tok':>10} {'versions':>9}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['mean_ms']:>8.1f} {r['upstream_calls']:>6.1f} "
+              f"{r['prompt_tokens']:>11.0f} {r['completion_tokens']:>10.0f} {r['versions']:>9.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+from benchmarks.harness import import_app, percentile
+
+# Usage (from backend/):  python -m benchmarks.bench_delivery --seconds 30 --seeks 200
+# Encodes a 1080x1920 test video with and without faststart, plus the preview variant, then
+# reports how many bytes a player must fetch before playback can start (everything up to the
+# end of the moov atom) and the latency of seek-style Range requests through /videos.
+
+def encode(dest: Path, seconds: float, faststart: bool):
+    from imageio_ffmpeg import get_ffmpeg_exe
+    from video_delivery import FASTSTART_ARGS
+    subprocess.run([get_ffmpeg_exe(), "-y", "-loglevel", "error", "-f", "lavfi",
+                    "-i", f"testsrc2=size=1080x1920:rate=24:duration={seconds}", "-f", "lavfi",
+                    "-i", f"sine=frequency=440:duration={seconds}", "-c:v", "libx264", "-preset", "ultrafast",
+                    "-pix_fmt", "yuv420p", "-c:a", "aac", *(FASTSTART_ARGS if faststart else []), str(dest)], check=True)
+
+
+def bytes_before_playback(path: Path) -> int:
+    # Top-level MP4 boxes are [size:4][type:4]...; playback needs the moov box in hand.
+    offset, data = 0, path.read_bytes()
+    while offset + 8 <= len(data):
+        size, kind = int.from_bytes(data[offset:offset + 4], "big"), data[offset + 4:offset + 8]
+        if size == 1:
+            size = int.from_bytes(data[offset + 8:offset + 16], "big")
+        if kind == b"moov":
+            return offset + size
+        if size == 0:
+            break
+        offset += size
+    return len(data)
+
+
+async def seek_latencies(main, name: str, size: int, seeks: int, chunk: int) -> list:
+    transport = httpx.ASGITransport(app=main.app)
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(seeks):
+            start = random.randrange(0, max(1, size - chunk))
+            began = time.perf_counter()
+            response = await client.get(f"/videos/{name}", headers={"Range": f"bytes={start}-{start + chunk - 1}"})
+            latencies.append(time.perf_counter() - began)
+            assert response.status_code == 206, response.status_code
+    return latencies
+
+
+async def main_async():
+    parser = argparse.ArgumentParser(description="Faststart, preview size and Range-request latency for rendered videos.")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--seeks", type=int, default=200)
+    parser.add_argument("--chunk", type=int, default=256 * 1024, help="Bytes per Range request.")
+    args = parser.parse_args()
+
+    main = import_app("http://127.0.0.1:9")  # only the /videos route is exercised; no upstream calls
+    from video_delivery import PreviewSettings, render_preview
+    job_id = str(uuid.uuid4())
+    final = main.VIDEO_DIR / f"{job_id}_final.mp4"
+    preview = main.VIDEO_DIR / f"{job_id}_preview.mp4"
+    scratch = Path(tempfile.mkdtemp(prefix="bench-delivery-"))
+    try:
+        plain = scratch / "plain.mp4"
+        encode(plain, args.seconds, faststart=False)
+        main.VIDEO_DIR.mkdir(parents=True, exist_ok=True)
+        encode(final, args.seconds, faststart=True)
+        began = time.perf_counter()
+        render_preview(str(final), str(preview), PreviewSettings.from_env())
+        preview_s = time.perf_counter() - began
+
+        print(f"\n{'file':<22} {'size MB':>8} {'bytes before playback':>22}")
+        for label, path in (("without faststart", plain), ("with faststart", final), ("preview", preview)):
+            print(f"{label:<22} {path.stat().st_size / 1e6:>8.2f} {bytes_before_playback(path):>22,}")
+        print(f"preview encode: {preview_s:.2f}s for {args.seconds:g}s of video")
+
+        latencies = await seek_latencies(main, final.name, final.stat().st_size, args.seeks, args.chunk)
+        print(f"Range {args.chunk // 1024} KiB x {args.seeks}: p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+              f"p95 {percentile(latencies, 95) * 1000:.2f} ms")
+    finally:
+        final.unlink(missing_ok=True)
+        preview.unlink(missing_ok=True)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
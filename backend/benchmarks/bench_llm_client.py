@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+from llm_client import ProviderConfig, create_http_client, openrouter_chat
+from benchmarks.harness import percentile
+from benchmarks.mock_openrouter import MockOpenRouter
+
+# Usage (from backend/):  python -m benchmarks.bench_llm_client --requests 300 --concurrency 30
+
+
+async def run_mode(mode: str, server: MockOpenRouter, total: int, concurrency: int, config: ProviderConfig):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    shared_client = create_http_client(config) if mode == "pooled" else None
+    connections_before = server.connections_opened
+
+    async def one_call():
+        async with semaphore:
+            start = time.perf_counter()
+            if shared_client is not None:
+                await openrouter_chat(shared_client, server.base_url, "bench-key", "mock/model", "hello")
+            else:
+                # The old behaviour: a throwaway client (and connection) per call.
+                async with httpx.AsyncClient() as client:
+                    await openrouter_chat(client, server.base_url, "bench-key", "mock/model", "hello")
+            latencies.append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    try:
+        await asyncio.gather(*(one_call() for _ in range(total)))
+    finally:
+        if shared_client is not None:
+            await shared_client.aclose()
+    wall = time.perf_counter() - wall_start
+    return {
+        "mode": mode,
+        "requests": total,
+        "wall_s": wall,
+        "rps": total / wall,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "connections": server.connections_opened - connections_before,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Per-request vs pooled LLM client against a local mock OpenRouter.")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock completion latency in seconds.")
+    parser.add_argument("--connect-delay", type=float, default=0.03, help="Simulated TLS handshake per new connection.")
+    args = parser.parse_args()
+
+    config = ProviderConfig(name="openrouter", http2=False)
+    async with MockOpenRouter(latency=args.latency, connect_delay=args.connect_delay) as server:
+        results = [await run_mode(mode, server, args.requests, args.concurrency, config) for mode in ("per-request", "pooled")]
+
+    print(f"{'mode':<12} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8} {'conns':>6}")
+    for r in results:
+        print(f"{r['mode']:<12} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['mean_ms']:>8.1f} {r['connections']:>6}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
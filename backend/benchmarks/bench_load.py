@@ -0,0 +1,251 @@
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.harness import BACKEND_DIR, free_port, percentile
+from benchmarks.mock_gemini import MockGemini
+from benchmarks.mock_openrouter import MockOpenRouter, add_llm_mock_arguments, llm_mock_options
+from benchmarks.mock_pexels import DEFAULT_SAMPLE_DIR, MockPexels, ensure_samples
+
+# Usage (from backend/):  python -m benchmarks.bench_load --requests 100 --concurrency 20
+#   python -m benchmarks.bench_load --endpoints generate --error-rate 0.1 --malformed-rate 0.05
+#   python -m benchmarks.bench_load --endpoints video --video-requests 6
+# Fully offline: OpenRouter, Gemini and Pexels are local stubs, TTS uses the silence backend.
+# The app runs as a real uvicorn subprocess; memory is its RSS (and its render workers'),
+# sampled from /proc, so the driver and stubs in this process don't count.
+
+ENDPOINTS = ("generate", "refine", "humanize", "video")
+BASE_BODY = {"platform": "LinkedIn", "tone": "upbeat", "creativity": 50, "formality": 50, "smart_emojis": True,
+             "auto_hashtag": True, "contextual_suggestions": False}
+VIDEO_SCRIPT = "Meet the cup that keeps coffee hot all day. Refill it, reuse it, love it."
+
+
+def request_for(endpoint: str, i: int, identical: bool, bypass_cache: bool):
+    idea = "Launching a reusable coffee cup" + ("" if identical else f" #{i}")
+    if endpoint == "generate":
+        return "/generate", {**BASE_BODY, "idea": idea, "bypass_cache": bypass_cache}
+    if endpoint == "refine":
+        return "/refine", {**BASE_BODY, "idea": idea, "bypass_cache": bypass_cache, "original_content": "Our new cup is here.",
+                           "refinement_instruction": "Make it punchier."}
+    if endpoint == "humanize":
+        return "/humanize", {"text": f"{idea}: it keeps coffee hot for six hours.", "bypass_cache": bypass_cache}
+    return "/generate-video", {"script": VIDEO_SCRIPT, "idea": idea}
+
+
+# --- MEMORY SAMPLING ---
+def _rss_kib(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            return next(int(line.split()[1]) for line in status if line.startswith("VmRSS:"))
+    except (OSError, StopIteration):
+        return 0
+
+def _children(pid: int) -> List[int]:
+    children = []
+    for task in Path(f"/proc/{pid}/task").glob("*/children"):
+        try:
+            children += [int(child) for child in task.read_text().split()]
+        except OSError:
+            pass
+    return children
+
+class MemorySampler:
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.available = Path(f"/proc/{pid}/status").exists()
+        self.reset()
+
+    def reset(self):
+        self.peak_api_mb = self.peak_total_mb = 0.0
+
+    def sample(self):
+        api = _rss_kib(self.pid)
+        total, stack = api, _children(self.pid)
+        while stack:
+            child = stack.pop()
+            total += _rss_kib(child)
+            stack += _children(child)
+        self.peak_api_mb = max(self.peak_api_mb, api / 1024)
+        self.peak_total_mb = max(self.peak_total_mb, total / 1024)
+
+    async def run(self):
+        while self.available:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+
+# --- LOAD PHASES ---
+async def run_llm_phase(client: httpx.AsyncClient, endpoint: str, total: int, concurrency: int, args) -> dict:
+    latencies, errors = [], {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        path, body = request_for(endpoint, i, args.identical, not args.use_cache)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            if status.startswith("2"):
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[status] = errors.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return summarize(endpoint, latencies, errors, time.perf_counter() - start)
+
+
+async def run_video_phase(client: httpx.AsyncClient, total: int, concurrency: int, args, created: List[str]) -> dict:
+    # Latency is submit -> job done (queueing, rendering and all), polled like the frontend does.
+    latencies, errors = [], {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        path, body = request_for("video", i, args.identical, True)
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(path, json=body)
+            if response.status_code != 202:
+                errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                return
+            job_id = response.json()["job_id"]
+            while True:
+                await asyncio.sleep(0.25)
+                job = (await client.get(f"/jobs/{job_id}")).json()
+                if job["status"] in ("done", "failed"):
+                    break
+            if job["status"] == "done":
+                latencies.append(time.perf_counter() - start)
+                created.append(job["video_url"])
+            else:
+                errors["job failed"] = errors.get("job failed", 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return summarize("video", latencies, errors, time.perf_counter() - start)
+
+
+def summarize(endpoint: str, latencies: List[float], errors: Dict[str, int], wall: float) -> dict:
+    return {"endpoint": endpoint, "ok": len(latencies), "errors": errors, "wall_s": wall,
+            "rps": len(latencies) / wall if wall else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000}
+
+
+# --- APP PROCESS ---
+def start_app(port: int, env: Dict[str, str], extra_args: Optional[List[str]] = None) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning", *(extra_args or [])]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **env})
+
+async def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"App exited during startup with code {process.returncode}.")
+            try:
+                if (await client.get("/cache/stats")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError("App did not become ready.")
+
+def stop_app(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def main_async():
+    parser = argparse.ArgumentParser(description="Offline end-to-end load test: RPS, latency percentiles and memory per endpoint.")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"Comma-separated subset of {ENDPOINTS}.")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per LLM endpoint.")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--video-requests", type=int, default=4)
+    parser.add_argument("--video-concurrency", type=int, default=2)
+    parser.add_argument("--identical", action="store_true", help="Send the same idea every time (exercises coalescing).")
+    parser.add_argument("--use-cache", action="store_true", help="Let the response cache answer repeats.")
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="Fallback stub latency (s); it never fails.")
+    parser.add_argument("--pexels-latency", type=float, default=0.1)
+    parser.add_argument("--encoder-preset", default="ultrafast")
+    add_llm_mock_arguments(parser, latency=0.3)
+    args = parser.parse_args()
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {sorted(unknown)}")
+
+    samples = ensure_samples(DEFAULT_SAMPLE_DIR) if "video" in endpoints else []
+    data_dir = Path(tempfile.mkdtemp(prefix="bench-load-"))
+    created_videos: List[str] = []
+    async with MockOpenRouter(**llm_mock_options(args)) as openrouter, \
+            MockGemini(latency=args.gemini_latency, jitter=args.jitter, per_token_latency=args.per_token_latency) as gemini, \
+            MockPexels(samples, latency=args.pexels_latency) as pexels:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        app = start_app(port, {
+            "OPENROUTER_API_KEY": "bench-key", "OPENROUTER_API_BASE": openrouter.base_url,
+            "GEMINI_API_KEY": "bench-key", "GEMINI_API_BASE": gemini.base_url,
+            "PEXELS_API_KEY": "bench-key", "PEXELS_API_BASE": pexels.origin,
+            "TTS_BACKEND": "silence", "APP_DATA_DIR": str(data_dir), "VIDEO_ENCODER_PRESET": args.encoder_preset,
+            "ADMISSION_RATE": "0",  # one client IP sends everything; measure the app, not the limiter
+            "LOG_LEVEL": os.environ.get("LOG_LEVEL", "ERROR"),  # injected failures would flood WARNING
+        })
+        sampler = MemorySampler(app.pid)
+        sampler_task = asyncio.create_task(sampler.run())
+        results = []
+        try:
+            await wait_until_ready(base_url, app)
+            idle_mb = sampler.peak_api_mb
+            limits = httpx.Limits(max_connections=max(args.concurrency, args.video_concurrency) + 4)
+            async with httpx.AsyncClient(base_url=base_url, timeout=600, limits=limits) as client:
+                for endpoint in endpoints:
+                    sampler.reset()
+                    openrouter.reset_stats()
+                    gemini.reset_stats()
+                    if endpoint == "video":
+                        result = await run_video_phase(client, args.video_requests, args.video_concurrency, args, created_videos)
+                    else:
+                        result = await run_llm_phase(client, endpoint, args.requests, args.concurrency, args)
+                    result.update(peak_api_mb=sampler.peak_api_mb, peak_total_mb=sampler.peak_total_mb,
+                                  upstream=openrouter.requests_served, fallback=gemini.requests_served,
+                                  injected=openrouter.errors_injected + openrouter.malformed_injected)
+                    results.append(result)
+        finally:
+            sampler_task.cancel()
+            stop_app(app)
+            for url in created_videos:
+                (BACKEND_DIR / url.lstrip("/")).unlink(missing_ok=True)
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    print(f"\nlatency: {args.latency_distribution} mean {args.latency}s, error rate {args.error_rate}, "
+          f"malformed rate {args.malformed_rate}; app idle RSS {idle_mb:.0f} MB")
+    print(f"{'endpoint':<9} {'ok':>5} {'errors':<14} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'api MB':>7} {'total MB':>9} {'upstream':>9} {'fallback':>9} {'injected':>9}")
+    for r in results:
+        errors = ",".join(f"{k}:{v}" for k, v in sorted(r["errors"].items())) or "-"
+        print(f"{r['endpoint']:<9} {r['ok']:>5} {errors:<14} {r['rps']:>7.2f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['peak_api_mb']:>7.0f} {r['peak_total_mb']:>9.0f} {r['upstream']:>9} "
+              f"{r['fallback']:>9} {r['injected']:>9}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
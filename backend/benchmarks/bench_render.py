@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from imageio_ffmpeg import get_ffmpeg_exe
+
+from benchmarks.harness import BACKEND_DIR
+
+# Usage (from backend/):  python -m benchmarks.bench_render --clips 4 --clip-seconds 6 --repeat 3 [--normalized]
+# --normalized renders from clips already in the asset cache's 1080x1920 @ 24fps form (the warm-cache path).
+# Each render runs in a fresh interpreter so peak RSS is per engine, not cumulative.
+
+
+def make_sample_media(work_dir: Path, clips: int, clip_seconds: float, size: str, audio_seconds: float):
+    # Landscape test patterns, like most Pexels results: both engines have to scale and crop them.
+    paths = []
+    for i in range(clips):
+        path = work_dir / f"clip{i}.mp4"
+        subprocess.run([get_ffmpeg_exe(), "-y", "-loglevel", "error", "-f", "lavfi",
+                        "-i", f"testsrc2=size={size}:rate=30:duration={clip_seconds}",
+                        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", str(path)], check=True)
+        paths.append(path)
+    audio_path = work_dir / "narration.wav"
+    subprocess.run([get_ffmpeg_exe(), "-y", "-loglevel", "error", "-f", "lavfi",
+                    "-i", f"sine=frequency=220:duration={audio_seconds}", str(audio_path)], check=True)
+    return paths, audio_path
+
+
+def _max_rss_mb(who) -> float:
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / 1024**2 if sys.platform == "darwin" else rss / 1024  # bytes on macOS, KiB elsewhere
+
+
+def worker(engine: str, clip_paths, audio_path: str, output_path: str, preset: str, threads: int, normalized: bool):
+    import video_pipeline as vp
+
+    sources = [(Path(path), normalized) for path in clip_paths]
+    start = time.perf_counter()
+    if engine == "ffmpeg":
+        vp.compose_with_ffmpeg(sources, Path(audio_path), output_path, preset, threads)
+    else:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            vp.compose_with_moviepy(sources, Path(audio_path), output_path, preset, threads, pool)
+    wall = time.perf_counter() - start
+    # RUSAGE_CHILDREN is the largest single descendant (ffmpeg), not a sum.
+    print(json.dumps({"wall_s": wall, "python_rss_mb": _max_rss_mb(resource.RUSAGE_SELF),
+                      "child_rss_mb": _max_rss_mb(resource.RUSAGE_CHILDREN)}))
+
+
+def run_once(engine: str, clip_paths, audio_path: Path, output_path: Path, preset: str, threads: int,
+             normalized: bool) -> dict:
+    command = [sys.executable, "-m", "benchmarks.bench_render", "--worker", engine, "--audio", str(audio_path),
+               "--output", str(output_path), "--preset", preset, "--threads", str(threads),
+               *(["--normalized"] if normalized else []), *[str(path) for path in clip_paths]]
+    result = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render time and peak RSS: ffmpeg filter graph vs moviepy.")
+    parser.add_argument("--clips", type=int, default=4)
+    parser.add_argument("--clip-seconds", type=float, default=6)
+    parser.add_argument("--size", default="1920x1080", help="Source clip resolution.")
+    parser.add_argument("--audio-seconds", type=float, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--preset", default="medium")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--engines", default="ffmpeg,moviepy")
+    parser.add_argument("--normalized", action="store_true", help="Pre-normalize the clips (not timed).")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--audio", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.paths, args.audio, args.output, args.preset, args.threads, args.normalized)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        print(f"Generating {args.clips} x {args.clip_seconds}s {args.size} clips and {args.audio_seconds}s of audio...")
+        clip_paths, audio_path = make_sample_media(work_dir, args.clips, args.clip_seconds, args.size, args.audio_seconds)
+        if args.normalized:
+            from video_pipeline import normalize_clip
+            normalized_paths = [path.with_name(f"{path.stem}_1080x1920_24fps.mp4") for path in clip_paths]
+            for source, dest in zip(clip_paths, normalized_paths):
+                normalize_clip(str(source), str(dest))
+            clip_paths = normalized_paths
+        results = {}
+        for engine in args.engines.split(","):
+            runs = [run_once(engine, clip_paths, audio_path, work_dir / f"{engine}_{i}.mp4", args.preset, args.threads,
+                             args.normalized) for i in range(args.repeat)]
+            results[engine] = runs
+
+    print(f"\n{'engine':<8} {'median s':>9} {'min s':>7} {'python RSS MB':>14} {'ffmpeg RSS MB':>14}")
+    for engine, runs in results.items():
+        walls = [r["wall_s"] for r in runs]
+        print(f"{engine:<8} {statistics.median(walls):>9.2f} {min(walls):>7.2f} "
+              f"{max(r['python_rss_mb'] for r in runs):>14.1f} {max(r['child_rss_mb'] for r in runs):>14.1f}")
+
+
+if __name__ == "__main__":
+    os.chdir(BACKEND_DIR)
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.bench_load import MemorySampler, start_app, stop_app, wait_until_ready
+from benchmarks.harness import BACKEND_DIR, free_port
+
+# Usage (from backend/):  python -m benchmarks.bench_startup --rounds 5
+#   python -m benchmarks.bench_startup --modules main,video_pipeline --top 15
+# Imports each module in a fresh interpreter under `-X importtime` and reports wall time,
+# peak RSS, module count, which heavy dependencies got loaded, and the slowest direct
+# imports. Then boots the API under uvicorn and times it to the first answered request.
+
+HEAVY = ("google.generativeai", "grpc", "moviepy", "numpy", "imageio", "gtts")
+ENV = {"OPENROUTER_API_KEY": "bench-key", "GEMINI_API_KEY": "bench-key"}
+PROBE = ("import json, resource, sys, time; t = time.perf_counter(); import {module}; "
+         "print(json.dumps({{'import_s': time.perf_counter() - t, "
+         "'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 'modules': len(sys.modules), "
+         "'heavy': [m for m in {heavy!r} if m in sys.modules]}}))")
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def direct_imports(stderr: str, module: str) -> Dict[str, float]:
+    """Cumulative seconds of each import made directly by `module`, from -X importtime output."""
+    children: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        depth = len(indent) // 2
+        if depth == 1:
+            children[name] = int(cumulative) / 1e6
+        elif depth == 0:
+            if name == module:
+                return children
+            children = {}
+    return {}
+
+
+def profile_import(module: str, rounds: int) -> dict:
+    runs, stderr = [], ""
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, heavy=HEAVY)],
+                                cwd=BACKEND_DIR, env={**os.environ, **ENV}, capture_output=True, text=True, check=True)
+        runs.append({**json.loads(result.stdout.strip().splitlines()[-1]), "wall_s": time.perf_counter() - start})
+        stderr = result.stderr
+    return {"module": module, "wall_s": statistics.median(r["wall_s"] for r in runs),
+            "import_s": statistics.median(r["import_s"] for r in runs),
+            "rss_mb": statistics.median(r["rss_mb"] for r in runs), "modules": runs[-1]["modules"],
+            "heavy": runs[-1]["heavy"], "children": direct_imports(stderr, module)}
+
+
+async def time_to_ready(rounds: int) -> List[dict]:
+    # Process start -> first request answered, with the RSS of an idle text-only worker.
+    results = []
+    for _ in range(rounds):
+        data_dir = tempfile.mkdtemp(prefix="bench-startup-")
+        port = free_port()
+        start = time.perf_counter()
+        app = start_app(port, {**ENV, "APP_DATA_DIR": data_dir, "LOG_LEVEL": "ERROR"})
+        try:
+            await wait_until_ready(f"http://127.0.0.1:{port}", app)
+            ready = time.perf_counter() - start
+            sampler = MemorySampler(app.pid)
+            sampler.sample()
+            results.append({"ready_s": ready, "rss_mb": sampler.peak_api_mb})
+        finally:
+            stop_app(app)
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+async def main_async():
+    parser = argparse.ArgumentParser(description="Startup time, import profile and idle memory of the API process.")
+    parser.add_argument("--modules", default="main,video_pipeline", help="Comma-separated modules to import.")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="Slowest direct imports to list per module.")
+    parser.add_argument("--skip-serve", action="store_true", help="Only profile imports; don't boot uvicorn.")
+    args = parser.parse_args()
+
+    for module in [m.strip() for m in args.modules.split(",") if m.strip()]:
+        r = profile_import(module, args.rounds)
+        print(f"\n{module}: process {r['wall_s'] * 1000:.0f} ms, import {r['import_s'] * 1000:.0f} ms, "
+              f"peak RSS {r['rss_mb']:.0f} MB, {r['modules']} modules loaded")
+        print(f"  heavy dependencies loaded: {', '.join(r['heavy']) or 'none'}")
+        for name, seconds in sorted(r["children"].items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {seconds * 1000:>8.1f} ms  {name}")
+
+    if not args.skip_serve:
+        ready = await time_to_ready(args.rounds)
+        print(f"\nuvicorn main:app ready in {statistics.median(r['ready_s'] for r in ready) * 1000:.0f} ms (median of "
+              f"{len(ready)}), idle RSS {statistics.median(r['rss_mb'] for r in ready):.0f} MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
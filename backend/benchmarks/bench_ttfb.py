@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+import uvicorn
+
+from benchmarks.harness import free_port, import_app, percentile
+from benchmarks.mock_openrouter import MockOpenRouter
+
+# Usage (from backend/):  python -m benchmarks.bench_ttfb --rounds 20 --per-token-latency 0.01
+# Serves the app over real HTTP (uvicorn) because ASGITransport buffers whole responses,
+# which would hide exactly the difference being measured.
+
+REFINE_BODY = {"idea": "Launching a reusable coffee cup", "platform": "LinkedIn", "tone": "upbeat", "creativity": 50,
+               "formality": 50, "smart_emojis": True, "auto_hashtag": True, "contextual_suggestions": False,
+               "original_content": "Our new cup is here.", "refinement_instruction": "Make it punchier.",
+               "bypass_cache": True}
+HUMANIZE_BODY = {"text": "Our new reusable cup keeps coffee hot for six hours.", "bypass_cache": True}
+
+
+async def measure(client: httpx.AsyncClient, path: str, body: dict, rounds: int) -> dict:
+    ttfbs, totals = [], []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        async with client.stream("POST", path, json=body) as response:
+            response.raise_for_status()
+            first = None
+            async for chunk in response.aiter_raw():
+                if first is None and chunk:
+                    first = time.perf_counter() - start
+        ttfbs.append(first)
+        totals.append(time.perf_counter() - start)
+    return {"path": path, "ttfb_p50_ms": percentile(ttfbs, 50) * 1000, "ttfb_p95_ms": percentile(ttfbs, 95) * 1000,
+            "total_p50_ms": percentile(totals, 50) * 1000, "total_mean_ms": statistics.fmean(totals) * 1000}
+
+
+async def main_async():
+    parser = argparse.ArgumentParser(description="Client-observed time to first byte: buffered vs streaming endpoints.")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Mock time to first token (s).")
+    parser.add_argument("--per-token-latency", type=float, default=0.01, help="Mock seconds per completion token.")
+    args = parser.parse_args()
+
+    async with MockOpenRouter(latency=args.latency, jitter=0.0, per_token_latency=args.per_token_latency) as mock:
+        main = import_app(mock.base_url)
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+        serve_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+                results = [await measure(client, path, body, args.rounds) for path, body in (
+                    ("/refine", REFINE_BODY), ("/refine/stream", REFINE_BODY),
+                    ("/humanize", HUMANIZE_BODY), ("/humanize/stream", HUMANIZE_BODY))]
+        finally:
+            server.should_exit = True
+            await serve_task
+
+    print(f"{'endpoint':<18} {'ttfb p50':>9} {'ttfb p95':>9} {'total p50':>10} {'total mean':>11}   (ms)")
+    for r in results:
+        print(f"{r['path']:<18} {r['ttfb_p50_ms']:>9.1f} {r['ttfb_p95_ms']:>9.1f} {r['total_p50_ms']:>10.1f} {r['total_mean_ms']:>11.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+from benchmarks.harness import import_app, percentile
+from benchmarks.mock_openrouter import MockOpenRouter
+
+# Usage (from backend/):  python -m benchmarks.bench_virality --rounds 20 --latency 0.3
+# /generate latency and upstream calls per VIRALITY_MODE. "deferred" is the lower bound
+# (no scoring at all); its /score column is what the client pays later, off the critical path.
+
+BODY = {"idea": "Launching a reusable coffee cup", "platform": "LinkedIn", "tone": "upbeat", "creativity": 50,
+        "formality": 50, "smart_emojis": True, "auto_hashtag": True, "contextual_suggestions": False,
+        "num_versions": 3, "bypass_cache": True}
+
+
+async def run_mode(main, server: MockOpenRouter, mode: str, rounds: int, jitter_seed: int) -> dict:
+    main.VIRALITY_MODE = mode
+    server.reset_stats()
+    latencies, score_latencies, scored = [], [], 0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=120) as client:
+        for i in range(rounds):
+            body = {**BODY, "idea": f"{BODY['idea']} #{jitter_seed + i}"}  # distinct prompts: no coalescing across rounds
+            start = time.perf_counter()
+            response = await client.post("/generate", json=body)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+            versions = response.json()["versions"]
+            if mode == "deferred":
+                start = time.perf_counter()
+                scores = await client.post("/score", json={"platform": body["platform"], "bypass_cache": True,
+                                                           "versions": [v["content"] for v in versions]})
+                score_latencies.append(time.perf_counter() - start)
+                versions = scores.json()["scores"]
+            scored += sum(1 for v in versions if v["virality_score"] is not None)
+    return {"mode": mode, "p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000,
+            "mean_ms": statistics.fmean(latencies) * 1000,
+            "score_p50_ms": percentile(score_latencies, 50) * 1000 if score_latencies else None,
+            "calls": server.stats()["requests_served"] / rounds, "scored": scored / rounds}
+
+
+async def main_async():
+    parser = argparse.ArgumentParser(description="/generate latency with pipelined, heuristic and deferred virality scoring.")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Base mock latency per call (s).")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Mock latency jitter (s), so versions finish apart.")
+    args = parser.parse_args()
+
+    async with MockOpenRouter(latency=args.latency, jitter=args.jitter) as server:
+        main = import_app(server.base_url)
+        async with main.lifespan(main.app):
+            results = [await run_mode(main, server, mode, args.rounds, n * args.rounds)
+                       for n, mode in enumerate(("pipelined", "heuristic", "deferred"))]
+
+    print(f"{'mode':<10} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'/score p50':>11} {'calls':>6} {'scored':>7}")
+    for r in results:
+        score_p50 = f"{r['score_p50_ms']:.1f}" if r["score_p50_ms"] is not None else "-"
+        print(f"{r['mode']:<10} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['mean_ms']:>8.1f} {score_p50:>11} "
+              f"{r['calls']:>6.1f} {r['scored']:>7.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+
+from benchmarks.bench_load import MemorySampler, run_llm_phase, stop_app, wait_until_ready
+from benchmarks.harness import BACKEND_DIR, free_port
+from benchmarks.mock_gemini import MockGemini
+from benchmarks.mock_openrouter import MockOpenRouter, add_llm_mock_arguments, llm_mock_options
+
+# Usage (from backend/):  python -m benchmarks.bench_workers --workers 1,2,4 --requests 300 --concurrency 32
+#   python -m benchmarks.bench_workers --shared-state redis://localhost:6379/0
+# Starts serve.py with each worker count against the offline stubs and reports throughput and
+# latency per endpoint, plus speedup over the first worker count. Upstream latency defaults low
+# so the app's own CPU work (JSON, validation, prompt building) is what scales. The driver and
+# stubs share this process; on a machine with few cores they compete with the workers.
+
+LLM_ENDPOINTS = ("generate", "refine", "humanize")
+
+
+def start_server(port: int, workers: int, env: dict, shared_state: str = None) -> subprocess.Popen:
+    command = [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+               *(["--shared-state", shared_state] if shared_state else [])]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **env})
+
+
+async def main_async():
+    parser = argparse.ArgumentParser(description="Throughput and latency of serve.py as the worker count grows.")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts to try.")
+    parser.add_argument("--endpoints", default="humanize,generate", help=f"Comma-separated subset of {LLM_ENDPOINTS}.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint per worker count.")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--shared-state", default=None, help="Passed to serve.py; default is its SQLite file.")
+    add_llm_mock_arguments(parser, latency=0.02)
+    args = parser.parse_args()
+    worker_counts = [int(w) for w in args.workers.split(",") if w.strip()]
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    if set(endpoints) - set(LLM_ENDPOINTS):
+        parser.error(f"unknown endpoints: {sorted(set(endpoints) - set(LLM_ENDPOINTS))}")
+    phase_args = SimpleNamespace(identical=False, use_cache=False)
+
+    results = []
+    async with MockOpenRouter(**llm_mock_options(args)) as openrouter, \
+            MockGemini(latency=args.latency, jitter=args.jitter) as gemini:
+        for workers in worker_counts:
+            data_dir = Path(tempfile.mkdtemp(prefix="bench-workers-"))
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_server(port, workers, {
+                "OPENROUTER_API_KEY": "bench-key", "OPENROUTER_API_BASE": openrouter.base_url,
+                "GEMINI_API_KEY": "bench-key", "GEMINI_API_BASE": gemini.base_url, "APP_DATA_DIR": str(data_dir),
+                "ADMISSION_RATE": "0",  # one client IP sends everything; measure capacity, not the limiter
+                "LOG_LEVEL": os.environ.get("LOG_LEVEL", "ERROR"),
+            }, args.shared_state)
+            sampler = MemorySampler(server.pid)
+            try:
+                await wait_until_ready(base_url, server)
+                await asyncio.sleep(1.0)  # the first worker answering doesn't mean all of them are up
+                limits = httpx.Limits(max_connections=args.concurrency + 4)
+                async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+                    await run_llm_phase(client, "humanize", args.concurrency, args.concurrency, phase_args)  # warm-up
+                    for endpoint in endpoints:
+                        sampler_task = asyncio.create_task(sampler.run())
+                        result = await run_llm_phase(client, endpoint, args.requests, args.concurrency, phase_args)
+                        sampler_task.cancel()
+                        results.append({**result, "workers": workers, "total_mb": sampler.peak_total_mb})
+                        sampler.reset()
+            finally:
+                stop_app(server)
+                shutil.rmtree(data_dir, ignore_errors=True)
+
+    print(f"\nupstream latency {args.latency}s ({args.latency_distribution}), {args.requests} requests per run, "
+          f"concurrency {args.concurrency}, {os.cpu_count()} CPUs")
+    print(f"{'endpoint':<9} {'workers':>7} {'ok':>5} {'errors':<12} {'rps':>8} {'speedup':>8} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'RSS MB':>7}")
+    for endpoint in endpoints:
+        rows = [r for r in results if r["endpoint"] == endpoint]
+        baseline = rows[0]["rps"] if rows and rows[0]["rps"] else None
+        for r in rows:
+            errors = ",".join(f"{k}:{v}" for k, v in sorted(r["errors"].items())) or "-"
+            speedup = f"{r['rps'] / baseline:.2f}x" if baseline else "-"
+            print(f"{endpoint:<9} {r['workers']:>7} {r['ok']:>5} {errors:<12} {r['rps']:>8.1f} {speedup:>8} "
+                  f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['total_mb']:>7.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
@@ -0,0 +1,32 @@
+import os
+import socket
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_app(openrouter_base: str, **env):
+    # main.py reads its keys at import time, so point it at the mock before importing.
+    # One client sends everything, so the per-client rate limit is off unless a caller sets it.
+    os.environ.update({"OPENROUTER_API_KEY": "bench-key", "GEMINI_API_KEY": "bench-key",
+                       "OPENROUTER_API_BASE": openrouter_base, "ADMISSION_RATE": "0", **env})
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    os.chdir(BACKEND_DIR)
+    import main
+    return main
@@ -0,0 +1,59 @@
+import asyncio
+import json
+import re
+
+from benchmarks.mock_http import Reply, Request, StreamReply, serve_forever
+from benchmarks.mock_openrouter import MockOpenRouter, add_llm_mock_arguments, llm_mock_options
+
+
+# --- MOCK GEMINI SERVER ---
+# The Gemini REST API (models/{model}:generateContent and :streamGenerateContent?alt=sse)
+# with the same answers, latency model and failure injection as MockOpenRouter.
+# Point the app at it with GEMINI_API_BASE=<base_url>.
+class MockGemini(MockOpenRouter):
+    @property
+    def base_url(self) -> str:
+        return f"{self.origin}/v1beta"
+
+    async def route(self, request: Request):
+        match = re.fullmatch(r"/v1beta/models/([^/:]+):(generateContent|streamGenerateContent)", request.path)
+        if request.method != "POST" or not match:
+            return Reply("404 Not Found", {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+        payload = request.json()
+        prompt = "".join(part.get("text", "") for content in payload.get("contents", []) for part in content.get("parts", []))
+        if self.inject_error():
+            await asyncio.sleep(self.latency_model.sample() / 2)
+            code = int(self.error_status.split(" ", 1)[0])
+            return Reply(self.error_status, {"error": {"code": code, "message": "Injected upstream failure.", "status": "INTERNAL"}})
+        content, usage, delay = self.next_completion(prompt)
+        if match.group(2) == "streamGenerateContent":
+            return StreamReply(self.stream_chunks(content, usage, delay))
+        await asyncio.sleep(delay + usage["completion_tokens"] * self.per_token_latency)
+        return Reply(body=self.response_body(content, usage, "STOP"))
+
+    @staticmethod
+    def response_body(text: str, usage: dict, finish_reason=None) -> dict:
+        candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+        if finish_reason:
+            candidate["finishReason"] = finish_reason
+        return {"candidates": [candidate],
+                "usageMetadata": {"promptTokenCount": usage["prompt_tokens"], "candidatesTokenCount": usage["completion_tokens"],
+                                  "totalTokenCount": usage["total_tokens"]}}
+
+    async def stream_chunks(self, content: str, usage: dict, delay: float):
+        # Gemini streams larger pieces than OpenRouter; ~8 tokens per event.
+        await asyncio.sleep(delay)
+        for i in range(0, len(content), 32):
+            last = i + 32 >= len(content)
+            yield f"data: {json.dumps(self.response_body(content[i:i + 32], usage, 'STOP' if last else None))}\r\n\r\n"
+            if self.per_token_latency:
+                await asyncio.sleep(self.per_token_latency * 8)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a local mock Gemini REST server.")
+    parser.add_argument("--port", type=int, default=8082)
+    add_llm_mock_arguments(parser)
+    args = parser.parse_args()
+    serve_forever(MockGemini(port=args.port, **llm_mock_options(args)), "Mock Gemini")
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import math
+import random
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Optional, Union
+from urllib.parse import parse_qs, urlsplit
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "pareto")
+
+
+# --- LATENCY MODEL ---
+# How long an upstream takes to answer. Real providers have long tails, so besides
+# uniform jitter there are lognormal (median = mean) and pareto (minimum = mean) shapes.
+@dataclass
+class LatencyModel:
+    mean: float = 0.05
+    jitter: float = 0.02  # uniform: +/- jitter; normal: standard deviation
+    distribution: str = "uniform"
+    sigma: float = 0.5  # lognormal shape
+    alpha: float = 2.5  # pareto shape; lower is a heavier tail
+
+    def __post_init__(self):
+        if self.distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"distribution must be one of {LATENCY_DISTRIBUTIONS}, got {self.distribution!r}")
+
+    def sample(self) -> float:
+        if self.distribution == "fixed":
+            value = self.mean
+        elif self.distribution == "uniform":
+            value = self.mean + random.uniform(-self.jitter, self.jitter)
+        elif self.distribution == "normal":
+            value = random.gauss(self.mean, self.jitter)
+        elif self.distribution == "lognormal":
+            value = random.lognormvariate(math.log(max(self.mean, 1e-6)), self.sigma)
+        else:
+            value = self.mean * random.paretovariate(self.alpha)
+        return max(0.0, value)
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    body: bytes
+
+    def json(self) -> dict:
+        return json.loads(self.body or b"{}")
+
+
+@dataclass
+class Reply:
+    status: str = "200 OK"
+    body: Union[bytes, dict, list] = b""
+    content_type: str = "application/json"
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class StreamReply:
+    # Sent with chunked transfer encoding, one chunk per item, flushed as it is produced.
+    chunks: AsyncIterator[Union[str, bytes]]
+    content_type: str = "text/event-stream"
+
+
+# --- MOCK HTTP SERVER ---
+# A tiny HTTP/1.1 server (keep-alive, chunked streaming) for the offline upstream stubs.
+# It counts TCP connections so connection reuse is visible. Subclasses implement route().
+class MockHTTPServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, connect_delay: float = 0.0):
+        self.host = host
+        self.port = port
+        # Extra delay on every new connection, standing in for the TLS handshake a real provider costs.
+        self.connect_delay = connect_delay
+        self.connections_opened = 0
+        self.requests_served = 0
+        self._server = None
+        self._connections = {}  # writer -> handler task
+
+    @property
+    def origin(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def route(self, request: Request) -> Union[Reply, StreamReply]:
+        raise NotImplementedError
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            # Close idle keep-alive connections and let their handlers finish, rather than
+            # leaving them to be cancelled when the event loop shuts down.
+            for writer in list(self._connections):
+                writer.close()
+            await asyncio.gather(*self._connections.values(), return_exceptions=True)
+            await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def stats(self) -> dict:
+        return {"connections_opened": self.connections_opened, "requests_served": self.requests_served}
+
+    def reset_stats(self):
+        self.connections_opened = self.requests_served = 0
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections_opened += 1
+        self._connections[writer] = asyncio.current_task()
+        try:
+            if self.connect_delay:
+                await asyncio.sleep(self.connect_delay)
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = lines[0].split(" ", 2)
+                headers = {k.strip().lower(): v.strip() for k, v in (l.split(":", 1) for l in lines[1:] if ":" in l)}
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                keep_alive = headers.get("connection", "").lower() != "close"
+                url = urlsplit(target)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                reply = await self.route(Request(method, url.path, query, headers, body))
+                connection = f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                if isinstance(reply, StreamReply):
+                    await self._write_stream(writer, reply, connection)
+                else:
+                    data = reply.body if isinstance(reply.body, bytes) else json.dumps(reply.body).encode()
+                    extra = "".join(f"{k}: {v}\r\n" for k, v in reply.headers.items())
+                    writer.write(f"HTTP/1.1 {reply.status}\r\nContent-Type: {reply.content_type}\r\n"
+                                 f"Content-Length: {len(data)}\r\n{extra}{connection}\r\n".encode() + data)
+                    await writer.drain()
+                self.requests_served += 1
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    @staticmethod
+    async def _write_stream(writer: asyncio.StreamWriter, reply: StreamReply, connection: str):
+        writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: {reply.content_type}\r\nTransfer-Encoding: chunked\r\n"
+                     f"{connection}\r\n".encode())
+        async for item in reply.chunks:
+            data = item.encode() if isinstance(item, str) else item
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+def serve_forever(server: MockHTTPServer, label: Optional[str] = None):
+    # Command-line entry point shared by the stubs: python -m benchmarks.mock_openrouter --port 8081
+    async def main():
+        await server.start()
+        print(f"{label or type(server).__name__} listening on {server.origin}")
+        await asyncio.Event().wait()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
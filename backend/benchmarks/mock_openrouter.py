@@ -0,0 +1,141 @@
+import asyncio
+import json
+import random
+import re
+
+from benchmarks.mock_http import LATENCY_DISTRIBUTIONS, LatencyModel, MockHTTPServer, Reply, Request, StreamReply, serve_forever
+
+
+# --- MOCK OPENROUTER SERVER ---
+# Speaks just enough of the OpenRouter chat-completions API for benchmarks, offline.
+# Answers are shaped by the prompt (single version, batch of versions, virality score).
+# Failure injection: error_rate answers with error_status instead; malformed_rate
+# returns content that is not valid JSON (truncated or wrapped in prose).
+class MockOpenRouter(MockHTTPServer):
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, jitter=0.02, connect_delay=0.0,
+                 per_token_latency=0.0, batch_shortfall=0, latency_distribution="uniform",
+                 error_rate=0.0, error_status="500 Internal Server Error", malformed_rate=0.0, seed=None):
+        super().__init__(host, port, connect_delay)
+        self.latency_model = LatencyModel(mean=latency, jitter=jitter, distribution=latency_distribution)
+        # Seconds per completion token, so longer (e.g. batched) answers take longer like a real model.
+        self.per_token_latency = per_token_latency
+        # Drop this many versions from batched answers to exercise the fan-out fallback.
+        self.batch_shortfall = batch_shortfall
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.errors_injected = 0
+        self.malformed_injected = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.origin}/api/v1"
+
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        # Rough ~4 characters per token, good enough for relative comparisons.
+        return max(1, len(text) // 4)
+
+    def completion_content(self, prompt: str) -> str:
+        if '"virality_score"' in prompt:
+            return json.dumps({"virality_score": 77, "justification": "Mock: strong hook, clear call to action."})
+        version = {
+            "content": "Mock generated post. " * 20,
+            "analysis": {"readability": 80, "engagement_potential": 82, "human_likeness": 85},
+        }
+        batch = re.search(r"the list holds exactly (\d+) objects", prompt)
+        if batch:
+            count = max(0, int(batch.group(1)) - self.batch_shortfall)
+            return json.dumps({"versions": [version] * count})
+        return json.dumps(version)
+
+    def malform(self, content: str) -> str:
+        self.malformed_injected += 1
+        if self.random.random() < 0.5:
+            return content[:max(1, len(content) // 2)]
+        return f"Sure! Here is the JSON you asked for:\n{content}\nLet me know if you need anything else."
+
+    def next_completion(self, prompt: str):
+        # -> (content, usage, delay before the first token)
+        content = self.completion_content(prompt)
+        if self.malformed_rate and self.random.random() < self.malformed_rate:
+            content = self.malform(content)
+        usage = {"prompt_tokens": self.count_tokens(prompt), "completion_tokens": self.count_tokens(content)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        self.prompt_tokens += usage["prompt_tokens"]
+        self.completion_tokens += usage["completion_tokens"]
+        return content, usage, self.latency_model.sample()
+
+    def inject_error(self) -> bool:
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors_injected += 1
+            return True
+        return False
+
+    def error_reply(self) -> Reply:
+        code = int(self.error_status.split(" ", 1)[0])
+        return Reply(self.error_status, {"error": {"code": code, "message": "Injected upstream failure."}})
+
+    def stats(self) -> dict:
+        return {**super().stats(), "prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens,
+                "errors_injected": self.errors_injected, "malformed_injected": self.malformed_injected}
+
+    def reset_stats(self):
+        super().reset_stats()
+        self.prompt_tokens = self.completion_tokens = self.errors_injected = self.malformed_injected = 0
+
+    async def route(self, request: Request):
+        if request.method == "GET" and request.path.endswith("/__stats"):
+            return Reply(body=self.stats())
+        if request.method == "POST" and request.path.endswith("/chat/completions"):
+            payload = request.json()
+            prompt = "".join(m.get("content", "") for m in payload.get("messages", []))
+            if self.inject_error():
+                await asyncio.sleep(self.latency_model.sample() / 2)
+                return self.error_reply()
+            content, usage, delay = self.next_completion(prompt)
+            if payload.get("stream"):
+                return StreamReply(self.stream_completion(content, usage, delay))
+            await asyncio.sleep(delay + usage["completion_tokens"] * self.per_token_latency)
+            return Reply(body={"choices": [{"message": {"role": "assistant", "content": content}}], "usage": usage})
+        return Reply("404 Not Found", {"error": "not found"})
+
+    async def stream_completion(self, content: str, usage: dict, delay: float):
+        # "stream": true -> one delta per ~token. The sampled latency is time to first
+        # token; per_token_latency then paces the rest.
+        yield ": OPENROUTER PROCESSING\n\n"
+        await asyncio.sleep(delay)
+        for i in range(0, len(content), 4):
+            delta = {"choices": [{"index": 0, "delta": {"content": content[i:i + 4]}}]}
+            yield f"data: {json.dumps(delta)}\n\n"
+            if self.per_token_latency:
+                await asyncio.sleep(self.per_token_latency)
+        yield f"data: {json.dumps({'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+
+def add_llm_mock_arguments(parser, latency: float = 0.05):
+    parser.add_argument("--latency", type=float, default=latency, help="Mean mock latency to first token (s).")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Uniform +/- jitter, or normal std dev (s).")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--per-token-latency", type=float, default=0.0, help="Mock seconds per completion token.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with an HTTP error.")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of answers that are not valid JSON.")
+
+
+def llm_mock_options(args) -> dict:
+    return {"latency": args.latency, "jitter": args.jitter, "latency_distribution": args.latency_distribution,
+            "per_token_latency": args.per_token_latency, "error_rate": args.error_rate,
+            "malformed_rate": args.malformed_rate}
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a local mock OpenRouter server.")
+    parser.add_argument("--port", type=int, default=8081)
+    add_llm_mock_arguments(parser)
+    args = parser.parse_args()
+    serve_forever(MockOpenRouter(port=args.port, **llm_mock_options(args)), "Mock OpenRouter")
@@ -0,0 +1,86 @@
+import asyncio
+import re
+import subprocess
+import tempfile
+import zlib
+from pathlib import Path
+from typing import List
+
+from benchmarks.mock_http import LatencyModel, MockHTTPServer, Reply, Request, serve_forever
+
+DEFAULT_SAMPLE_DIR = Path(tempfile.gettempdir()) / "pexels-mock-samples"
+
+
+def ensure_samples(sample_dir: Path, clips: int = 5, clip_seconds: float = 4.0, size: str = "1280x720") -> List[Path]:
+    # Landscape test patterns, like most Pexels results. Generated once, reused across runs.
+    from imageio_ffmpeg import get_ffmpeg_exe
+    sample_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(clips):
+        path = sample_dir / f"sample{i}_{size}_{clip_seconds:g}s.mp4"
+        if not path.exists():
+            tmp = path.with_suffix(".tmp.mp4")
+            subprocess.run([get_ffmpeg_exe(), "-y", "-loglevel", "error", "-f", "lavfi",
+                            "-i", f"testsrc2=size={size}:rate=30:duration={clip_seconds}",
+                            "-vf", f"hue=h={i * 360 // max(clips, 1)}",
+                            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", str(tmp)], check=True)
+            tmp.replace(path)
+        paths.append(path)
+    return paths
+
+
+# --- MOCK PEXELS SERVER ---
+# /videos/search answers with every local sample clip (ids are stable per query, so the
+# app's asset cache behaves as with the real API); /files/<name> serves the MP4 bytes.
+# Point the app at it with PEXELS_API_BASE=<origin>.
+class MockPexels(MockHTTPServer):
+    def __init__(self, sample_paths: List[Path], host="127.0.0.1", port=0, latency=0.05, jitter=0.02,
+                 latency_distribution="uniform", per_query_ids=True):
+        super().__init__(host, port)
+        self.samples = {path.name: path for path in sample_paths}
+        self.latency_model = LatencyModel(mean=latency, jitter=jitter, distribution=latency_distribution)
+        # Distinct ids per query make every new idea a cold download; False shares one id set.
+        self.per_query_ids = per_query_ids
+        self.bytes_served = 0
+
+    def search_body(self, query: str) -> dict:
+        offset = (zlib.crc32(query.encode()) % 10**6) * 100 if self.per_query_ids else 0
+        videos = []
+        for i, name in enumerate(sorted(self.samples)):
+            width, height = map(int, re.search(r"_(\d+)x(\d+)_", name).groups())
+            videos.append({"id": offset + i, "width": width, "height": height, "duration": 4,
+                           "video_files": [{"id": offset + i, "quality": "hd", "file_type": "video/mp4", "width": width,
+                                            "height": height, "link": f"{self.origin}/files/{name}"}]})
+        return {"page": 1, "per_page": len(videos), "total_results": len(videos), "videos": videos}
+
+    async def route(self, request: Request):
+        if request.method == "GET" and request.path == "/videos/search":
+            await asyncio.sleep(self.latency_model.sample())
+            return Reply(body=self.search_body(request.query.get("query", "")))
+        if request.method == "GET" and request.path.startswith("/files/"):
+            path = self.samples.get(request.path[len("/files/"):])
+            if path is None:
+                return Reply("404 Not Found", {"error": "not found"})
+            data = await asyncio.to_thread(path.read_bytes)
+            self.bytes_served += len(data)
+            return Reply(body=data, content_type="video/mp4")
+        return Reply("404 Not Found", {"error": "not found"})
+
+    def stats(self) -> dict:
+        return {**super().stats(), "bytes_served": self.bytes_served}
+
+    def reset_stats(self):
+        super().reset_stats()
+        self.bytes_served = 0
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a local mock Pexels video API serving sample MP4s.")
+    parser.add_argument("--port", type=int, default=8083)
+    parser.add_argument("--sample-dir", type=Path, default=DEFAULT_SAMPLE_DIR)
+    parser.add_argument("--clips", type=int, default=5)
+    parser.add_argument("--clip-seconds", type=float, default=4.0)
+    args = parser.parse_args()
+    samples = ensure_samples(args.sample_dir, args.clips, args.clip_seconds)
+    serve_forever(MockPexels(samples, port=args.port), "Mock Pexels")
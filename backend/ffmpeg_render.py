@@ -0,0 +1,97 @@
+import os
+import re
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import List, Sequence, Union
+
+from imageio_ffmpeg import get_ffmpeg_exe
+
+from video_delivery import FASTSTART_ARGS
+
+PathLike = Union[str, Path]
+
+
+class FFmpegRenderError(Exception):
+    pass
+
+
+# --- PROBING ---
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+def probe_duration(path: PathLike) -> float:
+    # imageio-ffmpeg ships no ffprobe; `ffmpeg -i` prints the container header
+    # (and exits non-zero for lack of an output), which is all we need.
+    result = subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-i", str(path)], capture_output=True, text=True)
+    match = _DURATION_RE.search(result.stderr)
+    if not match:
+        raise FFmpegRenderError(f"Could not read the duration of {path}.")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+# --- FILTER GRAPH ---
+# One ffmpeg process does what moviepy does frame by frame in Python:
+#   [i:v] scale to cover WxH -> centre crop               (per clip)
+#   concat -> pad/trim to the narration length -> fps      (video)
+#   [n:a] trim                                              (narration audio)
+# Clips that are already normalized share codec, size and frame rate, so they are
+# joined by the concat demuxer instead: one decoder rather than one per clip, which
+# keeps peak memory flat as the clip count grows.
+def build_filter_graph(num_clips: int, duration: float, width: int = 1080, height: int = 1920, fps: int = 24,
+                       demuxed: bool = False) -> str:
+    video_inputs = 1 if demuxed else num_clips
+    chains = [f"[{i}:v]scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},"
+              f"setsar=1,format=yuv420p[v{i}]" for i in range(video_inputs)]
+    labels = "".join(f"[v{i}]" for i in range(video_inputs))
+    joined = f"{labels}null" if demuxed else f"{labels}concat=n={num_clips}:v=1:a=0"
+    # tpad holds the last frame if the clips run out before the narration does. fps goes
+    # last because setpts marks the frame rate as variable, which the muxer reads as 25.
+    chains.append(f"{joined},tpad=stop_mode=clone:stop_duration={duration:.3f},"
+                  f"trim=duration={duration:.3f},setpts=PTS-STARTPTS,fps={fps}[vout]")
+    chains.append(f"[{video_inputs}:a]atrim=duration={duration:.3f},asetpts=PTS-STARTPTS[aout]")
+    return ";".join(chains)
+
+def write_concat_list(clip_paths: Sequence[PathLike], list_path: PathLike):
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in clip_paths:
+            escaped = str(Path(path).resolve()).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+def build_command(clip_paths: Sequence[PathLike], audio_path: PathLike, duration: float, output_path: PathLike,
+                  preset: str = "medium", threads: int = 4, concat_list: PathLike = None) -> List[str]:
+    # With `concat_list`, clip_paths have been written to that file (see write_concat_list).
+    command = [get_ffmpeg_exe(), "-y", "-hide_banner", "-loglevel", "error"]
+    if concat_list:
+        command += ["-f", "concat", "-safe", "0", "-i", str(concat_list)]
+    else:
+        for path in clip_paths:
+            command += ["-i", str(path)]
+    command += ["-i", str(audio_path),
+                "-filter_complex", build_filter_graph(len(clip_paths), duration, demuxed=bool(concat_list)),
+                "-map", "[vout]", "-map", "[aout]",
+                "-c:v", "libx264", "-preset", preset, "-threads", str(threads),
+                "-c:a", "aac", *FASTSTART_ARGS, str(output_path)]
+    return command
+
+
+# --- RENDER ---
+def render_ffmpeg(clip_paths: Sequence[PathLike], audio_path: PathLike, duration: float, output_path: PathLike,
+                  preset: str = "medium", threads: int = 4, uniform: bool = False):
+    """Set `uniform` only when every clip has identical codec parameters (e.g. all came from normalize_clip)."""
+    if not clip_paths:
+        raise FFmpegRenderError("No clips to render.")
+    list_path = None
+    try:
+        if uniform and len(clip_paths) > 1:
+            fd, list_path = tempfile.mkstemp(suffix=".txt", prefix="concat-", dir=os.path.dirname(os.path.abspath(output_path)))
+            os.close(fd)
+            write_concat_list(clip_paths, list_path)
+        command = build_command(clip_paths, audio_path, duration, output_path, preset=preset, threads=threads,
+                                concat_list=list_path)
+        result = subprocess.run(command, capture_output=True, text=True)
+    finally:
+        if list_path:
+            os.remove(list_path)
+    if result.returncode != 0:
+        raise FFmpegRenderError(f"ffmpeg render failed: {result.stderr.strip()[-500:]}")
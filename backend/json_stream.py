@@ -0,0 +1,111 @@
+from typing import List, Tuple, Union
+
+PathPart = Union[str, int]
+Path = Tuple[PathPart, ...]
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+# --- INCREMENTAL JSON PARSER ---
+# Feed it a JSON document in arbitrary pieces (e.g. LLM token deltas) and it
+# returns the text of string values as it arrives, tagged with where the string
+# sits in the document: ("content",) for {"content": "..."}, or
+# ("content", "thread", 2) for the third tweet of an X thread.
+# It only tracks structure and strings; numbers, booleans and the final shape are
+# left to json.loads on the complete text. Anything before the first "{" or "["
+# (such as a ```json fence) and after the top-level value closes is ignored.
+class IncrementalJsonParser:
+    def __init__(self):
+        # One frame per open container: [kind, key or index, expecting_key]
+        self._stack: List[list] = []
+        self._in_string = False
+        self._string_is_key = False
+        self._key_chars: List[str] = []
+        self._value_chars: List[str] = []
+        self._escape = None  # None, "" after a backslash, or the hex digits of a \u escape
+        self._high_surrogate = None
+        self.done = False
+
+    def feed(self, text: str) -> List[Tuple[Path, str]]:
+        events: List[Tuple[Path, str]] = []
+        for char in text:
+            if self.done:
+                break
+            if self._in_string:
+                self._string_char(char, events)
+            else:
+                self._structural_char(char)
+        if self._in_string and not self._string_is_key:
+            self._flush(events)
+        return events
+
+    def _path(self) -> Path:
+        return tuple(frame[1] for frame in self._stack)
+
+    def _flush(self, events: List[Tuple[Path, str]]):
+        if self._value_chars:
+            text = "".join(self._value_chars)
+            self._value_chars.clear()
+            path = self._path()
+            if events and events[-1][0] == path:
+                events[-1] = (path, events[-1][1] + text)
+            else:
+                events.append((path, text))
+
+    def _emit_char(self, char: str):
+        (self._key_chars if self._string_is_key else self._value_chars).append(char)
+
+    def _string_char(self, char: str, events: List[Tuple[Path, str]]):
+        if self._escape is not None:
+            if self._escape == "" and char != "u":
+                self._emit_char(_ESCAPES.get(char, char))
+                self._escape = None
+                return
+            if self._escape == "":
+                self._escape = "u"
+                return
+            self._escape += char
+            if len(self._escape) < 5:
+                return
+            code = int(self._escape[1:], 16)
+            self._escape = None
+            if 0xD800 <= code < 0xDC00:
+                self._high_surrogate = code
+                return
+            if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+                code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+            self._high_surrogate = None
+            self._emit_char(chr(code))
+        elif char == "\\":
+            self._escape = ""
+        elif char == '"':
+            self._in_string = False
+            if self._string_is_key:
+                frame = self._stack[-1]
+                frame[1], frame[2] = "".join(self._key_chars), False
+                self._key_chars.clear()
+            else:
+                self._flush(events)
+        else:
+            self._emit_char(char)
+
+    def _structural_char(self, char: str):
+        if not self._stack:
+            if char in "{[":
+                self._stack.append(["object", None, True] if char == "{" else ["array", 0, False])
+            return
+        frame = self._stack[-1]
+        if char == '"':
+            self._in_string = True
+            self._string_is_key = frame[0] == "object" and frame[2]
+        elif char in "{[":
+            self._stack.append(["object", None, True] if char == "{" else ["array", 0, False])
+        elif char in "}]":
+            self._stack.pop()
+            if not self._stack:
+                self.done = True
+        elif char == ",":
+            if frame[0] == "object":
+                frame[1], frame[2] = None, True
+            else:
+                frame[1] += 1
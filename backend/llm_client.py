@@ -0,0 +1,232 @@
+import asyncio
+import json
+import os
+import httpx
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from logs import get_logger
+
+log = get_logger("llm_client")
+
+
+# --- PROVIDER CONFIGURATION ---
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    """Connection pool and timeout settings for one upstream LLM provider."""
+    name: str
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = True
+    connect_timeout: float = 10.0
+    read_timeout: float = 60.0
+    write_timeout: float = 10.0
+    pool_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls, name: str, **defaults) -> "ProviderConfig":
+        # e.g. OPENROUTER_MAX_CONNECTIONS, OPENROUTER_READ_TIMEOUT, GEMINI_READ_TIMEOUT
+        base = cls(name=name, **defaults)
+        prefix = name.upper()
+        return cls(
+            name=name,
+            max_connections=_env_int(f"{prefix}_MAX_CONNECTIONS", base.max_connections),
+            max_keepalive_connections=_env_int(f"{prefix}_MAX_KEEPALIVE", base.max_keepalive_connections),
+            keepalive_expiry=_env_float(f"{prefix}_KEEPALIVE_EXPIRY", base.keepalive_expiry),
+            http2=_env_bool(f"{prefix}_HTTP2", base.http2),
+            connect_timeout=_env_float(f"{prefix}_CONNECT_TIMEOUT", base.connect_timeout),
+            read_timeout=_env_float(f"{prefix}_READ_TIMEOUT", base.read_timeout),
+            write_timeout=_env_float(f"{prefix}_WRITE_TIMEOUT", base.write_timeout),
+            pool_timeout=_env_float(f"{prefix}_POOL_TIMEOUT", base.pool_timeout),
+        )
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(connect=self.connect_timeout, read=self.read_timeout,
+                             write=self.write_timeout, pool=self.pool_timeout)
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_keepalive_connections,
+                            keepalive_expiry=self.keepalive_expiry)
+
+
+def create_http_client(config: ProviderConfig, **kwargs) -> httpx.AsyncClient:
+    http2 = config.http2
+    if http2:
+        try:
+            import h2  # noqa: F401  (installed by httpx[http2])
+        except ImportError:
+            log.warning("http_client.no_h2", provider=config.name, detail="HTTP/2 requested but 'h2' is not installed; using HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(limits=config.limits, timeout=config.timeout, http2=http2, **kwargs)
+
+
+# --- OPENROUTER CALLS ---
+async def openrouter_chat(client: httpx.AsyncClient, api_base: str, api_key: str, model: str, prompt: str,
+                          max_tokens: int = 2048, json_mode: bool = True) -> str:
+    headers = {"Authorization": f"Bearer {api_key}"}
+    payload = {"model": model, "messages": [{"role": "user", "content": prompt}], "max_tokens": max_tokens}
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    response = await client.post(f"{api_base}/chat/completions", headers=headers, json=payload)
+    response.raise_for_status()
+    return response.json()['choices'][0]['message']['content']
+
+async def openrouter_chat_stream(client: httpx.AsyncClient, api_base: str, api_key: str, model: str, prompt: str,
+                                 max_tokens: int = 2048, json_mode: bool = True) -> AsyncIterator[str]:
+    # Same request with "stream": true; yields content deltas from the server-sent events.
+    headers = {"Authorization": f"Bearer {api_key}"}
+    payload = {"model": model, "messages": [{"role": "user", "content": prompt}], "max_tokens": max_tokens, "stream": True}
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    async with client.stream("POST", f"{api_base}/chat/completions", headers=headers, json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            # Lines starting with ":" are keep-alive comments (": OPENROUTER PROCESSING").
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if "error" in chunk:
+                raise RuntimeError(f"OpenRouter stream error: {chunk['error']}")
+            choices = chunk.get("choices") or []
+            delta = choices[0].get("delta", {}).get("content") if choices else None
+            if delta:
+                yield delta
+
+
+# --- GEMINI REST CALLS ---
+# The same generateContent API the google-generativeai SDK wraps, over a pooled httpx
+# client. Used instead of the SDK when GEMINI_API_BASE is set (e.g. a local stub).
+def _gemini_request(api_base: str, api_key: str, model: str, prompt: str, max_tokens: int, stream: bool):
+    method = "streamGenerateContent?alt=sse" if stream else "generateContent"
+    payload = {"contents": [{"role": "user", "parts": [{"text": prompt}]}],
+               "generationConfig": {"maxOutputTokens": max_tokens}}
+    return f"{api_base}/models/{model}:{method}", {"x-goog-api-key": api_key}, payload
+
+def _gemini_text(response: dict) -> str:
+    candidates = response.get("candidates") or []
+    parts = candidates[0].get("content", {}).get("parts", []) if candidates else []
+    return "".join(part.get("text", "") for part in parts)
+
+async def gemini_generate(client: httpx.AsyncClient, api_base: str, api_key: str, model: str, prompt: str,
+                          max_tokens: int = 2048) -> str:
+    url, headers, payload = _gemini_request(api_base, api_key, model, prompt, max_tokens, stream=False)
+    response = await client.post(url, headers=headers, json=payload)
+    response.raise_for_status()
+    text = _gemini_text(response.json())
+    if not text:
+        raise RuntimeError("Gemini returned no text (blocked or empty candidate).")
+    return text
+
+async def gemini_generate_stream(client: httpx.AsyncClient, api_base: str, api_key: str, model: str, prompt: str,
+                                 max_tokens: int = 2048) -> AsyncIterator[str]:
+    url, headers, payload = _gemini_request(api_base, api_key, model, prompt, max_tokens, stream=True)
+    async with client.stream("POST", url, headers=headers, json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            chunk = json.loads(line[5:].strip())
+            if "error" in chunk:
+                raise RuntimeError(f"Gemini stream error: {chunk['error']}")
+            text = _gemini_text(chunk)
+            if text:
+                yield text
+
+
+# --- PROVIDERS (see provider_router.Provider) ---
+class OpenRouterProvider:
+    def __init__(self, client: httpx.AsyncClient, api_base: str, api_key: str, model: str, name: str = "openrouter"):
+        self.client = client
+        self.api_base = api_base
+        self.api_key = api_key
+        self.model = model
+        self.name = name
+
+    async def complete(self, prompt: str, max_tokens: int = 2048, json_mode: bool = True) -> str:
+        return await openrouter_chat(self.client, self.api_base, self.api_key, self.model, prompt,
+                                     max_tokens=max_tokens, json_mode=json_mode)
+
+    async def stream(self, prompt: str, max_tokens: int = 2048, json_mode: bool = True) -> AsyncIterator[str]:
+        async for delta in openrouter_chat_stream(self.client, self.api_base, self.api_key, self.model, prompt,
+                                                  max_tokens=max_tokens, json_mode=json_mode):
+            yield delta
+
+
+class GeminiProvider:
+    # The SDK takes about a second to import, so it is loaded (off the event loop) on the
+    # first fallback call rather than at startup; most processes never need it.
+    def __init__(self, api_key: str, model_name: str, timeout: float, name: str = "gemini"):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.timeout = timeout
+        self.name = name
+        self._model = None
+        self._loading = None
+
+    def _load_model(self):
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        return genai.GenerativeModel(self.model_name)
+
+    async def model(self):
+        if self._model is None:
+            if self._loading is None:
+                self._loading = asyncio.ensure_future(asyncio.to_thread(self._load_model))
+            try:
+                self._model = await asyncio.shield(self._loading)
+            except Exception:
+                self._loading = None  # let the next call retry
+                raise
+        return self._model
+
+    async def complete(self, prompt: str, max_tokens: int = 2048, json_mode: bool = True) -> str:
+        model = await self.model()
+        response = await asyncio.wait_for(model.generate_content_async(contents=prompt), timeout=self.timeout)
+        return response.text
+
+    async def stream(self, prompt: str, max_tokens: int = 2048, json_mode: bool = True) -> AsyncIterator[str]:
+        model = await self.model()
+        response = await asyncio.wait_for(model.generate_content_async(contents=prompt, stream=True),
+                                          timeout=self.timeout)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class GeminiRestProvider:
+    def __init__(self, client: httpx.AsyncClient, api_base: str, api_key: str, model: str, name: str = "gemini"):
+        self.client = client
+        self.api_base = api_base
+        self.api_key = api_key
+        self.model = model
+        self.name = name
+
+    async def complete(self, prompt: str, max_tokens: int = 2048, json_mode: bool = True) -> str:
+        return await gemini_generate(self.client, self.api_base, self.api_key, self.model, prompt, max_tokens=max_tokens)
+
+    async def stream(self, prompt: str, max_tokens: int = 2048, json_mode: bool = True) -> AsyncIterator[str]:
+        async for text in gemini_generate_stream(self.client, self.api_base, self.api_key, self.model, prompt,
+                                                 max_tokens=max_tokens):
+            yield text
@@ -0,0 +1,88 @@
+import os
+import json
+import logging
+import sys
+import time
+from typing import Any, Dict
+
+
+# --- STRUCTURED LOGGING ---
+# log.info("llm.call", provider="openrouter", ms=812) renders as
+#   2026-01-01T12:00:00Z info main llm.call provider=openrouter ms=812   (LOG_FORMAT=text, default)
+#   {"ts": "...", "level": "info", "logger": "main", "event": "llm.call", ...}  (LOG_FORMAT=json)
+# Disabled levels cost one isEnabledFor() check; nothing is formatted unless emitted.
+# LOG_LEVEL (default INFO) sets the threshold. Loggers live under "app." so uvicorn's own logging is untouched.
+class StructLogger:
+    __slots__ = ("_logger",)
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+
+    def _log(self, level: int, event: str, fields: Dict[str, Any], exc_info=None):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, extra={"fields": fields}, exc_info=exc_info, stacklevel=3)
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event: str, **fields):
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+
+def _timestamp(record: logging.LogRecord) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z"
+
+def _logfmt_value(value: Any) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    if text == "" or any(c in text for c in ' "=\n'):
+        return json.dumps(text)
+    return text
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", {})
+        parts = [_timestamp(record), record.levelname.lower(), record.name[4:], record.getMessage()]
+        parts += [f"{key}={_logfmt_value(value)}" for key, value in fields.items() if value is not None]
+        line = " ".join(parts)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"ts": _timestamp(record), "level": record.levelname.lower(), "logger": record.name[4:],
+                 "event": record.getMessage(), "pid": record.process}
+        entry.update((key, value) for key, value in getattr(record, "fields", {}).items() if value is not None)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_configured = False
+
+def configure_logging():
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if os.environ.get("LOG_FORMAT", "text").lower() == "json" else TextFormatter())
+    root = logging.getLogger("app")
+    root.handlers[:] = [handler]
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    root.propagate = False
+
+def get_logger(name: str) -> StructLogger:
+    configure_logging()
+    return StructLogger(logging.getLogger(f"app.{name}"))
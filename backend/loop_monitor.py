@@ -0,0 +1,80 @@
+import os
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import List, Optional
+
+from logs import get_logger
+
+log = get_logger("loop_monitor")
+
+
+# --- EVENT LOOP BLOCKING DETECTOR ---
+# Debug aid: anything that holds the event loop (sync HTTP, file writes, CPU work)
+# stalls every request on the worker. Enabled with DEBUG_LOOP_BLOCKING=1.
+#   * asyncio debug mode logs each callback slower than the threshold, naming it.
+#   * A watchdog thread watches a heartbeat task; when the loop misses it, the
+#     loop thread's current stack is printed, showing the line that is blocking.
+# Blocks are kept in `events`, so a test or benchmark can assert there were none.
+class LoopBlockingMonitor:
+    def __init__(self, threshold: float = 0.1, debug_mode: bool = True):
+        self.threshold = threshold
+        self.debug_mode = debug_mode
+        self.events: List[dict] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> Optional["LoopBlockingMonitor"]:
+        if os.environ.get("DEBUG_LOOP_BLOCKING", "0").lower() in ("", "0", "false", "no", "off"):
+            return None
+        return cls(threshold=float(os.environ.get("LOOP_BLOCK_THRESHOLD_MS", 100)) / 1000)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        if self.debug_mode:
+            self._loop.set_debug(True)
+            self._loop.slow_callback_duration = self.threshold
+            logging.getLogger("asyncio").setLevel(logging.WARNING)
+        self._last_beat = time.monotonic()
+        self._heartbeat = self._loop.create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        log.info("loop_monitor.started", threshold_ms=round(self.threshold * 1000))
+
+    def stop(self):
+        self._stopped.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        if self.debug_mode and self._loop is not None:
+            self._loop.set_debug(False)
+
+    async def _beat(self):
+        interval = self.threshold / 4
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(interval)
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stopped.wait(self.threshold / 4):
+            beat = self._last_beat
+            blocked_for = time.monotonic() - beat
+            if blocked_for < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat  # one report per stall
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>"
+            self.events.append({"blocked_ms": round(blocked_for * 1000, 1), "stack": stack, "at": time.time()})
+            log.warning("loop_monitor.blocked", blocked_ms=round(blocked_for * 1000), stack=stack)
+
+    def stats(self) -> dict:
+        return {"threshold_ms": self.threshold * 1000, "blocks": len(self.events)}
@@ -2,24 +2,39 @@ import os
 import asyncio
 import json
 import shutil
-import httpx
-import google.generativeai as genai
-from fastapi import FastAPI, HTTPException
+import time
+import uuid
+from contextlib import asynccontextmanager, aclosing
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field, ValidationError, model_validator
 from typing import List, Literal, Union, Optional
 from pathlib import Path
-from moviepy.editor import (VideoFileClip, AudioFileClip, CompositeVideoClip, 
-                            concatenate_videoclips, TextClip)
-from pexels_api import API
-from gtts import gTTS
 from dotenv import load_dotenv
+from llm_client import ProviderConfig, create_http_client, OpenRouterProvider, GeminiProvider, GeminiRestProvider
+from provider_router import ProviderRouter, AllProvidersFailed
+from response_cache import ResponseCache
+from video_jobs import VideoJobManager, QueueFull
+from loop_monitor import LoopBlockingMonitor
+from json_stream import IncrementalJsonParser
+from singleflight import SingleFlight
+from admission import AdmissionController, AdmissionMiddleware
+from shared_state import shared_state_from_env
+from video_delivery import VIDEO_CACHE_CONTROL, VIDEO_NAME_RE, VideoRetention
+from virality import heuristic_score, virality_mode_from_env
+from logs import get_logger
+from metrics import (REGISTRY, CONTENT_TYPE, MetricsMiddleware, collector_from_stats, llm_parse_errors,
+                     stream_ttfb_seconds)
 
 # --- SETUP ---
 load_dotenv()
-app = FastAPI()
 STATIC_DIR = Path(__file__).parent / "static"
+VIDEO_DIR = STATIC_DIR / "videos"
+DATA_DIR = Path(os.environ.get("APP_DATA_DIR") or Path(__file__).parent / "data")
+JOBS_DIR = DATA_DIR / "jobs"
+ASSET_DIR = DATA_DIR / "assets"
+log = get_logger("main")
 
 
 # --- CONFIGURE ALL APIS ---
@@ -29,14 +44,91 @@ try:
     OPENROUTER_API_BASE = os.environ.get("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1")
     PRIMARY_MODEL = "deepseek/deepseek-chat"
     
-    # Gemini (Fallback)
-    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
-    gemini_model = genai.GenerativeModel('gemini-pro')
+    # Gemini (Fallback). GEMINI_API_BASE switches from the SDK to plain REST calls against that base URL.
+    GEMINI_API_KEY = os.environ["GEMINI_API_KEY"]
+    GEMINI_API_BASE = os.environ.get("GEMINI_API_BASE")
+    GEMINI_MODEL = "gemini-pro"
 
 except KeyError as e:
-    print(f"ERROR: Missing API Key in environment variables: {e}")
+    log.error("startup.missing_api_key", key=str(e))
     exit()
 
+OPENROUTER_CONFIG = ProviderConfig.from_env("openrouter")
+GEMINI_CONFIG = ProviderConfig.from_env("gemini")
+# Set by serve.py when running several workers; None means plain in-process state.
+shared_state = shared_state_from_env()
+response_cache = ResponseCache.from_env(shared_state)
+# Identical concurrent requests (same endpoint and prompt, i.e. same cache key) share one upstream call.
+inflight = SingleFlight()
+VIRALITY_MODE = virality_mode_from_env()
+# Admission cost (rate-limit tokens) per LLM-backed route: /generate fans out to several
+# upstream calls, the rest make one. Other routes are not admission-controlled.
+ADMISSION_COSTS = {"/generate": 4, "/generate/stream": 4, "/refine": 1, "/refine/stream": 1, "/humanize": 1,
+                   "/humanize/stream": 1, "/score": 1, "/generate-video": 2}
+admission = AdmissionController.from_env(ADMISSION_COSTS, shared_state)
+
+CACHE_COUNTERS = ("memory_hits", "disk_hits", "misses", "sets", "evictions", "expired", "bypassed")
+REGISTRY.add_collector(collector_from_stats(
+    "response_cache_events", "Response cache lookups and maintenance by outcome.", "counter",
+    response_cache.stats, "outcome", CACHE_COUNTERS))
+REGISTRY.add_collector(collector_from_stats(
+    "response_cache_size", "Response cache memory tier size.", "gauge", response_cache.stats, "unit", ("entries", "bytes")))
+
+# --- APP LIFESPAN ---
+# One pooled client per provider for the whole process, so requests reuse
+# warm keep-alive (and HTTP/2) connections instead of paying a TLS handshake each time.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_monitor = LoopBlockingMonitor.from_env()
+    if loop_monitor:
+        loop_monitor.start()
+    app.state.openrouter_client = create_http_client(OPENROUTER_CONFIG)
+    app.state.gemini_client = create_http_client(GEMINI_CONFIG) if GEMINI_API_BASE else None
+    gemini = (GeminiRestProvider(app.state.gemini_client, GEMINI_API_BASE, GEMINI_API_KEY, GEMINI_MODEL)
+              if GEMINI_API_BASE else GeminiProvider(GEMINI_API_KEY, GEMINI_MODEL, timeout=GEMINI_CONFIG.read_timeout))
+    # DeepSeek (via OpenRouter) first, Gemini as fallback; see provider_router for breaker/hedging.
+    app.state.llm_router = ProviderRouter.from_env([
+        OpenRouterProvider(app.state.openrouter_client, OPENROUTER_API_BASE, OPENROUTER_API_KEY, PRIMARY_MODEL),
+        gemini,
+    ])
+    app.state.video_jobs = VideoJobManager.from_env(VIDEO_DIR, JOBS_DIR, ASSET_DIR)
+    sweeper = asyncio.create_task(video_retention.run(app.state.video_jobs.expire))
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        # Lets in-flight renders finish (up to VIDEO_DRAIN_TIMEOUT) before the workers go away.
+        await app.state.video_jobs.drain()
+        await app.state.openrouter_client.aclose()
+        if app.state.gemini_client is not None:
+            await app.state.gemini_client.aclose()
+        response_cache.close()
+        if shared_state is not None:
+            await shared_state.close()
+        if loop_monitor:
+            loop_monitor.stop()
+
+video_retention = VideoRetention.from_env(VIDEO_DIR)
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(AdmissionMiddleware, controller=admission)
+app.add_middleware(MetricsMiddleware)  # added last = outermost, so shed requests are counted too
+REGISTRY.add_collector(collector_from_stats(
+    "video_jobs", "Render job counters and current queue state.", "gauge",
+    lambda: app.state.video_jobs.stats() if hasattr(app.state, "video_jobs") else {}, "field"))
+REGISTRY.add_collector(collector_from_stats(
+    "video_retention", "Rendered video directory size and retention sweeps.", "gauge", video_retention.stats, "field"))
+REGISTRY.add_collector(collector_from_stats(
+    "admission_gate", "Admission gate counters and current occupancy.", "gauge",
+    lambda: admission.gate.stats() if admission.gate else {}, "field"))
+
+async def complete_llm(key: str, prompt: str, max_tokens: int = 2048, json_mode: bool = True):
+    return await inflight.do(key, lambda: app.state.llm_router.complete(prompt, max_tokens=max_tokens, json_mode=json_mode))
+
+async def call_llm(key: str, prompt: str, max_tokens: int = 2048, json_mode: bool = True) -> str:
+    result = await complete_llm(key, prompt, max_tokens=max_tokens, json_mode=json_mode)
+    return result.text
+
 # --- DATA MODELS ---
 class GenerationRequest(BaseModel):
     idea: str
@@ -48,6 +140,9 @@ class GenerationRequest(BaseModel):
     auto_hashtag: bool
     contextual_suggestions: bool
     target_audience: str = ""
+    bypass_cache: bool = False  # skip cached responses (a fresh result still refreshes the cache)
+    num_versions: int = Field(3, ge=1, le=5)
+    batch_mode: bool = False  # ask for all versions in one completion instead of one call per version
 
 class InstagramContent(BaseModel):
     caption: str
@@ -86,9 +181,17 @@ class Version(BaseModel):
 
 class MultiVersionResponse(BaseModel):
     versions: List[Version]
+    scoring: Optional[str] = None  # the VIRALITY_MODE used; "deferred" means ask /score
+
+class ScoreRequest(BaseModel):
+    platform: str
+    versions: List[Union[str, InstagramContent, XContent]] = Field(..., min_length=1, max_length=5)
+    scorer: Optional[Literal["llm", "heuristic"]] = None  # default: heuristic in heuristic mode, else llm
+    bypass_cache: bool = False
 
 class HumanizeRequest(BaseModel):
     text: str
+    bypass_cache: bool = False
 
 class HumanizeResponse(BaseModel):
     humanized_text: str
@@ -101,7 +204,7 @@ Version.model_rebuild()
 RefineRequest.model_rebuild()
 
 # --- HELPER FUNCTION ---
-def build_prompt(request: Union[GenerationRequest, RefineRequest]) -> str:
+def build_prompt(request: Union[GenerationRequest, RefineRequest], num_versions: int = 1) -> str:
     if request.creativity <= 33: creativity_level = "safe"
     elif request.creativity <= 66: creativity_level = "balanced"
     else: creativity_level = "inventive"
@@ -118,6 +221,13 @@ def build_prompt(request: Union[GenerationRequest, RefineRequest]) -> str:
     elif request.platform == "X": content_structure = '"content": {"thread": ["Tweet 1.", "Tweet 2."]}'
     else: content_structure = '"content": "Your full generated text post."'
 
+    if num_versions > 1 and not isinstance(request, RefineRequest):
+        # Batch mode: the response shape is a list of versions, stated once, not a second schema after the first.
+        response_shape = (f'Your entire response must be a single, valid JSON object of the form {{"versions": [...]}}, where the list holds exactly {num_versions} objects '
+                          f'that take clearly different angles on the idea, each with its own "content" and "analysis" keys.')
+    else:
+        response_shape = 'Your entire response must be a single, valid JSON object with "content" and "analysis" keys.'
+
     base_prompt = f"""
     You are an expert social media content creator. Generate content and analysis based on these specs:
     - Idea: "{request.idea}"
@@ -131,7 +241,7 @@ def build_prompt(request: Union[GenerationRequest, RefineRequest]) -> str:
     {'- Add relevant hashtags.' if request.auto_hashtag else ''}
     {'- Add a suggestion.' if request.contextual_suggestions else ''}
 
-    Your entire response must be a single, valid JSON object with "content" and "analysis" keys.
+    {response_shape}
     The "content" key's value must follow this structure: {{{content_structure}}}.
     
     The "analysis" key must contain a JSON object with three integer scores. CRITICAL: Generate scores on a human-like scale where 75 is average, 85 is good, and 95 is excellent. Do not give unusually low scores unless the content is extremely flawed. The keys must be exactly: "readability", "engagement_potential", and "human_likeness".
@@ -155,258 +265,468 @@ def build_prompt(request: Union[GenerationRequest, RefineRequest]) -> str:
         """
     return base_prompt
 
+# --- GENERATION HELPERS ---
+def parse_version_data(request: GenerationRequest, data: dict) -> Version:
+    content_payload = data['content']
+    if request.platform not in ["Instagram", "X"]:
+        if isinstance(content_payload, dict) and 'content' in content_payload and isinstance(content_payload.get('content'), str):
+            log.info("parse.unnested_content", platform=request.platform)
+            content_payload = content_payload['content']
+    if request.platform == "Instagram":
+        content_payload = InstagramContent(**content_payload)
+    elif request.platform == "X":
+        content_payload = XContent(**content_payload)
+    return Version(content=content_payload, analysis=AnalysisScores(**data['analysis']))
+
+async def generate_single_version(request: GenerationRequest, prompt: str, version_num: int):
+    cache_key = ResponseCache.make_key("generate", prompt, model=PRIMARY_MODEL, max_tokens=2048, version=version_num)
+    if request.bypass_cache:
+        response_cache.record_bypass()
+    else:
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            log.info("generate.cache_hit", version=version_num)
+            return Version.model_validate(cached)
+    full_content_str = None
+    try:
+        result = await complete_llm(cache_key, prompt)
+        full_content_str = result.text
+        log.info("generate.version_done", version=version_num, provider=result.provider, hedged=result.hedged)
+    except AllProvidersFailed as e:
+        return {"content": f"Error: Both APIs failed. {e}", "analysis": {"readability": 0, "engagement_potential": 0, "human_likeness": 0}}
+
+    try:
+        json_str_cleaned = full_content_str.strip().replace("```json", "").replace("```", "")
+        version = parse_version_data(request, json.loads(json_str_cleaned))
+    except (json.JSONDecodeError, ValidationError, Exception) as parse_e:
+        llm_parse_errors.inc(endpoint="generate")
+        log.warning("generate.parse_failed", version=version_num, error=str(parse_e))
+        return {"content": f"Error parsing response: {parse_e}\nRaw: {full_content_str}", "analysis": {"readability": 0, "engagement_potential": 0, "human_likeness": 0}}
+    await response_cache.set(cache_key, version.model_dump(mode="json"))
+    return version
+
+async def generate_batched_versions(request: GenerationRequest, num_versions: int) -> List[Version]:
+    # One completion asking for every version at once. Returns whatever validated;
+    # callers fan out single-version calls for any shortfall.
+    prompt = build_prompt(request, num_versions=num_versions)
+    max_tokens = min(8192, 1024 * (num_versions + 1))
+    cache_key = ResponseCache.make_key("generate-batch", prompt, model=PRIMARY_MODEL, max_tokens=max_tokens, versions=num_versions)
+    if request.bypass_cache:
+        response_cache.record_bypass()
+    else:
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            log.info("generate_batch.cache_hit", versions=num_versions)
+            return [Version.model_validate(v) for v in cached]
+    full_content_str = None
+    try:
+        full_content_str = await call_llm(cache_key, prompt, max_tokens=max_tokens)
+    except AllProvidersFailed as e:
+        log.warning("generate_batch.all_providers_failed", versions=num_versions, error=str(e))
+        return []
+
+    versions = []
+    try:
+        json_str_cleaned = full_content_str.strip().replace("```json", "").replace("```", "")
+        items = json.loads(json_str_cleaned)['versions']
+        if not isinstance(items, list):
+            raise ValueError(f"'versions' is {type(items).__name__}, not a list")
+    except Exception as parse_e:
+        llm_parse_errors.inc(endpoint="generate-batch")
+        log.warning("generate_batch.parse_failed", versions=num_versions, error=str(parse_e))
+        return []
+    for item in items[:num_versions]:
+        try:
+            versions.append(parse_version_data(request, item))
+        except Exception as parse_e:
+            llm_parse_errors.inc(endpoint="generate-batch")
+            log.warning("generate_batch.version_skipped", versions=num_versions, error=str(parse_e))
+    log.info("generate_batch.done", versions=num_versions, valid=len(versions))
+    if len(versions) == num_versions:
+        await response_cache.set(cache_key, [v.model_dump(mode="json") for v in versions])
+    return versions
+
+# --- VIRALITY SCORING ---
+# Each version is scored on its own (see virality.py for the modes), so scoring can start
+# the moment a version validates instead of waiting for the whole set.
+def version_text(content: Union[str, InstagramContent, XContent]) -> str:
+    if isinstance(content, InstagramContent): return f"Caption: {content.caption}\nScript: {content.script}"
+    if isinstance(content, XContent): return "\n".join(content.thread)
+    return content
+
+def build_virality_prompt(platform: str, text: str) -> str:
+    return f"""You are a viral social media strategist. Analyze the following content option for a {platform} post. Provide a "virality_score" (0-100) and a brief "justification". Your response must be ONLY a valid JSON object. Example: {{"virality_score": 88, "justification": "Strong hook."}} \n\nContent to analyze:\n{text}"""
+
+async def score_content(platform: str, content: Union[str, InstagramContent, XContent], bypass_cache: bool = False,
+                        mode: str = "llm") -> Optional[dict]:
+    # Returns {"virality_score", "justification"}, or None if the LLM scorer failed. Best effort only.
+    text = version_text(content)
+    if mode == "heuristic":
+        return heuristic_score(text, platform)
+    prompt = build_virality_prompt(platform, text)
+    key = ResponseCache.make_key("virality", prompt, model=PRIMARY_MODEL, max_tokens=256)
+    if bypass_cache:
+        response_cache.record_bypass()
+    else:
+        cached = await response_cache.get(key)
+        if cached is not None:
+            return cached
+    try:
+        raw = await call_llm(key, prompt, max_tokens=256)
+    except AllProvidersFailed as e:
+        log.warning("virality.failed", error=str(e))
+        return None
+    try:
+        data = json.loads(raw.strip().replace("```json", "").replace("```", ""))
+        score = {"virality_score": int(data["virality_score"]), "justification": str(data.get("justification") or "")}
+    except Exception as e:
+        llm_parse_errors.inc(endpoint="virality")
+        log.warning("virality.parse_failed", error=str(e))
+        return None
+    await response_cache.set(key, score)
+    return score
+
+async def score_in_place(request: GenerationRequest, version):
+    # Generation results that failed pass through untouched; so does everything in deferred mode.
+    if isinstance(version, Version) and VIRALITY_MODE != "deferred":
+        score = await score_content(request.platform, version.content, request.bypass_cache,
+                                    mode="heuristic" if VIRALITY_MODE == "heuristic" else "llm")
+        if score:
+            version.virality_score, version.justification = score["virality_score"], score["justification"]
+    return version
+
+def score_event(index: int, version: Version) -> str:
+    return sse_event("virality", {"scores": [{"index": index, "virality_score": version.virality_score,
+                                              "justification": version.justification}]})
+
+def build_humanize_prompt(text: str) -> str:
+    return f"""
+    You are an expert editor. Your task is to rewrite the following AI-generated text to make it sound authentically human and evade AI detection.
+    Focus on increasing "perplexity" and "burstiness".
+    1.  **Increase Perplexity:** Rewrite sentences to be less predictable. Use a richer vocabulary and occasionally choose a less common but still correct synonym. Introduce idioms or metaphors.
+    2.  **Increase Burstiness:** Vary the sentence structure dramatically. Mix very short, punchy sentences with much longer, more complex sentences to create a dynamic reading rhythm.
+    3.  **Add a Human Touch:** Incorporate subtle colloquialisms, rhetorical questions, or asides to break the flow. Frame the text as a personal thought or observation.
+    Preserve the core meaning. Only return the rewritten text. Do not include any introductory phrases like "Here is the rewritten text:", titles, or markdown.
+    TEXT TO REWRITE:
+    ---
+    {text}
+    ---
+    """
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# --- TIME TO FIRST BYTE ---
+# Streaming: request start -> first upstream token (the first "delta" goes out right after).
+# Buffered: request start -> full completion, since nothing is sent before that.
+def report_ttfb(endpoint: str, mode: str, started: float, ttfb: Optional[float]) -> dict:
+    timing = {"ttfb_ms": round(ttfb * 1000, 1) if ttfb is not None else None,
+              "total_ms": round((time.perf_counter() - started) * 1000, 1)}
+    if ttfb is not None:
+        stream_ttfb_seconds.observe(ttfb, endpoint=endpoint, mode=mode)
+    log.info("ttfb", endpoint=endpoint, mode=mode, **timing)
+    return timing
+
+def server_timing(timing: dict) -> str:
+    return f"ttfb;dur={timing['ttfb_ms']}, total;dur={timing['total_ms']}"
+
 # --- API ENDPOINTS ---
 @app.post("/generate", response_model=MultiVersionResponse)
 async def generate_versions(request: GenerationRequest):
-    print(f"\n--- [START] AI Generation for {request.platform} ---")
+    log.info("generate.start", platform=request.platform, versions=request.num_versions, batch=request.batch_mode)
     prompt = build_prompt(request)
-    async def generate_single_version(client, version_num):
-        full_content_str = None
-        try:
-            # --- DIAGNOSTIC PRINT STATEMENTS ---
-            key_to_check = os.environ.get("OPENROUTER_API_KEY", "KEY_NOT_FOUND")
-            print(f"DEBUG: Key found? {'Yes' if key_to_check != 'KEY_NOT_FOUND' else 'No'}")
-            if key_to_check != "KEY_NOT_FOUND":
-                print(f"DEBUG: Key length: {len(key_to_check)}")
-                print(f"DEBUG: Key starts with: '{key_to_check[:5]}...'")
-                print(f"DEBUG: Key ends with: '...{key_to_check[-5:]}'")
-            # --- END DIAGNOSTIC ---
-
-            print(f"Ver {version_num}: Attempting Primary (DeepSeek)...")
-            headers = {"Authorization": f"Bearer {OPENROUTER_API_KEY}"}
-            payload = {"model": PRIMARY_MODEL, "messages": [{"role": "user", "content": prompt}], "response_format": {"type": "json_object"}, "max_tokens": 2048}
-            response = await client.post(f"{OPENROUTER_API_BASE}/chat/completions", headers=headers, json=payload, timeout=60)
-            response.raise_for_status()
-            full_content_str = response.json()['choices'][0]['message']['content']
-            print(f"Ver {version_num}: Primary (DeepSeek) Succeeded.")
-        except Exception as e_deepseek:
-            print(f"Ver {version_num}: Primary Failed. Falling back. Reason: {e_deepseek}")
-            try:
-                print(f"Ver {version_num}: Attempting Fallback (Gemini)...")
-                response = await gemini_model.generate_content_async(contents=prompt)
-                full_content_str = response.text
-                print(f"Ver {version_num}: Fallback (Gemini) Succeeded.")
-            except Exception as e_gemini:
-                return {"content": f"Error: Both APIs failed. DeepSeek: {e_deepseek}, Gemini: {e_gemini}", "analysis": {"readability": 0, "engagement_potential": 0, "human_likeness": 0}}
+    num_versions = request.num_versions
+    batched = await generate_batched_versions(request, num_versions) if request.batch_mode and num_versions > 1 else []
 
-        try:
-            json_str_cleaned = full_content_str.strip().replace("```json", "").replace("```", "")
-            data = json.loads(json_str_cleaned)
-            content_payload = data['content']
-            if request.platform not in ["Instagram", "X"]:
-                if isinstance(content_payload, dict) and 'content' in content_payload and isinstance(content_payload.get('content'), str):
-                    print("--> Backend Correction: Un-nesting a malformed content object from the AI.")
-                    content_payload = content_payload['content']
-            if request.platform == "Instagram":
-                content_payload = InstagramContent(**content_payload)
-            elif request.platform == "X":
-                content_payload = XContent(**content_payload)
-            return Version(content=content_payload, analysis=AnalysisScores(**data['analysis']))
-        except (json.JSONDecodeError, ValidationError, Exception) as parse_e:
-            return {"content": f"Error parsing response: {parse_e}\nRaw: {full_content_str}", "analysis": {"readability": 0, "engagement_potential": 0, "human_likeness": 0}}
-
-    async with httpx.AsyncClient() as client:
-        tasks = [generate_single_version(client, i + 1) for i in range(3)]
-        versions_data = await asyncio.gather(*tasks)
+    async def generate_and_score(version_num: int):
+        return await score_in_place(request, await generate_single_version(request, prompt, version_num))
+
+    # Each version is scored as soon as it exists, overlapping the generations still running.
+    versions_data = await asyncio.gather(*[score_in_place(request, v) for v in batched],
+                                         *[generate_and_score(i + 1) for i in range(len(batched), num_versions)])
 
     versions = [v for v in versions_data if isinstance(v, Version)]
     if not versions:
         error_details = [str(v.get('content', 'Unknown error')) for v in versions_data if not isinstance(v, Version)]
-        raise HTTPException(status_code=500, detail=f"The AI failed to generate any valid content after 3 attempts. Please try rephrasing your idea or check the AI model status. Raw errors: {error_details}")
+        raise HTTPException(status_code=500, detail=f"The AI failed to generate any valid content after {num_versions} attempts. Please try rephrasing your idea or check the AI model status. Raw errors: {error_details}")
+
+    return {"versions": [v.dict() for v in versions], "scoring": VIRALITY_MODE}
+
+@app.post("/generate/stream")
+async def generate_versions_stream(request: GenerationRequest):
+    # Server-sent events: one "version" event per version as soon as it validates, a
+    # "virality" event for each version as soon as it is scored, then "done". In heuristic
+    # mode the score is already in the "version" event; in deferred mode there is none.
+    log.info("generate_stream.start", platform=request.platform, versions=request.num_versions, batch=request.batch_mode)
+    prompt = build_prompt(request)
+    num_versions = request.num_versions
+    llm_scoring = VIRALITY_MODE == "pipelined"
+
+    async def event_stream():
+        versions, error_details, tasks = [], [], []
+        finished = asyncio.Queue()
+
+        def start(coro, kind: str, index: int = -1):
+            task = asyncio.create_task(coro)
+            task.add_done_callback(lambda t: finished.put_nowait((kind, index, t)))
+            tasks.append(task)
+
+        async def generate_and_score(version_num: int):
+            version = await generate_single_version(request, prompt, version_num)
+            return version if llm_scoring else await score_in_place(request, version)
+
+        def accept(version: Version) -> str:
+            versions.append(version)
+            index = len(versions) - 1
+            if llm_scoring:
+                start(score_in_place(request, version), "score", index)
+            return sse_event("version", {"index": index, "version": version.model_dump(mode="json")})
 
-    if len(versions) > 0:
         try:
-            print("\n--- [START] Performance Prediction Analysis ---")
-            content_to_analyze = ""
-            for i, version in enumerate(versions):
-                content_text = ""
-                if isinstance(version.content, str): content_text = version.content
-                elif isinstance(version.content, InstagramContent): content_text = f"Caption: {version.content.caption}\nScript: {version.content.script}"
-                elif isinstance(version.content, XContent): content_text = "\n".join(version.content.thread)
-                content_to_analyze += f"--- VERSION {i+1} ---\n{content_text}\n\n"
-            prediction_prompt = f"""You are a viral social media strategist. Analyze the following {len(versions)} content options for a {request.platform} post. For each, provide a "virality_score" (0-100) and a brief "justification". Your response must be ONLY a valid JSON list of objects. Example: [{{"version_index": 0, "virality_score": 88, "justification": "Strong hook."}}] \n\nContent to analyze:\n{content_to_analyze}"""
-            headers = {"Authorization": f"Bearer {OPENROUTER_API_KEY}"}
-            payload = {"model": PRIMARY_MODEL, "messages": [{"role": "user", "content": prediction_prompt}], "response_format": {"type": "json_object"}, "max_tokens": 1024}
-            async with httpx.AsyncClient() as client:
-                response = await client.post(f"{OPENROUTER_API_BASE}/chat/completions", headers=headers, json=payload, timeout=60)
-                response.raise_for_status()
-                prediction_data = json.loads(response.json()['choices'][0]['message']['content'])
-            for prediction in prediction_data:
-                idx = prediction.get("version_index")
-                if idx is not None and 0 <= idx < len(versions):
-                    versions[idx].virality_score = prediction.get("virality_score")
-                    versions[idx].justification = prediction.get("justification")
-            print("--- [END] Performance Prediction Complete ---")
-        except Exception as e:
-            print(f"Performance prediction step failed: {e}")
-    return {"versions": [v.dict() for v in versions]}
+            if request.batch_mode and num_versions > 1:
+                for version in await generate_batched_versions(request, num_versions):
+                    yield accept(version if llm_scoring else await score_in_place(request, version))
+            for i in range(len(versions), num_versions):
+                start(generate_and_score(i + 1), "version")
+            handled = 0
+            while handled < len(tasks):  # accept() may add scoring tasks while this runs
+                kind, index, task = await finished.get()
+                handled += 1
+                result = task.result()
+                if kind == "score":
+                    yield score_event(index, versions[index])
+                elif isinstance(result, Version):
+                    yield accept(result)
+                else:
+                    error_details.append(str(result.get('content', 'Unknown error')))
+            if not versions:
+                yield sse_event("error", {"detail": f"The AI failed to generate any valid content after {num_versions} attempts. Please try rephrasing your idea or check the AI model status. Raw errors: {error_details}"})
+            yield sse_event("done", {"count": len(versions), "scoring": VIRALITY_MODE})
+        finally:
+            # Client went away mid-stream: don't leave orphaned upstream calls running.
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/score")
+async def score_versions(request: ScoreRequest):
+    # Lazy scoring for deferred mode (or re-scoring edited content). Same shape as the "virality" stream event.
+    scorer = request.scorer or ("heuristic" if VIRALITY_MODE == "heuristic" else "llm")
+    scores = await asyncio.gather(*[score_content(request.platform, content, request.bypass_cache, mode=scorer)
+                                    for content in request.versions])
+    return {"scores": [{"index": i, **(score or {"virality_score": None, "justification": None})}
+                       for i, score in enumerate(scores)], "scorer": scorer}
 
 @app.post("/refine", response_model=Version)
-async def refine_version(request: RefineRequest):
-    print(f"\n--- [START] AI Refinement for {request.platform} ---")
+async def refine_version(request: RefineRequest, response: Response):
+    log.info("refine.start", platform=request.platform)
+    started = time.perf_counter()
     prompt = build_prompt(request)
+    cache_key = ResponseCache.make_key("refine", prompt, model=PRIMARY_MODEL, max_tokens=2048)
+    if request.bypass_cache:
+        response_cache.record_bypass()
+    else:
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            log.info("refine.cache_hit")
+            return Version.model_validate(cached)
     full_content_str = None
     try:
-        print("Attempting Primary (DeepSeek)...")
-        headers = {"Authorization": f"Bearer {OPENROUTER_API_KEY}"}
-        payload = {"model": PRIMARY_MODEL, "messages": [{"role": "user", "content": prompt}], "response_format": {"type": "json_object"}, "max_tokens": 2048}
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{OPENROUTER_API_BASE}/chat/completions", headers=headers, json=payload, timeout=60)
-            response.raise_for_status()
-            full_content_str = response.json()['choices'][0]['message']['content']
-        print("Primary (DeepSeek) Succeeded.")
-    except Exception as e_deepseek:
-        print(f"Primary Failed. Falling back. Reason: {e_deepseek}")
-        try:
-            print("Attempting Fallback (Gemini)...")
-            response = await gemini_model.generate_content_async(contents=prompt)
-            full_content_str = response.text
-            print("Fallback (Gemini) Succeeded.")
-        except Exception as e_gemini:
-            raise HTTPException(status_code=500, detail=f"Both APIs failed on refinement. DeepSeek: {e_deepseek}, Gemini: {e_gemini}")
+        full_content_str = await call_llm(cache_key, prompt)
+    except AllProvidersFailed as e:
+        raise HTTPException(status_code=500, detail=f"Both APIs failed on refinement. {e}")
     try:
         json_str_cleaned = full_content_str.strip().replace("```json", "").replace("```", "")
-        data = json.loads(json_str_cleaned)
-        content_payload = data['content']
-        if request.platform == "Instagram": content_payload = InstagramContent(**data['content'])
-        elif request.platform == "X": content_payload = XContent(**data['content'])
-        return Version(content=content_payload, analysis=AnalysisScores(**data['analysis']))
+        version = parse_version_data(request, json.loads(json_str_cleaned))
     except Exception as parse_e:
+        llm_parse_errors.inc(endpoint="refine")
+        log.warning("refine.parse_failed", error=str(parse_e))
         raise HTTPException(status_code=500, detail=f"Error parsing AI response. Raw: {full_content_str}")
+    await response_cache.set(cache_key, version.model_dump(mode="json"))
+    response.headers["Server-Timing"] = server_timing(report_ttfb("/refine", "buffered", started, time.perf_counter() - started))
+    return version
+
+@app.post("/refine/stream")
+async def refine_version_stream(request: RefineRequest):
+    # Server-sent events: "delta" events carry text of the string fields under "content"
+    # as the model writes them ({"path": ["content", ...], "text": "..."}), then
+    # "version" with the validated result (analysis included) and "done" with timings.
+    log.info("refine_stream.start", platform=request.platform)
+    started = time.perf_counter()
+    prompt = build_prompt(request)
+    cache_key = ResponseCache.make_key("refine", prompt, model=PRIMARY_MODEL, max_tokens=2048)
+
+    async def event_stream():
+        if request.bypass_cache:
+            response_cache.record_bypass()
+        else:
+            cached = await response_cache.get(cache_key)
+            if cached is not None:
+                log.info("refine_stream.cache_hit")
+                yield sse_event("version", cached)
+                yield sse_event("done", report_ttfb("/refine/stream", "cached", started, time.perf_counter() - started))
+                return
+        parser, chunks, ttfb = IncrementalJsonParser(), [], None
+        try:
+            async with aclosing(app.state.llm_router.stream(prompt)) as deltas:
+                async for delta in deltas:
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - started
+                    chunks.append(delta)
+                    for path, text in parser.feed(delta):
+                        if path and path[0] == "content":
+                            yield sse_event("delta", {"path": list(path), "text": text})
+        except AllProvidersFailed as e:
+            yield sse_event("error", {"detail": f"Both APIs failed on refinement. {e}"})
+            return
+        except Exception as e:
+            log.warning("refine_stream.broken", error=str(e))
+            yield sse_event("error", {"detail": f"The refinement stream broke off: {e}"})
+            return
+        full_content_str = "".join(chunks)
+        try:
+            json_str_cleaned = full_content_str.strip().replace("```json", "").replace("```", "")
+            version = parse_version_data(request, json.loads(json_str_cleaned))
+        except Exception as parse_e:
+            llm_parse_errors.inc(endpoint="refine")
+            log.warning("refine_stream.parse_failed", error=str(parse_e))
+            yield sse_event("error", {"detail": f"Error parsing AI response. Raw: {full_content_str}"})
+            return
+        await response_cache.set(cache_key, version.model_dump(mode="json"))
+        yield sse_event("version", version.model_dump(mode="json"))
+        yield sse_event("done", report_ttfb("/refine/stream", "streaming", started, ttfb))
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 @app.post("/humanize", response_model=HumanizeResponse)
-async def humanize_text(request: HumanizeRequest):
-    print("\n--- [START] Humanizing Text ---")
-    humanize_prompt = f"""
-    You are an expert editor. Your task is to rewrite the following AI-generated text to make it sound authentically human and evade AI detection.
-    Focus on increasing "perplexity" and "burstiness".
-    1.  **Increase Perplexity:** Rewrite sentences to be less predictable. Use a richer vocabulary and occasionally choose a less common but still correct synonym. Introduce idioms or metaphors.
-    2.  **Increase Burstiness:** Vary the sentence structure dramatically. Mix very short, punchy sentences with much longer, more complex sentences to create a dynamic reading rhythm.
-    3.  **Add a Human Touch:** Incorporate subtle colloquialisms, rhetorical questions, or asides to break the flow. Frame the text as a personal thought or observation.
-    Preserve the core meaning. Only return the rewritten text. Do not include any introductory phrases like "Here is the rewritten text:", titles, or markdown.
-    TEXT TO REWRITE:
-    ---
-    {request.text}
-    ---
-    """
+async def humanize_text(request: HumanizeRequest, response: Response):
+    log.info("humanize.start", chars=len(request.text))
+    started = time.perf_counter()
+    humanize_prompt = build_humanize_prompt(request.text)
+    cache_key = ResponseCache.make_key("humanize", humanize_prompt, model=PRIMARY_MODEL, max_tokens=2048)
+    if request.bypass_cache:
+        response_cache.record_bypass()
+    else:
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            log.info("humanize.cache_hit")
+            return HumanizeResponse(humanized_text=cached)
     humanized_text = None
     try:
-        print("Attempting to humanize with Primary API (DeepSeek)...")
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {OPENROUTER_API_KEY}"}
-            payload = {"model": PRIMARY_MODEL, "messages": [{"role": "user", "content": humanize_prompt}], "max_tokens": 2048}
-            response = await client.post(f"{OPENROUTER_API_BASE}/chat/completions", headers=headers, json=payload, timeout=60)
-            response.raise_for_status()
-            humanized_text = response.json()['choices'][0]['message']['content']
-            print("Primary API (DeepSeek) Succeeded.")
-    except Exception as e:
-        print(f"Primary API (DeepSeek) Failed. Reason: {e}")
-        print("Attempting to humanize with Fallback API (Gemini)...")
+        humanized_text = await call_llm(cache_key, humanize_prompt, json_mode=False)
+    except AllProvidersFailed as e:
+        log.warning("humanize.all_providers_failed", error=str(e))
+        raise HTTPException(status_code=500, detail="Both APIs failed to humanize the text.")
+    humanized_text = humanized_text.strip()
+    await response_cache.set(cache_key, humanized_text)
+    response.headers["Server-Timing"] = server_timing(report_ttfb("/humanize", "buffered", started, time.perf_counter() - started))
+    return HumanizeResponse(humanized_text=humanized_text)
+
+@app.post("/humanize/stream")
+async def humanize_text_stream(request: HumanizeRequest):
+    # Server-sent events: "delta" with each piece of text as it arrives, then "done"
+    # with the full (trimmed) text and timings.
+    log.info("humanize_stream.start", chars=len(request.text))
+    started = time.perf_counter()
+    humanize_prompt = build_humanize_prompt(request.text)
+    cache_key = ResponseCache.make_key("humanize", humanize_prompt, model=PRIMARY_MODEL, max_tokens=2048)
+
+    async def event_stream():
+        if request.bypass_cache:
+            response_cache.record_bypass()
+        else:
+            cached = await response_cache.get(cache_key)
+            if cached is not None:
+                log.info("humanize_stream.cache_hit")
+                yield sse_event("delta", {"text": cached})
+                timing = report_ttfb("/humanize/stream", "cached", started, time.perf_counter() - started)
+                yield sse_event("done", {"humanized_text": cached, **timing})
+                return
+        chunks, ttfb = [], None
         try:
-            response = await gemini_model.generate_content_async(humanize_prompt)
-            humanized_text = response.text
-            print("Fallback API (Gemini) Succeeded.")
-        except Exception as fallback_e:
-            print(f"Fallback API also failed. Reason: {fallback_e}")
-            raise HTTPException(status_code=500, detail="Both APIs failed to humanize the text.")
-    return HumanizeResponse(humanized_text=humanized_text.strip())
+            async with aclosing(app.state.llm_router.stream(humanize_prompt, json_mode=False)) as deltas:
+                async for delta in deltas:
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - started
+                    if not chunks:
+                        delta = delta.lstrip()  # match the .strip() of the buffered endpoint
+                        if not delta:
+                            continue
+                    chunks.append(delta)
+                    yield sse_event("delta", {"text": delta})
+        except AllProvidersFailed as e:
+            log.warning("humanize_stream.all_providers_failed", error=str(e))
+            yield sse_event("error", {"detail": "Both APIs failed to humanize the text."})
+            return
+        except Exception as e:
+            log.warning("humanize_stream.broken", error=str(e))
+            yield sse_event("error", {"detail": f"The humanize stream broke off: {e}"})
+            return
+        humanized_text = "".join(chunks).strip()
+        await response_cache.set(cache_key, humanized_text)
+        timing = report_ttfb("/humanize/stream", "streaming", started, ttfb)
+        yield sse_event("done", {"humanized_text": humanized_text, **timing})
 
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
 
-# --- VIDEO GENERATION ENDPOINT ---
-@app.post("/generate-video")
-async def generate_video(request: VideoRequest):
-    print("\n--- [START] Video Generation ---")
-    
-    video_dir = "static/videos"
-    if not os.path.exists(video_dir):
-        os.makedirs(video_dir)
-        
-    unique_id = httpx.get("https://www.uuidgenerator.net/api/version4").text
-    audio_path = os.path.join(video_dir, f"{unique_id}_audio.mp3")
-    video_path = os.path.join(video_dir, f"{unique_id}_final.mp4")
-    temp_video_files = []
-    final_clips = []
-    audio_clip = None
+@app.get("/cache/stats")
+async def cache_stats():
+    return response_cache.stats()
 
-    try:
-        print("Step 1: Generating audio from script...")
-        tts = gTTS(text=request.script, lang='en', slow=False)
-        tts.save(audio_path)
-        audio_clip = AudioFileClip(audio_path)
-        audio_duration = audio_clip.duration
-        print(f"Audio duration: {audio_duration:.2f} seconds")
-
-        print("Step 2: Searching for stock videos...")
-        PEXELS_API_KEY = os.environ.get("PEXELS_API_KEY")
-        if not PEXELS_API_KEY:
-            raise HTTPException(status_code=500, detail="PEXELS_API_KEY not found in environment variables.")
-            
-        api = API(PEXELS_API_KEY)
-        
-        api.search(request.idea, media_type='videos', page=1, results_per_page=5)
-        videos = api.get_entries()
-        
-        if not videos:
-            raise HTTPException(status_code=404, detail=f"Could not find any stock videos for the idea: '{request.idea}'")
-        
-        print(f"Found {len(videos)} potential videos.")
-
-        print("Step 3: Downloading and assembling video clips...")
-        total_duration = 0
-        for video in videos:
-            if total_duration >= audio_duration:
-                break
-            
-            video_file = next((vf for vf in sorted(video.video_files, key=lambda x: x.height or 0, reverse=True) if vf.height and 720 <= vf.height <= 1920), None)
-            
-            if video_file:
-                try:
-                    temp_path = os.path.join(video_dir, f"temp_{video.id}.mp4")
-                    async with httpx.AsyncClient() as client:
-                        async with client.stream("GET", video_file.link, follow_redirects=True, timeout=60) as response:
-                            response.raise_for_status()
-                            with open(temp_path, "wb") as f:
-                                async for chunk in response.aiter_bytes():
-                                    f.write(chunk)
-                    
-                    temp_video_files.append(temp_path)
-
-                    clip = VideoFileClip(temp_path).set_fps(24)
-                    clip = clip.resize(height=1920)
-                    clip = clip.crop(x_center=clip.w/2, width=1080)
-
-                    final_clips.append(clip)
-                    total_duration += clip.duration
-                except Exception as e:
-                    print(f"Warning: Could not process video {video.id}. Reason: {e}")
-
-        if not final_clips:
-            raise HTTPException(status_code=500, detail="Failed to download or process any video clips.")
-
-        final_video_clip = concatenate_videoclips(final_clips).subclip(0, audio_duration)
-        final_video_clip = final_video_clip.set_audio(audio_clip)
-
-        print("Step 4: Exporting final video...")
-        final_video_clip.write_videofile(video_path, codec="libx264", audio_codec="aac", threads=4)
-        
-        print("--- [SUCCESS] Video Generation Complete ---")
-        return {"video_url": f"/{video_path}"}
+@app.get("/providers/status")
+async def providers_status():
+    return app.state.llm_router.status()
 
-    except Exception as e:
-        print(f"--- [ERROR] Video Generation Failed ---")
-        print(f"Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-        
-    finally:
-        print("Cleaning up temporary files...")
-        if audio_clip: audio_clip.close()
-        for clip in final_clips: clip.close()
-        if 'final_video_clip' in locals() and final_video_clip: final_video_clip.close()
-        
-        for f in [audio_path] + temp_video_files:
-             if f and os.path.exists(f):
-                try: os.remove(f)
-                except Exception as e: print(f"Error cleaning up file {f}: {e}")
+@app.get("/admission/stats")
+async def admission_stats():
+    return admission.stats()
+
+@app.get("/metrics")
+async def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+# --- VIDEO GENERATION ENDPOINTS ---
+# Rendering runs in a bounded process pool (video_jobs); the request only enqueues it.
+@app.post("/generate-video", status_code=202)
+async def generate_video(request: VideoRequest):
+    try:
+        job = await app.state.video_jobs.submit(request.script, request.idea)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    log.info("video_job.queued", job_id=job["job_id"])
+    return {"job_id": job["job_id"], "status": job["status"], "status_url": f"/jobs/{job['job_id']}"}
+
+@app.get("/videos/stats")
+async def video_storage_stats():
+    return video_retention.stats()
+
+# Finished renders. FileResponse answers Range requests (206, If-Range) so players can
+# seek without downloading the whole file; faststart output lets playback begin at once.
+@app.api_route("/videos/{name}", methods=["GET", "HEAD"])
+async def serve_video(name: str):
+    path = VIDEO_DIR / name
+    if not VIDEO_NAME_RE.match(name) or not path.is_file():
+        raise HTTPException(status_code=404, detail="Video not found.")
+    return FileResponse(path, media_type="video/mp4", headers={"Cache-Control": VIDEO_CACHE_CONTROL})
+
+@app.get("/jobs/stats")
+async def video_job_stats():
+    return app.state.video_jobs.stats()
+
+@app.get("/jobs/{job_id}")
+async def video_job_status(job_id: str):
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Unknown job id.")
+    job = await app.state.video_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id.")
+    return job
 
 # --- FILE SERVING ---
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
@@ -0,0 +1,246 @@
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from logs import get_logger
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]  # (name suffix, labels, value)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+STAGE_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+
+# --- METRIC TYPES ---
+# A small, dependency-free subset of the Prometheus client: counters, gauges and
+# histograms with labels, rendered in the text exposition format by /metrics.
+# Updates take one uncontended lock, so they are cheap enough for the hot path
+# and safe from executor callback threads.
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [("_total", self._labels(key), value) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [("", self._labels(key), value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        with self._lock:
+            series_items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in series_items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append(("_bucket", {**labels, "le": "+Inf"}, series[-1]))
+            samples.append(("_sum", labels, series[-2]))
+            samples.append(("_count", labels, series[-1]))
+        return samples
+
+
+# --- REGISTRY ---
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        # Callbacks that read live values (cache stats, queue depth) at scrape time.
+        self._collectors: List[Callable[[], Iterable[Tuple[_Metric, List[Sample]]]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[_Metric, List[Sample]]]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        collected = []
+        for collector in self._collectors:
+            try:
+                collected.extend(collector())
+            except Exception as e:
+                name = getattr(collector, "__name__", "?")
+                collector_errors.inc(collector=name)
+                log.warning("metrics.collector_failed", collector=name, error=str(e))
+        families = [(metric, metric.samples()) for metric in self._metrics] + collected
+        lines = []
+        for metric, samples in families:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for suffix, labels, value in samples:
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+REGISTRY = Registry()
+log = get_logger("metrics")
+
+
+# --- APPLICATION METRICS ---
+collector_errors = REGISTRY.counter("metrics_collector_errors", "Collectors that raised during a scrape.", ["collector"])
+http_request_seconds = REGISTRY.histogram(
+    "http_request_duration_seconds", "Request latency by route (streams: until the last byte).", ["method", "route", "status"])
+http_in_flight = REGISTRY.gauge("http_requests_in_flight", "Requests currently being served.")
+llm_provider_seconds = REGISTRY.histogram(
+    "llm_provider_duration_seconds", "Upstream LLM call latency by provider and outcome.", ["provider", "mode", "outcome"])
+llm_fallbacks = REGISTRY.counter(
+    "llm_fallbacks", "Calls that moved on to a later provider after an earlier one failed or was skipped.", ["provider"])
+llm_hedges = REGISTRY.counter("llm_hedges", "Hedged requests started against a backup provider.", ["provider"])
+llm_circuit_skips = REGISTRY.counter("llm_circuit_open_skips", "Calls that skipped a provider with an open breaker.", ["provider"])
+llm_parse_errors = REGISTRY.counter("llm_parse_errors", "Model responses that failed JSON or schema validation.", ["endpoint"])
+stream_ttfb_seconds = REGISTRY.histogram(
+    "llm_time_to_first_byte_seconds", "Request start to first content byte.", ["endpoint", "mode"])
+video_stage_seconds = REGISTRY.histogram(
+    "video_stage_duration_seconds", "Wall-clock span of each render stage, by final job status.", ["stage", "status"],
+    buckets=STAGE_BUCKETS)
+video_jobs_finished = REGISTRY.counter("video_jobs_finished", "Render jobs by final status.", ["status"])
+
+
+# --- ASGI MIDDLEWARE ---
+class MetricsMiddleware:
+    """Times every HTTP request, labelled by route template (not raw path) to keep cardinality bounded."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request_seconds.observe(time.perf_counter() - start, method=scope["method"], route=route,
+                                         status=str(status["code"]))
+
+
+def collector_from_stats(name: str, documentation: str, type_name: str, stats: Callable[[], dict],
+                         label: str, keys: Optional[Sequence[str]] = None):
+    """Expose selected numeric fields of a stats() dict as one labelled metric family."""
+    metric = (Counter if type_name == "counter" else Gauge)(name, documentation, [label])
+    suffix = "_total" if type_name == "counter" else ""
+
+    def collect():
+        values = stats()
+        fields = keys if keys is not None else [k for k, v in values.items() if isinstance(v, (int, float))]
+        return [(metric, [(suffix, {label: field}, values[field]) for field in fields if field in values])]
+    collect.__name__ = name
+    return collect
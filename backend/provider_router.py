@@ -0,0 +1,313 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional, Protocol
+
+from admission import BudgetExhausted, ProviderBudget
+from logs import get_logger
+from metrics import llm_circuit_skips, llm_fallbacks, llm_hedges, llm_provider_seconds
+
+log = get_logger("router")
+
+
+# --- PROVIDER INTERFACE ---
+class Provider(Protocol):
+    name: str
+
+    async def complete(self, prompt: str, max_tokens: int = 2048, json_mode: bool = True) -> str: ...
+
+    def stream(self, prompt: str, max_tokens: int = 2048, json_mode: bool = True) -> AsyncIterator[str]: ...
+
+
+class AllProvidersFailed(Exception):
+    def __init__(self, errors: Dict[str, BaseException]):
+        self.errors = errors
+        super().__init__(", ".join(f"{name}: {error}" for name, error in errors.items()) or "No provider available.")
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+@dataclass
+class RouterResult:
+    text: str
+    provider: str
+    hedged: bool = False
+
+
+# --- CIRCUIT BREAKER ---
+class CircuitBreaker:
+    """Rolling-window breaker that opens on error rate or on p95 latency."""
+
+    def __init__(self, window: int = 20, min_calls: int = 5, error_threshold: float = 0.5,
+                 latency_threshold: Optional[float] = None, cooldown: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.latency_threshold = latency_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self._samples: deque = deque(maxlen=window)  # (ok, latency)
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self.clock() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self, latency: float):
+        self._record(True, latency)
+
+    def record_failure(self, latency: float):
+        self._record(False, latency)
+
+    def release_probe(self):
+        # A half-open probe that was cancelled (e.g. lost a hedge race) proved nothing either way.
+        self._probe_in_flight = False
+
+    def latency_percentile(self, pct: float = 95) -> Optional[float]:
+        latencies = sorted(latency for ok, latency in self._samples if ok)
+        if len(latencies) < self.min_calls:
+            return None
+        return latencies[min(len(latencies) - 1, int(round(pct / 100 * (len(latencies) - 1))))]
+
+    def _record(self, ok: bool, latency: float):
+        was_probe = self._probe_in_flight
+        self._probe_in_flight = False
+        if was_probe:
+            if ok:
+                self._opened_at = None
+                self._samples.clear()
+            else:
+                self._opened_at = self.clock()
+            self._samples.append((ok, latency))
+            return
+        self._samples.append((ok, latency))
+        if self._opened_at is None and self._should_open():
+            self._opened_at = self.clock()
+
+    def _should_open(self) -> bool:
+        if len(self._samples) < self.min_calls:
+            return False
+        errors = sum(1 for ok, _ in self._samples if not ok)
+        if errors / len(self._samples) >= self.error_threshold:
+            return True
+        if self.latency_threshold is not None:
+            p95 = self.latency_percentile(95)
+            return p95 is not None and p95 >= self.latency_threshold
+        return False
+
+    def snapshot(self) -> dict:
+        errors = sum(1 for ok, _ in self._samples if not ok)
+        return {"state": self.state, "samples": len(self._samples), "errors": errors,
+                "p95_latency": self.latency_percentile(95)}
+
+
+# --- ROUTER ---
+class ProviderRouter:
+    """
+    Tries providers in order. A provider whose breaker is open is skipped. With
+    hedging enabled the next provider is started once the current one has run
+    longer than its own p95 latency; the first success wins and the rest are cancelled.
+    Each call first takes a slot from the provider's concurrency budget; a call that
+    can't get one in time moves on to the next provider without counting against the
+    breaker (the upstream did nothing wrong), and latencies start once the slot is held.
+    """
+
+    def __init__(self, providers: List[Provider], breakers: Optional[Dict[str, CircuitBreaker]] = None,
+                 hedge: bool = False, hedge_default_delay: float = 5.0, hedge_min_delay: float = 0.5,
+                 hedge_max_delay: float = 20.0, clock: Callable[[], float] = time.monotonic,
+                 budgets: Optional[Dict[str, ProviderBudget]] = None):
+        self.providers = providers
+        self.breakers = breakers or {p.name: CircuitBreaker(clock=clock) for p in providers}
+        self.budgets = budgets or {}
+        self.hedge = hedge
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.clock = clock
+
+    @classmethod
+    def from_env(cls, providers: List[Provider]) -> "ProviderRouter":
+        latency_threshold = os.environ.get("LLM_BREAKER_LATENCY_THRESHOLD")
+        breakers = {p.name: CircuitBreaker(
+            window=int(os.environ.get("LLM_BREAKER_WINDOW", 20)),
+            min_calls=int(os.environ.get("LLM_BREAKER_MIN_CALLS", 5)),
+            error_threshold=float(os.environ.get("LLM_BREAKER_ERROR_THRESHOLD", 0.5)),
+            latency_threshold=float(latency_threshold) if latency_threshold else None,
+            cooldown=float(os.environ.get("LLM_BREAKER_COOLDOWN", 30)),
+        ) for p in providers}
+        return cls(providers, breakers=breakers, budgets={p.name: ProviderBudget.from_env(p.name) for p in providers},
+                   hedge=os.environ.get("LLM_HEDGE_ENABLED", "").lower() in ("1", "true", "yes", "on"),
+                   hedge_default_delay=float(os.environ.get("LLM_HEDGE_DEFAULT_DELAY", 5.0)),
+                   hedge_min_delay=float(os.environ.get("LLM_HEDGE_MIN_DELAY", 0.5)),
+                   hedge_max_delay=float(os.environ.get("LLM_HEDGE_MAX_DELAY", 20.0)))
+
+    def hedge_delay(self, provider: Provider) -> float:
+        p95 = self.breakers[provider.name].latency_percentile(95)
+        if p95 is None:
+            return self.hedge_default_delay
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, p95))
+
+    def status(self) -> dict:
+        return {name: {**breaker.snapshot(), **({"budget": self.budgets[name].stats()} if name in self.budgets else {})}
+                for name, breaker in self.breakers.items()}
+
+    @asynccontextmanager
+    async def _budget_slot(self, provider: Provider):
+        budget = self.budgets.get(provider.name)
+        if budget is None:
+            yield
+            return
+        async with budget.slot():
+            yield
+
+    async def _complete_in_budget(self, provider: Provider, entry: list, prompt: str, max_tokens: int, json_mode: bool) -> str:
+        async with self._budget_slot(provider):
+            entry[1] = self.clock()  # time the upstream call, not the wait for a slot
+            return await provider.complete(prompt, max_tokens=max_tokens, json_mode=json_mode)
+
+    async def complete(self, prompt: str, max_tokens: int = 2048, json_mode: bool = True) -> RouterResult:
+        errors: Dict[str, BaseException] = {}
+        pending_providers, probing = [], set()
+        for provider in self.providers:
+            breaker = self.breakers[provider.name]
+            half_open = breaker.state == "half_open"
+            if breaker.allow():
+                pending_providers.append(provider)
+                if half_open:
+                    probing.add(provider.name)
+            else:
+                errors[provider.name] = CircuitOpen(f"circuit open for {provider.name}")
+                llm_circuit_skips.inc(provider=provider.name)
+
+        running: Dict[asyncio.Task, list] = {}  # task -> [provider, started_at]
+        hedged = False
+
+        def launch(hedge: bool = False):
+            provider = pending_providers.pop(0)
+            entry = [provider, self.clock()]
+            task = asyncio.create_task(self._complete_in_budget(provider, entry, prompt, max_tokens, json_mode))
+            running[task] = entry
+            if hedge:
+                llm_hedges.inc(provider=provider.name)
+            elif provider is not self.providers[0]:
+                llm_fallbacks.inc(provider=provider.name)
+            return provider
+
+        try:
+            if pending_providers:
+                launch()
+            while running:
+                wait_timeout = None
+                if self.hedge and pending_providers:
+                    newest_provider, started_at = list(running.values())[-1]
+                    wait_timeout = max(0.0, self.hedge_delay(newest_provider) - (self.clock() - started_at))
+                done, _ = await asyncio.wait(running.keys(), timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    log.info("router.hedge", provider=launch(hedge=True).name)
+                    continue
+                for task in done:
+                    provider, started_at = running.pop(task)
+                    latency = self.clock() - started_at
+                    breaker = self.breakers[provider.name]
+                    error = task.exception()
+                    if isinstance(error, BudgetExhausted):
+                        # Never reached the upstream; a claimed half-open probe is released in finally.
+                        errors[provider.name] = error
+                        log.warning("router.budget_exhausted", provider=provider.name, error=str(error))
+                        continue
+                    probing.discard(provider.name)
+                    if error is None:
+                        breaker.record_success(latency)
+                        llm_provider_seconds.observe(latency, provider=provider.name, mode="complete", outcome="ok")
+                        return RouterResult(text=task.result(), provider=provider.name, hedged=hedged)
+                    breaker.record_failure(latency)
+                    llm_provider_seconds.observe(latency, provider=provider.name, mode="complete", outcome="error")
+                    errors[provider.name] = error
+                    log.warning("router.provider_failed", provider=provider.name, latency_s=round(latency, 3), error=str(error))
+                if not running and pending_providers:
+                    launch()
+            raise AllProvidersFailed(errors)
+        finally:
+            # Cancel the losers (or everything, if our caller was cancelled).
+            for task, (provider, started_at) in running.items():
+                task.cancel()
+                llm_provider_seconds.observe(self.clock() - started_at, provider=provider.name, mode="complete",
+                                             outcome="cancelled")
+            # Half-open probes we claimed but never resolved (cancelled or never launched) prove nothing.
+            for name in probing:
+                self.breakers[name].release_probe()
+
+    async def stream(self, prompt: str, max_tokens: int = 2048, json_mode: bool = True) -> AsyncIterator[str]:
+        """
+        Yields text deltas from the first provider that produces one. Failover only
+        happens before the first delta; once text has reached the caller a failure
+        is raised as is. Streams are not hedged.
+        """
+        errors: Dict[str, BaseException] = {}
+        for provider in self.providers:
+            breaker = self.breakers[provider.name]
+            probe = breaker.state == "half_open"
+            if not breaker.allow():
+                errors[provider.name] = CircuitOpen(f"circuit open for {provider.name}")
+                llm_circuit_skips.inc(provider=provider.name)
+                continue
+            if provider is not self.providers[0]:
+                llm_fallbacks.inc(provider=provider.name)
+            started_at, emitted, resolved = self.clock(), False, False
+            try:
+                # The slot is held until the stream ends. aclosing: if our consumer stops early, the
+                # upstream HTTP stream is closed now, not at GC.
+                async with self._budget_slot(provider):
+                    started_at = self.clock()
+                    async with aclosing(provider.stream(prompt, max_tokens=max_tokens, json_mode=json_mode)) as deltas:
+                        async for delta in deltas:
+                            emitted = True
+                            yield delta
+                breaker.record_success(self.clock() - started_at)
+                llm_provider_seconds.observe(self.clock() - started_at, provider=provider.name, mode="stream", outcome="ok")
+                resolved = True
+                return
+            except BudgetExhausted as error:
+                resolved = True
+                if probe:
+                    breaker.release_probe()
+                errors[provider.name] = error
+                log.warning("router.budget_exhausted", provider=provider.name, error=str(error))
+            except Exception as error:
+                latency = self.clock() - started_at
+                breaker.record_failure(latency)
+                llm_provider_seconds.observe(latency, provider=provider.name, mode="stream", outcome="error")
+                resolved = True
+                if emitted:
+                    raise
+                errors[provider.name] = error
+                log.warning("router.stream_failed", provider=provider.name, latency_s=round(latency, 3), error=str(error))
+            finally:
+                # The consumer went away mid-stream: like a cancelled call, that proves nothing.
+                if not resolved:
+                    llm_provider_seconds.observe(self.clock() - started_at, provider=provider.name, mode="stream",
+                                                 outcome="cancelled")
+                    if probe:
+                        breaker.release_probe()
+        raise AllProvidersFailed(errors)
@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from logs import get_logger
+
+log = get_logger("response_cache")
+
+
+# --- RESPONSE CACHE ---
+# Two tiers: a bounded in-memory LRU in front of an optional SQLite file, or of a shared
+# store (Redis, see shared_state) when workers run on several hosts.
+# Values must be JSON-serializable; they are stored serialized so their size is known.
+class ResponseCache:
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024, default_ttl: float = 3600.0,
+                 sqlite_path: Optional[str] = None, sqlite_max_bytes: int = 256 * 1024 * 1024, shared=None,
+                 sqlite_prune_every: int = 100, sqlite_busy_timeout: float = 5.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.sqlite_path = sqlite_path
+        self.sqlite_max_bytes = sqlite_max_bytes
+        self.sqlite_prune_every = sqlite_prune_every
+        self.sqlite_busy_timeout = sqlite_busy_timeout  # how long to wait on another worker's write lock
+        self.shared = shared if not sqlite_path else None
+        self._memory: "OrderedDict[str, tuple[float, int, str]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._db_writes = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0, "bypassed": 0}
+
+    @classmethod
+    def from_env(cls, shared=None) -> "ResponseCache":
+        # With a shared SQLite state file the cache table lives in it too, keeping its size budget.
+        sqlite_path = os.environ.get("RESPONSE_CACHE_SQLITE_PATH") or getattr(shared, "path", None)
+        return cls(
+            max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 1024)),
+            max_bytes=int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+            default_ttl=float(os.environ.get("RESPONSE_CACHE_TTL", 3600)),
+            sqlite_path=sqlite_path,
+            sqlite_max_bytes=int(os.environ.get("RESPONSE_CACHE_SQLITE_MAX_BYTES", 256 * 1024 * 1024)),
+            sqlite_prune_every=int(os.environ.get("RESPONSE_CACHE_SQLITE_PRUNE_EVERY", 100)),
+            sqlite_busy_timeout=float(os.environ.get("RESPONSE_CACHE_SQLITE_BUSY_TIMEOUT", 5.0)),
+            shared=shared,
+        )
+
+    @staticmethod
+    def make_key(namespace: str, prompt: str, **params) -> str:
+        # build_prompt output carries incidental indentation and blank lines; collapse
+        # whitespace so cosmetic prompt edits don't split otherwise identical entries.
+        normalized = re.sub(r"\s+", " ", prompt).strip()
+        material = json.dumps({"ns": namespace, "prompt": normalized, "params": params}, sort_keys=True)
+        return f"{namespace}:{hashlib.sha256(material.encode('utf-8')).hexdigest()}"
+
+    # --- public API ---
+    async def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, _, payload = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return json.loads(payload)
+            self._drop_memory(key)
+            self.counters["expired"] += 1
+        if self.sqlite_path:
+            try:
+                row = await asyncio.to_thread(self._db_get, key, now)
+            except sqlite3.Error as e:
+                # e.g. "database is locked" with several workers on one file: a miss, not a failed request.
+                log.warning("response_cache.sqlite_get_failed", error=str(e))
+                row = None
+            if row is not None:
+                expires_at, payload = row
+                self._put_memory(key, expires_at, payload)
+                self.counters["disk_hits"] += 1
+                return json.loads(payload)
+        elif self.shared is not None:
+            try:
+                entry = await self.shared.get("cache:" + key)
+            except Exception as e:
+                # Shared tier unreachable: behave as a miss rather than fail the request.
+                log.warning("response_cache.shared_get_failed", error=str(e))
+                entry = None
+            if entry is not None:
+                payload, expires_at = entry
+                self._put_memory(key, expires_at, payload)
+                self.counters["disk_hits"] += 1
+                return json.loads(payload)
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        payload = json.dumps(value)
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        self._put_memory(key, expires_at, payload)
+        self.counters["sets"] += 1
+        if self.sqlite_path:
+            try:
+                await asyncio.to_thread(self._db_set, key, expires_at, payload)
+            except sqlite3.Error as e:
+                log.warning("response_cache.sqlite_set_failed", error=str(e))
+        elif self.shared is not None:
+            try:
+                await self.shared.set("cache:" + key, payload, expires_at - time.time())
+            except Exception as e:
+                log.warning("response_cache.shared_set_failed", error=str(e))
+
+    def record_bypass(self):
+        self.counters["bypassed"] += 1
+
+    def stats(self) -> dict:
+        lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        return {**self.counters, "entries": len(self._memory), "bytes": self._memory_bytes,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0}
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # --- memory tier ---
+    def _put_memory(self, key: str, expires_at: float, payload: str):
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        if key in self._memory:
+            self._drop_memory(key)
+        self._memory[key] = (expires_at, size, payload)
+        self._memory_bytes += size
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes:
+            oldest = next(iter(self._memory))
+            self._drop_memory(oldest)
+            self.counters["evictions"] += 1
+
+    def _drop_memory(self, key: str):
+        _, size, _ = self._memory.pop(key)
+        self._memory_bytes -= size
+
+    # --- sqlite tier (runs in a worker thread) ---
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.sqlite_path, timeout=self.sqlite_busy_timeout, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS response_cache (key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+                             "size INTEGER NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS response_cache_accessed ON response_cache (accessed_at)")
+        return self._db
+
+    def _db_get(self, key: str, now: float):
+        with self._db_lock:
+            db = self._connection()
+            with db:  # commits, or rolls back on error so a failed call doesn't keep the write lock
+                row = db.execute("SELECT expires_at, payload FROM response_cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if row[0] <= now:
+                    db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                    return None
+                db.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                return row
+
+    def _db_set(self, key: str, expires_at: float, payload: str):
+        now = time.time()
+        with self._db_lock:
+            db = self._connection()
+            with db:
+                db.execute("INSERT OR REPLACE INTO response_cache (key, payload, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                           (key, payload, len(payload), expires_at, now))
+                self._db_writes += 1
+                # Expiry and the size budget scan the whole table, so only every N writes per
+                # process; the file may run over its budget by that much in between.
+                if self._db_writes % self.sqlite_prune_every == 0:
+                    self._db_prune(db, now)
+
+    def _db_prune(self, db: sqlite3.Connection, now: float):
+        db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+        if total <= self.sqlite_max_bytes:
+            return
+        # Drop least recently used rows until we're back under budget.
+        for old_key, size in db.execute("SELECT key, size FROM response_cache ORDER BY accessed_at").fetchall():
+            if total <= self.sqlite_max_bytes:
+                break
+            db.execute("DELETE FROM response_cache WHERE key = ?", (old_key,))
+            total -= size
+            self.counters["evictions"] += 1
@@ -1,4 +1,5 @@
 import uvicorn
 
+# Development server (one process, auto-reload). For production use serve.py.
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
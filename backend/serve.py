@@ -0,0 +1,54 @@
+import argparse
+import os
+from pathlib import Path
+
+import uvicorn
+
+# Production entry point (run.py is the single-process dev server with reload):
+#   python serve.py --workers 4 --host 0.0.0.0 --port 8000
+# Runs N uvicorn worker processes on one socket; uvicorn's supervisor restarts workers that
+# die or stop answering its health pings. With more than one worker, rate limits, the
+# response cache and job records go through shared state (see shared_state): a SQLite file
+# under the data dir by default, or Redis with --shared-state redis://host:6379/0.
+#
+# Per-process limits (ADMISSION_MAX_CONCURRENT, <PROVIDER>_MAX_CONCURRENCY, VIDEO_MAX_WORKERS)
+# apply to each worker, so divide them by --workers when sizing against an upstream quota.
+#
+# Shutdown (SIGTERM or Ctrl-C): workers stop accepting connections, finish open requests
+# within --graceful-timeout, then let in-flight video renders finish for up to
+# --drain-timeout before exiting. Give the process manager a stop timeout at least that long.
+BACKEND_DIR = Path(__file__).resolve().parent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes.")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--shared-state", default=os.environ.get("SHARED_STATE_URL"),
+                        help="sqlite:///<path> or redis://<host>. Defaults to a SQLite file when --workers > 1.")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                        help="Seconds to let open HTTP requests (streams included) finish on shutdown.")
+    parser.add_argument("--drain-timeout", type=float, default=float(os.environ.get("VIDEO_DRAIN_TIMEOUT", 300)),
+                        help="Seconds to let in-flight video renders finish on shutdown.")
+    parser.add_argument("--forwarded-allow-ips", default=os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+                        help="Proxies trusted for X-Forwarded-For (the client IP rate limits key on).")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    shared_state = args.shared_state
+    if not shared_state and args.workers > 1:
+        data_dir = Path(os.environ.get("APP_DATA_DIR") or BACKEND_DIR / "data")
+        shared_state = f"sqlite:///{(data_dir / 'shared_state.sqlite3').resolve()}"
+    # Workers read their configuration from the environment, which they inherit.
+    if shared_state:
+        os.environ["SHARED_STATE_URL"] = shared_state
+    os.environ["VIDEO_DRAIN_TIMEOUT"] = str(args.drain_timeout)
+
+    uvicorn.run("main:app", app_dir=str(BACKEND_DIR), host=args.host, port=args.port, workers=args.workers,
+                proxy_headers=True, forwarded_allow_ips=args.forwarded_allow_ips,
+                timeout_graceful_shutdown=args.graceful_timeout, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
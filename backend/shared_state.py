@@ -0,0 +1,172 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from logs import get_logger
+
+log = get_logger("shared_state")
+
+
+# --- SHARED STATE ---
+# State that has to agree across API worker processes (see serve.py): rate-limit buckets,
+# the response cache's second tier and video job records. SHARED_STATE_URL picks the backend:
+#   unset                  in-process only (one worker; what run.py uses)
+#   sqlite:////abs/path.db one SQLite file (WAL) shared by every worker on this host
+#   redis://host:6379/0    Redis or a compatible server (Valkey, KeyDB, ...), for several hosts
+def shared_state_from_env():
+    url = os.environ.get("SHARED_STATE_URL", "").strip()
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteState(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisState(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL '{url}'. Use sqlite:///<path> or redis://<host>.")
+
+
+def redis_client(url: str, asyncio_client: bool = True):
+    try:
+        import redis
+        import redis.asyncio
+    except ImportError:
+        raise RuntimeError("SHARED_STATE_URL points at Redis but the 'redis' package is not installed "
+                           "(pip install redis).") from None
+    module = redis.asyncio if asyncio_client else redis
+    return module.Redis.from_url(url, decode_responses=True)
+
+
+# --- SQLITE BACKEND ---
+# Every call is one short transaction in a worker thread. BEGIN IMMEDIATE takes the write
+# lock up front, so a read-modify-write (a token bucket) is atomic across processes.
+class SQLiteState:
+    name = "sqlite"
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._takes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                       check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                             "expires_at REAL NOT NULL)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS token_buckets (bucket TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                             "updated_at REAL NOT NULL)")
+        return self._db
+
+    async def get(self, key: str) -> Optional[Tuple[str, float]]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str, ttl: float):
+        await asyncio.to_thread(self._set, key, value, time.time() + ttl)
+
+    async def take_tokens(self, bucket: str, cost: float, rate: float, burst: float) -> float:
+        return await asyncio.to_thread(self._take_tokens, bucket, cost, rate, burst)
+
+    async def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _get(self, key: str):
+        with self._lock:
+            row = self._connection().execute("SELECT value, expires_at FROM kv WHERE key = ? AND expires_at > ?",
+                                             (key, time.time())).fetchone()
+        return tuple(row) if row else None
+
+    def _set(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            db = self._connection()
+            db.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", (key, value, expires_at))
+            db.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+
+    def _take_tokens(self, bucket: str, cost: float, rate: float, burst: float) -> float:
+        now = time.time()  # wall clock: monotonic clocks aren't comparable across processes
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT tokens, updated_at FROM token_buckets WHERE bucket = ?", (bucket,)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+                wait = 0.0
+                if tokens >= cost:
+                    tokens -= cost
+                else:
+                    wait = (min(cost, burst) - tokens) / rate
+                db.execute("INSERT OR REPLACE INTO token_buckets (bucket, tokens, updated_at) VALUES (?, ?, ?)",
+                           (bucket, tokens, now))
+                self._takes += 1
+                if self._takes % 1000 == 0:
+                    # A bucket idle long enough to have refilled is the same as no row at all.
+                    db.execute("DELETE FROM token_buckets WHERE updated_at < ?", (now - burst / rate,))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return wait
+
+
+# --- REDIS BACKEND ---
+# The bucket update runs as a Lua script, so it is atomic and uses the server's clock.
+TOKEN_BUCKET_LUA = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local cost, rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then tokens = tokens - cost else wait = (math.min(cost, burst) - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisState:
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "app:"):
+        self.url = url
+        self.prefix = prefix
+        self._client = None
+        self._take_script = None
+
+    def client(self):
+        # Created on first use, inside the event loop that will use it.
+        if self._client is None:
+            self._client = redis_client(self.url)
+            self._take_script = self._client.register_script(TOKEN_BUCKET_LUA)
+        return self._client
+
+    async def get(self, key: str) -> Optional[Tuple[str, float]]:
+        async with self.client().pipeline(transaction=False) as pipe:
+            value, ttl_ms = await pipe.get(self.prefix + key).pttl(self.prefix + key).execute()
+        if value is None:
+            return None
+        return value, time.time() + (ttl_ms / 1000 if ttl_ms > 0 else 0)
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self.client().set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+
+    async def take_tokens(self, bucket: str, cost: float, rate: float, burst: float) -> float:
+        self.client()
+        wait = await self._take_script(keys=[f"{self.prefix}bucket:{bucket}"], args=[cost, rate, burst])
+        return float(wait)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from logs import get_logger
+from metrics import REGISTRY
+
+log = get_logger("singleflight")
+
+singleflight_calls = REGISTRY.counter(
+    "singleflight_calls", "Calls through the in-flight deduplicator, by role (leader ran it, follower joined).",
+    ["namespace", "role"])
+
+
+# --- IN-FLIGHT DEDUPLICATION ---
+# Identical concurrent calls (same key) share one task: the first caller starts it,
+# later callers await the same result instead of issuing their own upstream request.
+# Every caller awaits through asyncio.shield, so a client that disconnects only
+# cancels its own wait; the shared task is cancelled once no caller is left.
+# Results are shared objects: return something immutable (text, a frozen result),
+# not a model that callers go on to mutate.
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[str, list] = {}  # key -> [task, waiters]
+        self.counters = {"leaders": 0, "coalesced": 0, "abandoned": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        namespace = key.split(":", 1)[0]
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(fn())
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+            self.counters["leaders"] += 1
+            singleflight_calls.inc(namespace=namespace, role="leader")
+        else:
+            self.counters["coalesced"] += 1
+            singleflight_calls.inc(namespace=namespace, role="follower")
+            log.debug("singleflight.coalesced", key=key, waiters=call[1] + 1)
+        task = call[0]
+        call[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            call[1] -= 1
+            if call[1] == 0 and not task.done():
+                # Last interested caller left: stop the upstream work, and let the
+                # next identical call start afresh rather than join a dying task.
+                self.counters["abandoned"] += 1
+                self._forget(key, task)
+                task.cancel()
+            raise
+
+    def _forget(self, key: str, task: asyncio.Future):
+        call = self._calls.get(key)
+        if call is not None and call[0] is task:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {**self.counters, "in_flight": len(self._calls)}
@@ -44,6 +44,7 @@ document.addEventListener('DOMContentLoaded', () => {
     let femaleVoice = null;
     let selectedGender = 'female';
     let activeVersionIndex = 0;
+    let scoringMode = null; // server's VIRALITY_MODE; 'deferred' means scores come from /score
 
     // --- INITIALIZE SPEECH SYNTHESIS ---
     const synth = window.speechSynthesis;
@@ -128,7 +129,7 @@ document.addEventListener('DOMContentLoaded', () => {
         humanizeBtn.disabled = true;
         editBtn.disabled = true;
         try {
-            const response = await fetch(`${backendUrl}/humanize`, {
+            const response = await fetch(`${backendUrl}/humanize/stream`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ text: currentText }),
@@ -137,10 +138,21 @@ document.addEventListener('DOMContentLoaded', () => {
                 const errorData = await response.json().catch(() => ({ detail: "An unknown error occurred." }));
                 throw new Error(`HTTP error! Status: ${response.status} - ${errorData.detail}`);
             }
-            const data = await response.json();
-            outputText.value = data.humanized_text;
+            // Text appears as the model writes it; "done" carries the final, trimmed version.
+            let streamed = '';
+            await readEventStream(response.body.getReader(), (eventName, payload) => {
+                if (eventName === 'delta') {
+                    streamed += payload.text;
+                    outputText.value = streamed;
+                } else if (eventName === 'done') {
+                    outputText.value = payload.humanized_text;
+                } else if (eventName === 'error') {
+                    throw new Error(payload.detail);
+                }
+            });
         } catch (error) {
             console.error('Humanize Error:', error);
+            outputText.value = currentText;
             alert(`Could not humanize text. \nDetails: ${error.message}`);
         } finally {
             humanizeBtn.innerHTML = originalIcon;
@@ -184,7 +196,7 @@ document.addEventListener('DOMContentLoaded', () => {
             refinement_instruction: instruction
         };
         try {
-            const response = await fetch(`${backendUrl}/refine`, {
+            const response = await fetch(`${backendUrl}/refine/stream`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(currentSettings),
@@ -193,11 +205,25 @@ document.addEventListener('DOMContentLoaded', () => {
                 const errorData = await response.json().catch(() => ({ detail: "An unknown error occurred." }));
                 throw new Error(`HTTP error! Status: ${response.status} - ${errorData.detail}`);
             }
-            const newVersion = await response.json();
-            generatedVersions[activeVersionIndex] = newVersion;
+            // "delta" events fill in the content as it is written; "version" replaces it with the validated result.
+            const draft = {};
+            let refined = false;
+            await readEventStream(response.body.getReader(), (eventName, payload) => {
+                if (eventName === 'delta') {
+                    appendAtPath(draft, payload.path, payload.text);
+                    outputText.value = formatDraftContent(draft.content);
+                } else if (eventName === 'version') {
+                    generatedVersions[activeVersionIndex] = payload;
+                    refined = true;
+                } else if (eventName === 'error') {
+                    throw new Error(payload.detail);
+                }
+            });
+            if (!refined) throw new Error("The refinement stream ended without a result.");
             showVersion(activeVersionIndex);
         } catch (error) {
             console.error('Refine Error:', error);
+            showVersion(activeVersionIndex);
             alert(`Could not refine content. \nDetails: ${error.message}`);
         } finally {
             submitRefineBtn.textContent = originalText;
@@ -234,8 +260,11 @@ document.addEventListener('DOMContentLoaded', () => {
                 const errorData = await response.json().catch(() => ({ detail: "An unknown error occurred." }));
                 throw new Error(`HTTP error! Status: ${response.status} - ${errorData.detail}`);
             }
-            const data = await response.json();
-            videoPlayer.src = data.video_url + `?t=${new Date().getTime()}`;
+            const job = await response.json();
+            const data = await waitForVideoJob(job.status_url);
+            // Small screens get the low-res preview; every URL is unique per job, so no cache-busting.
+            const usePreview = data.preview_url && window.matchMedia('(max-width: 768px)').matches;
+            videoPlayer.src = usePreview ? data.preview_url : data.video_url;
             videoPlayerContainer.classList.remove('hidden');
             videoPlayer.load();
         } catch (error) {
@@ -247,6 +276,23 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    async function waitForVideoJob(statusUrl) {
+        // Rendering happens in a background job; poll until it finishes.
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 2000));
+            const response = await fetch(`${backendUrl}${statusUrl}`);
+            if (!response.ok) {
+                const errorData = await response.json().catch(() => ({ detail: "An unknown error occurred." }));
+                throw new Error(`HTTP error! Status: ${response.status} - ${errorData.detail}`);
+            }
+            const job = await response.json();
+            if (job.status === 'done') return job;
+            if (job.status === 'failed' || job.status === 'expired') throw new Error(job.error || 'Video rendering failed.');
+            const percent = Math.round((job.progress || 0) * 100);
+            generateVideoBtn.innerHTML = `<i class="fas fa-spinner fa-spin"></i> Assembling Video... ${percent}%`;
+        }
+    }
+
     // --- TTS FUNCTIONS ---
     function speakText() {
         if (synth.speaking) { return; }
@@ -288,22 +334,36 @@ document.addEventListener('DOMContentLoaded', () => {
         }
         setLoadingState(true);
         clearResults();
+        scoringMode = null;
+        const requestBody = JSON.stringify({ idea, platform: selectedPlatform, tone, creativity, formality, smart_emojis: smartEmojis, auto_hashtag: autoHashtag, contextual_suggestions: contextualSuggestions, target_audience: targetAudience });
         try {
-            const response = await fetch(`${backendUrl}/generate`, {
+            const response = await fetch(`${backendUrl}/generate/stream`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ idea, platform: selectedPlatform, tone, creativity, formality, smart_emojis: smartEmojis, auto_hashtag: autoHashtag, contextual_suggestions: contextualSuggestions, target_audience: targetAudience }),
+                body: requestBody,
             });
             if (!response.ok) {
                 const errorData = await response.json().catch(() => ({ detail: "An unknown error occurred." }));
                 throw new Error(`HTTP error! Status: ${response.status} - ${errorData.detail}`);
             }
-            const data = await response.json();
-            if (data.versions && data.versions.length > 0) {
-                displayResults(data.versions);
+            if (response.body && response.body.getReader) {
+                await readGenerationStream(response.body.getReader());
             } else {
-                throw new Error("Received an empty or invalid versions array from the server.");
+                // No streaming support in this browser: fall back to the all-at-once endpoint.
+                const fallback = await fetch(`${backendUrl}/generate`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: requestBody });
+                if (!fallback.ok) {
+                    const errorData = await fallback.json().catch(() => ({ detail: "An unknown error occurred." }));
+                    throw new Error(`HTTP error! Status: ${fallback.status} - ${errorData.detail}`);
+                }
+                const data = await fallback.json();
+                scoringMode = data.scoring;
+                if (data.versions && data.versions.length > 0) {
+                    displayResults(data.versions);
+                } else {
+                    throw new Error("Received an empty or invalid versions array from the server.");
+                }
             }
+            if (scoringMode === 'deferred') requestDeferredScores();
         } catch (error) {
             console.error('Error:', error);
             outputText.value = `An error occurred.\n\nDetails: ${error.message}`;
@@ -312,6 +372,95 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // --- STREAMING HELPERS ---
+    async function readEventStream(reader, onEvent) {
+        // Minimal server-sent events reader: calls onEvent(eventName, parsedData) per event.
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let eventName = 'message';
+                let dataText = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                    else if (line.startsWith('data:')) dataText += line.slice(5).trim();
+                });
+                if (dataText) onEvent(eventName, JSON.parse(dataText));
+            }
+        }
+    }
+
+    function appendAtPath(target, path, text) {
+        let node = target;
+        path.slice(0, -1).forEach((key, i) => {
+            if (node[key] === undefined) node[key] = typeof path[i + 1] === 'number' ? [] : {};
+            node = node[key];
+        });
+        const last = path[path.length - 1];
+        node[last] = (node[last] || '') + text;
+    }
+
+    function formatDraftContent(content) {
+        if (content === undefined) return '';
+        if (typeof content === 'string') return content;
+        if (Array.isArray(content.thread)) return content.thread.filter(Boolean).join('\n\n');
+        return `CAPTION:\n${content.caption || ''}\n\n---\n\nSCRIPT:\n${content.script || ''}`;
+    }
+
+    async function readGenerationStream(reader) {
+        await readEventStream(reader, handleStreamEvent);
+        if (generatedVersions.length === 0) {
+            throw new Error("Received an empty or invalid versions array from the server.");
+        }
+    }
+
+    async function requestDeferredScores() {
+        // Scores are not needed to read the drafts, so fetch them after the versions are on screen.
+        const pending = generatedVersions
+            .map((version, index) => ({ version, index }))
+            .filter(({ version }) => version && version.virality_score == null);
+        if (pending.length === 0) return;
+        try {
+            const response = await fetch(`${backendUrl}/score`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ platform: selectedPlatform, versions: pending.map(({ version }) => version.content) }),
+            });
+            if (!response.ok) return;
+            const data = await response.json();
+            handleStreamEvent('virality', { scores: data.scores.map(score => ({ ...score, index: pending[score.index].index })) });
+        } catch (error) {
+            console.error('Scoring failed:', error);
+        }
+    }
+
+    function handleStreamEvent(eventName, payload) {
+        if (eventName === 'version') {
+            generatedVersions[payload.index] = payload.version;
+            addVersionTab(payload.version, payload.index);
+            if (payload.index === 0) showVersion(0);
+        } else if (eventName === 'virality') {
+            payload.scores.forEach(({ index, virality_score, justification }) => {
+                if (!generatedVersions[index]) return;
+                generatedVersions[index].virality_score = virality_score;
+                generatedVersions[index].justification = justification;
+                const button = outputTabsContainer.querySelector(`.output-tab-btn[data-index="${index}"]`);
+                if (button && virality_score) appendViralityScore(button, virality_score);
+            });
+            showVersion(activeVersionIndex);
+        } else if (eventName === 'done') {
+            scoringMode = payload.scoring;
+        } else if (eventName === 'error') {
+            throw new Error(payload.detail);
+        }
+    }
+
     // --- HELPER FUNCTIONS ---
     function setLoadingState(isLoading) {
         if (isLoading) {
@@ -348,24 +497,28 @@ document.addEventListener('DOMContentLoaded', () => {
     function displayResults(versions) {
         generatedVersions = versions;
         outputTabsContainer.innerHTML = ''; 
-        versions.forEach((version, index) => {
-            const button = document.createElement('button');
-            button.classList.add('output-tab-btn');
-            button.textContent = `Version ${index + 1}`;
-            button.dataset.index = index;
-            if (version.virality_score) {
-                const scoreSpan = document.createElement('span');
-                scoreSpan.className = 'virality-score';
-                scoreSpan.innerHTML = `🔥 ${version.virality_score}`;
-                button.appendChild(scoreSpan);
-            }
-            outputTabsContainer.appendChild(button);
-        });
+        versions.forEach((version, index) => addVersionTab(version, index));
         if (versions.length > 0) {
             showVersion(0);
         }
     }
 
+    function addVersionTab(version, index) {
+        const button = document.createElement('button');
+        button.classList.add('output-tab-btn');
+        button.textContent = `Version ${index + 1}`;
+        button.dataset.index = index;
+        if (version.virality_score) appendViralityScore(button, version.virality_score);
+        outputTabsContainer.appendChild(button);
+    }
+
+    function appendViralityScore(button, score) {
+        const scoreSpan = document.createElement('span');
+        scoreSpan.className = 'virality-score';
+        scoreSpan.innerHTML = `🔥 ${score}`;
+        button.appendChild(scoreSpan);
+    }
+
     function showVersion(index) {
         if (index >= generatedVersions.length || index < 0) return;
         activeVersionIndex = index;
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionMiddleware, ConcurrencyGate, Overloaded, TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+# --- TOKEN BUCKET ---
+def test_bucket_spends_burst_then_refills_at_rate():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=2, burst=4, clock=clock)
+
+    async def run():
+        spent = [await limiter.take("ip:1", 1) for _ in range(4)]
+        retry_after = await limiter.take("ip:1", 1)
+        clock.now = 0.5  # one token back
+        refilled = await limiter.take("ip:1", 1)
+        return spent, retry_after, refilled
+
+    assert asyncio.run(run()) == ([0.0] * 4, 0.5, 0.0)
+
+
+def test_retry_after_covers_the_missing_tokens():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=2, burst=4, clock=clock)
+
+    async def run():
+        await limiter.take("ip:1", 3)
+        return await limiter.take("ip:1", 4), await limiter.take("ip:2", 4)
+
+    assert asyncio.run(run()) == (1.5, 0.0)  # 3 tokens short at 2/s; other clients are unaffected
+
+
+def test_cost_above_burst_takes_a_full_bucket():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=1, burst=3, clock=clock)
+
+    async def run():
+        first = await limiter.take("ip:1", 4)
+        second = await limiter.take("ip:1", 4)
+        clock.now = 3.0
+        return first, second, await limiter.take("ip:1", 4)
+
+    assert asyncio.run(run()) == (0.0, 3.0, 0.0)
+
+
+# --- CONCURRENCY GATE ---
+def test_gate_sheds_when_the_queue_is_full():
+    gate = ConcurrencyGate(limit=1, max_queue=1, max_wait=5)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold():
+            async with gate.slot():
+                await release.wait()
+
+        holders = [asyncio.create_task(hold()) for _ in range(2)]  # one runs, one queues
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as info:
+            async with gate.slot():
+                pass
+        release.set()
+        await asyncio.gather(*holders)
+        return info.value
+
+    error = asyncio.run(run())
+    assert error.reason == "queue_full" and error.retry_after > 0
+    assert gate.counters["admitted"] == 2 and gate.in_use == 0
+
+
+def test_gate_times_out_queued_requests():
+    gate = ConcurrencyGate(limit=1, max_queue=4, max_wait=0.05)
+
+    async def run():
+        async with gate.slot():
+            with pytest.raises(Overloaded) as info:
+                async with gate.slot():
+                    pass
+        return info.value
+
+    assert asyncio.run(run()).reason == "queue_timeout"
+    assert gate.waiting == 0 and gate.counters["queue_timeout"] == 1
+
+
+# --- MIDDLEWARE ---
+def call(middleware, path="/generate", headers=()):
+    scope = {"type": "http", "method": "POST", "path": path, "headers": list(headers), "client": ("10.0.0.1", 5000)}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"], dict(sent[0]["headers"])
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def test_middleware_rejects_with_retry_after():
+    limiter = TokenBucketLimiter(rate=0.5, burst=4, clock=FakeClock())
+    middleware = AdmissionMiddleware(ok_app, AdmissionController({"/generate": 4}, limiter, None))
+
+    assert call(middleware)[0] == 200
+    status, headers = call(middleware)
+    assert status == 429
+    assert headers[b"retry-after"] == b"8"
+    assert call(middleware, path="/health")[0] == 200  # not admission-controlled
+
+
+def test_only_configured_api_keys_get_their_own_bucket():
+    limiter = TokenBucketLimiter(rate=0.5, burst=1, clock=FakeClock())
+    middleware = AdmissionMiddleware(ok_app, AdmissionController({"/generate": 1}, limiter, None, frozenset({"k1"})))
+
+    assert call(middleware, headers=[(b"x-api-key", b"made-up")])[0] == 200
+    assert call(middleware, headers=[(b"x-api-key", b"another")])[0] == 429  # same IP bucket
+    assert call(middleware, headers=[(b"x-api-key", b"k1")])[0] == 200
@@ -0,0 +1,68 @@
+import os
+import time
+
+from asset_cache import AssetCache
+
+
+def fill(cache, sizes):
+    # Oldest first: file i was last used (len - i) minutes ago.
+    paths = []
+    for i, size in enumerate(sizes):
+        path = cache.path_for("files", f"clip{i}.mp4")
+        path.write_bytes(b"x" * size)
+        used_at = time.time() - 60 * (len(sizes) - i)
+        os.utime(path, (used_at, used_at))
+        paths.append(path)
+    return paths
+
+
+def test_evicts_least_recently_used_first(tmp_path):
+    cache = AssetCache(str(tmp_path), max_bytes=250)
+    oldest, middle, newest = fill(cache, [100, 100, 100])
+
+    assert cache.cleanup()["evicted"] == 1
+    assert not oldest.exists() and middle.exists() and newest.exists()
+
+
+def test_leased_file_is_kept(tmp_path):
+    cache = AssetCache(str(tmp_path), max_bytes=250)
+    oldest, middle, newest = fill(cache, [100, 100, 100])
+
+    with cache.lease(oldest):
+        result = cache.cleanup()
+    assert oldest.exists() and not middle.exists() and newest.exists()
+    assert result["pinned"] == 1
+
+
+class RacingCache(AssetCache):
+    """Runs `during_sweep` once, after cleanup has scanned the directory but before it deletes anything."""
+
+    during_sweep = None
+
+    def _claimed_since(self, path, mtime):
+        if self.during_sweep:
+            self.during_sweep, action = None, self.during_sweep
+            action()
+        return super()._claimed_since(path, mtime)
+
+
+def test_file_leased_after_scan_is_kept(tmp_path):
+    cache = RacingCache(str(tmp_path), max_bytes=250)
+    oldest, _, _ = fill(cache, [100, 100, 100])
+    lease = cache.lease(oldest)
+    cache.during_sweep = lease.__enter__
+    try:
+        cache.cleanup()
+        assert oldest.exists()
+    finally:
+        lease.__exit__(None, None, None)
+
+
+def test_file_used_after_scan_is_kept(tmp_path):
+    cache = RacingCache(str(tmp_path), max_bytes=250)
+    oldest, middle, _ = fill(cache, [100, 100, 100])
+    cache.during_sweep = lambda: cache.get_file("files", oldest.name)
+
+    result = cache.cleanup()
+    assert oldest.exists() and not middle.exists()
+    assert result["evicted"] == 1
@@ -0,0 +1,68 @@
+import json
+
+from json_stream import IncrementalJsonParser
+
+
+def feed_all(pieces):
+    parser, events = IncrementalJsonParser(), []
+    for piece in pieces:
+        events.extend(parser.feed(piece))
+    return parser, events
+
+
+def text_at(events, path):
+    return "".join(text for event_path, text in events if event_path == path)
+
+
+def test_one_char_at_a_time_matches_json_loads():
+    document = '```json\n{"content": {"caption": "Line one\\nSaid \\"hi\\" \\\\ a/b\\/c\\ttab", "hashtags": ["#a", "#b"]},' \
+               ' "analysis": {"readability": 8}}\n```'
+    parser, events = feed_all(document)
+    expected = json.loads(document.strip("`json\n"))
+    assert parser.done
+    assert text_at(events, ("content", "caption")) == expected["content"]["caption"]
+    assert text_at(events, ("content", "hashtags", 0)) == "#a"
+    assert text_at(events, ("content", "hashtags", 1)) == "#b"
+
+
+def test_thread_paths():
+    _, events = feed_all(['{"content": {"thread": ["first", "sec', 'ond", "third"]}}'])
+    assert [text_at(events, ("content", "thread", i)) for i in range(3)] == ["first", "second", "third"]
+
+
+def test_partial_string_is_emitted_per_feed():
+    parser = IncrementalJsonParser()
+    assert parser.feed('{"content": "Hel') == [(("content",), "Hel")]
+    assert parser.feed('lo"') == [(("content",), "lo")]
+    assert not parser.done
+    assert parser.feed('}') == []
+    assert parser.done
+
+
+def test_escaped_quote_in_key():
+    _, events = feed_all(['{"a\\"b": "v"}'])
+    assert events == [(('a"b',), "v")]
+
+
+def test_unicode_escape_split_across_feeds():
+    _, events = feed_all(['{"content": "caf\\u', '00', 'e9!"}'])
+    assert text_at(events, ("content",)) == "café!"
+
+
+def test_surrogate_pair():
+    document = '{"content": "hi \\ud83d\\ude00 there"}'
+    _, events = feed_all([document])
+    assert text_at(events, ("content",)) == json.loads(document)["content"] == "hi \U0001F600 there"
+
+
+def test_surrogate_pair_split_across_feeds():
+    document = '{"content": "\\ud83d\\ude80 launch"}'
+    for cut in range(len('{"content": "'), len(document)):
+        _, events = feed_all([document[:cut], document[cut:]])
+        assert text_at(events, ("content",)) == "\U0001F680 launch", cut
+
+
+def test_trailing_text_is_ignored():
+    parser = IncrementalJsonParser()
+    assert parser.feed('{"content": "x"} {"content": "y"}') == [(("content",), "x")]
+    assert parser.done
@@ -0,0 +1,51 @@
+import asyncio
+import os
+
+import httpx
+
+from benchmarks.bench_load import BASE_BODY, VIDEO_SCRIPT
+from benchmarks.harness import import_app
+from benchmarks.mock_openrouter import MockOpenRouter
+from benchmarks.mock_pexels import DEFAULT_SAMPLE_DIR, MockPexels, ensure_samples
+from loop_monitor import LoopBlockingMonitor
+
+
+# The request paths and the render pipeline must never hold the event loop: with the
+# offline stubs standing in for OpenRouter and Pexels and the silence TTS backend, a
+# monitor on the same loop should see no stall at all.
+def test_request_paths_and_render_do_not_block_the_loop(tmp_path):
+    samples = ensure_samples(DEFAULT_SAMPLE_DIR, clips=2, clip_seconds=2.0)
+
+    async def run():
+        async with MockOpenRouter(latency=0.02) as openrouter, MockPexels(samples, latency=0.01) as pexels:
+            main = import_app(openrouter.base_url, APP_DATA_DIR=str(tmp_path), PEXELS_API_KEY="test-key",
+                              PEXELS_API_BASE=pexels.origin, TTS_BACKEND="silence", ADMISSION_RATE="0",
+                              VIDEO_ENCODER_PRESET="ultrafast", VIDEO_PREVIEW_PRESET="ultrafast")
+            from asset_cache import AssetCache
+            from video_pipeline import render_video
+
+            async with main.app.router.lifespan_context(main.app):
+                # Started once imports and startup (CA bundle loading, pools) are done: they block by
+                # nature, before any request is served, and aren't under test here.
+                monitor = LoopBlockingMonitor(threshold=0.1)
+                monitor.start()
+                try:
+                    transport = httpx.ASGITransport(app=main.app)
+                    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+                        body = {**BASE_BODY, "idea": "A reusable coffee cup", "bypass_cache": True}
+                        generated = await client.post("/generate", json=body)
+                        assert generated.status_code == 200, generated.text
+                        refined = await client.post("/refine/stream", json={
+                            **body, "original_content": "Our new cup is here.", "refinement_instruction": "Punchier."})
+                        assert refined.status_code == 200
+                        assert "event: version" in refined.text, refined.text
+
+                    result = await render_video("loop-check", VIDEO_SCRIPT, "coffee cup", str(tmp_path / "videos"),
+                                                AssetCache(str(tmp_path / "assets")), lambda stage, progress: None)
+                    assert os.path.getsize(result["video_path"]) > 0
+                finally:
+                    monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(run())
+    assert monitor.events == [], "\n\n".join(f"{e['blocked_ms']} ms:\n{e['stack']}" for e in monitor.events)
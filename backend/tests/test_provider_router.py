@@ -0,0 +1,230 @@
+import asyncio
+
+import pytest
+
+from admission import ProviderBudget
+from provider_router import AllProvidersFailed, CircuitBreaker, ProviderRouter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class FakeProvider:
+    """Answers after `delay` real seconds, or raises `error`; streams `deltas`, failing before delta `fail_at`."""
+
+    def __init__(self, name, delay=0.0, error=None, deltas=("a", "b"), fail_at=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.deltas = deltas
+        self.fail_at = fail_at
+        self.calls = 0
+        self.cancelled = 0
+
+    async def complete(self, prompt, max_tokens=2048, json_mode=True):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        return f"{self.name}: {prompt}"
+
+    async def stream(self, prompt, max_tokens=2048, json_mode=True):
+        self.calls += 1
+        for i, delta in enumerate(self.deltas):
+            if i == self.fail_at:
+                raise RuntimeError(f"{self.name} dropped the stream")
+            await asyncio.sleep(0)
+            yield delta
+
+
+def breaker(clock, **kwargs):
+    return CircuitBreaker(**{"window": 10, "min_calls": 4, "error_threshold": 0.5, "cooldown": 30.0,
+                             "clock": clock, **kwargs})
+
+
+# --- CIRCUIT BREAKER ---
+def test_breaker_opens_on_error_rate():
+    clock = FakeClock()
+    b = breaker(clock)
+    b.record_success(0.1)
+    b.record_failure(0.1)
+    b.record_failure(0.1)
+    assert b.state == "closed"  # below min_calls
+    b.record_success(0.1)
+    assert b.state == "open"
+    assert not b.allow()
+
+
+def test_breaker_opens_on_p95_latency():
+    clock = FakeClock()
+    b = breaker(clock, latency_threshold=2.0)
+    for _ in range(4):
+        b.record_success(0.5)
+    assert b.state == "closed"
+    assert b.latency_percentile(95) == 0.5
+    b.record_success(2.5)
+    assert b.latency_percentile(95) == 2.5
+    assert b.state == "open"
+
+
+def test_breaker_half_open_probe_success_closes():
+    clock = FakeClock()
+    b = breaker(clock)
+    for _ in range(4):
+        b.record_failure(0.1)
+    clock.advance(29)
+    assert b.state == "open"
+    clock.advance(1)
+    assert b.state == "half_open"
+    assert b.allow()
+    assert not b.allow()  # one probe at a time
+    b.record_success(0.1)
+    assert b.state == "closed"
+    assert b.snapshot()["samples"] == 1
+
+
+def test_breaker_half_open_probe_failure_reopens():
+    clock = FakeClock()
+    b = breaker(clock)
+    for _ in range(4):
+        b.record_failure(0.1)
+    clock.advance(30)
+    assert b.allow()
+    b.record_failure(0.1)
+    assert b.state == "open"
+    clock.advance(30)
+    assert b.state == "half_open"
+
+
+def test_released_probe_can_be_retried():
+    clock = FakeClock()
+    b = breaker(clock)
+    for _ in range(4):
+        b.record_failure(0.1)
+    clock.advance(30)
+    assert b.allow()
+    b.release_probe()
+    assert b.state == "half_open"
+    assert b.allow()
+
+
+# --- ROUTER ---
+def test_open_breaker_is_skipped():
+    clock = FakeClock()
+    primary, fallback = FakeProvider("primary"), FakeProvider("fallback")
+    breakers = {"primary": breaker(clock), "fallback": breaker(clock)}
+    for _ in range(4):
+        breakers["primary"].record_failure(0.1)
+    router = ProviderRouter([primary, fallback], breakers=breakers, clock=clock)
+
+    result = asyncio.run(router.complete("hi"))
+    assert result.provider == "fallback"
+    assert primary.calls == 0
+
+
+def test_all_failed_reports_each_provider():
+    router = ProviderRouter([FakeProvider("a", error=ValueError("boom")), FakeProvider("b", error=ValueError("bust"))])
+    with pytest.raises(AllProvidersFailed) as info:
+        asyncio.run(router.complete("hi"))
+    assert set(info.value.errors) == {"a", "b"}
+    assert router.breakers["a"].snapshot()["errors"] == 1
+
+
+def test_hedge_starts_after_delay_and_cancels_loser():
+    slow, fast = FakeProvider("slow", delay=1.0), FakeProvider("fast", delay=0.01)
+    router = ProviderRouter([slow, fast], hedge=True, hedge_default_delay=0.05)
+
+    async def run():
+        result = await router.complete("hi")
+        await asyncio.sleep(0.01)  # let the cancellation reach the loser
+        return result
+
+    result = asyncio.run(run())
+    assert (result.provider, result.hedged) == ("fast", True)
+    assert slow.cancelled == 1
+    assert router.breakers["slow"].snapshot()["samples"] == 0  # a cancelled call proves nothing
+
+
+def test_no_hedge_before_delay():
+    primary, backup = FakeProvider("primary", delay=0.01), FakeProvider("backup")
+    router = ProviderRouter([primary, backup], hedge=True, hedge_default_delay=0.5)
+
+    result = asyncio.run(router.complete("hi"))
+    assert (result.provider, result.hedged) == ("primary", False)
+    assert backup.calls == 0
+
+
+def test_budget_exhausted_is_not_a_breaker_failure():
+    primary, fallback = FakeProvider("primary"), FakeProvider("fallback")
+
+    async def run():
+        budgets = {"primary": ProviderBudget("primary", limit=1, max_wait=0.01)}
+        router = ProviderRouter([primary, fallback], budgets=budgets)
+        async with budgets["primary"].slot():  # the only slot is taken
+            result = await router.complete("hi")
+            deltas = [delta async for delta in router.stream("hi")]
+        return router, budgets["primary"], result, deltas
+
+    router, budget, result, deltas = asyncio.run(run())
+    assert result.provider == "fallback"
+    assert deltas == ["a", "b"]
+    assert primary.calls == 0
+    assert budget.exhausted == 2
+    assert router.breakers["primary"].snapshot()["samples"] == 0
+
+
+def test_budget_exhausted_releases_half_open_probe():
+    clock = FakeClock()
+    breakers = {"primary": breaker(clock), "fallback": breaker(clock)}
+    for _ in range(4):
+        breakers["primary"].record_failure(0.1)
+    clock.advance(30)
+
+    async def run():
+        budgets = {"primary": ProviderBudget("primary", limit=1, max_wait=0.01)}
+        router = ProviderRouter([FakeProvider("primary"), FakeProvider("fallback")], breakers=breakers,
+                                clock=clock, budgets=budgets)
+        async with budgets["primary"].slot():
+            return await router.complete("hi")
+
+    assert asyncio.run(run()).provider == "fallback"
+    assert breakers["primary"].state == "half_open"
+    assert breakers["primary"].allow()  # the probe was released, not left claimed
+
+
+def collect(router):
+    async def run():
+        deltas = []
+        async for delta in router.stream("hi"):
+            deltas.append(delta)
+        return deltas
+    return asyncio.run(run())
+
+
+def test_stream_fails_over_before_first_delta():
+    primary, fallback = FakeProvider("primary", fail_at=0), FakeProvider("fallback", deltas=("x", "y"))
+    router = ProviderRouter([primary, fallback])
+
+    assert collect(router) == ["x", "y"]
+    assert router.breakers["primary"].snapshot()["errors"] == 1
+
+
+def test_stream_does_not_fail_over_after_first_delta():
+    primary, fallback = FakeProvider("primary", fail_at=1), FakeProvider("fallback")
+    router = ProviderRouter([primary, fallback])
+
+    with pytest.raises(RuntimeError, match="dropped"):
+        collect(router)
+    assert fallback.calls == 0
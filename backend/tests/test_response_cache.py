@@ -0,0 +1,79 @@
+import asyncio
+import sqlite3
+
+from response_cache import ResponseCache
+
+
+def locked(*args):
+    raise sqlite3.OperationalError("database is locked")
+
+
+def test_sqlite_tier_round_trip(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+
+    async def run():
+        writer = ResponseCache(sqlite_path=path)
+        await writer.set("k", {"text": "hello"})
+        writer.close()
+        reader = ResponseCache(sqlite_path=path)  # cold memory tier, as in another worker
+        try:
+            return await reader.get("k"), reader.counters["disk_hits"]
+        finally:
+            reader.close()
+
+    assert asyncio.run(run()) == ({"text": "hello"}, 1)
+
+
+def test_sqlite_errors_fail_open(tmp_path):
+    cache = ResponseCache(sqlite_path=str(tmp_path / "cache.sqlite3"))
+    cache._db_get = cache._db_set = locked
+
+    async def run():
+        await cache.set("k", "value")  # the write is dropped, not raised
+        hit = await cache.get("k")  # still served from memory
+        cache._memory.clear()
+        miss = await cache.get("k")
+        return hit, miss
+
+    assert asyncio.run(run()) == ("value", None)
+    assert cache.counters["misses"] == 1
+
+
+def test_sqlite_budget_is_enforced_every_n_writes(tmp_path):
+    cache = ResponseCache(sqlite_path=str(tmp_path / "cache.sqlite3"), sqlite_max_bytes=250, sqlite_prune_every=5)
+
+    def rows():
+        return cache._connection().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+    async def run():
+        counts = []
+        for i in range(5):
+            await cache.set(f"k{i}", "x" * 98)  # 100 bytes serialized
+            counts.append(rows())
+        return counts
+
+    assert asyncio.run(run()) == [1, 2, 3, 4, 2]  # over budget until the 5th write prunes
+    assert cache.counters["evictions"] == 3
+    cache.close()
+
+
+def test_write_locked_by_another_worker_fails_open(tmp_path):
+    # Several serve.py workers share one SQLite file; one holding the write lock must not fail requests.
+    path = str(tmp_path / "shared_state.sqlite3")
+    cache = ResponseCache(sqlite_path=path, sqlite_busy_timeout=0.05)
+
+    async def run():
+        await cache.set("warm", "value")
+        other_worker = sqlite3.connect(path)
+        other_worker.execute("BEGIN EXCLUSIVE")
+        try:
+            await cache.set("k", "fresh")  # dropped from SQLite, kept in memory
+            cache._memory.clear()
+            return await cache.get("warm")  # "database is locked": a miss
+        finally:
+            other_worker.rollback()
+            other_worker.close()
+
+    assert asyncio.run(run()) is None
+    assert cache.counters["misses"] == 1
+    cache.close()
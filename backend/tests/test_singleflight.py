@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Upstream:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = 0
+
+    async def fetch(self):
+        self.calls += 1
+        call = self.calls
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"result {call}"
+
+
+def test_concurrent_calls_share_one_task():
+    flight, upstream = SingleFlight(), Upstream()
+
+    async def run():
+        return await asyncio.gather(*(flight.do("gen:a", upstream.fetch) for _ in range(3)))
+
+    assert asyncio.run(run()) == ["result 1"] * 3
+    assert upstream.calls == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 2, "abandoned": 0, "in_flight": 0}
+
+
+def test_different_keys_run_separately():
+    flight, upstream = SingleFlight(), Upstream()
+
+    async def run():
+        return await asyncio.gather(flight.do("gen:a", upstream.fetch), flight.do("gen:b", upstream.fetch))
+
+    assert sorted(asyncio.run(run())) == ["result 1", "result 2"]
+
+
+def test_cancelling_one_waiter_keeps_shared_task():
+    flight, upstream = SingleFlight(), Upstream()
+
+    async def run():
+        first = asyncio.create_task(flight.do("gen:a", upstream.fetch))
+        second = asyncio.create_task(flight.do("gen:a", upstream.fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "result 1"
+    assert upstream.cancelled == 0
+    assert flight.counters["abandoned"] == 0
+
+
+def test_cancelling_last_waiter_cancels_task_and_forgets_key():
+    flight, upstream = SingleFlight(), Upstream()
+
+    async def run():
+        waiters = [asyncio.create_task(flight.do("gen:a", upstream.fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        assert flight.stats()["in_flight"] == 0
+        # The next identical call starts afresh instead of joining the dying task.
+        return await flight.do("gen:a", upstream.fetch)
+
+    assert asyncio.run(run()) == "result 2"
+    assert upstream.cancelled == 1
+    assert flight.counters["abandoned"] == 1
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    flight = SingleFlight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("gen:a", failing) for _ in range(2)), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        with pytest.raises(ValueError):
+            await flight.do("gen:a", failing)
+
+    asyncio.run(run())
+    assert len(calls) == 2
@@ -0,0 +1,75 @@
+import os
+import uuid
+
+from video_delivery import VideoRetention
+
+NOW = 1_000_000_000.0
+DAY = 86400
+
+
+def render(video_dir, age, size=100, preview=True):
+    # A finished job as the pipeline leaves it: <job>_final.mp4, optionally <job>_preview.mp4.
+    job_id = str(uuid.uuid4())
+    names = [f"{job_id}_final.mp4"] + ([f"{job_id}_preview.mp4"] if preview else [])
+    for name in names:
+        path = video_dir / name
+        path.write_bytes(b"x" * size)
+        os.utime(path, (NOW - age, NOW - age))
+    return job_id
+
+
+def files_of(video_dir, job_id):
+    return sorted(path.name for path in video_dir.glob(f"{job_id}_*"))
+
+
+def test_age_pass_removes_whole_jobs_past_max_age(tmp_path):
+    retention = VideoRetention(str(tmp_path), max_age=7 * DAY, max_bytes=10**9, min_age=600)
+    old, recent = render(tmp_path, 8 * DAY), render(tmp_path, 6 * DAY)
+
+    result = retention.sweep(now=NOW)
+    assert result["removed"] == [old]
+    assert files_of(tmp_path, old) == []  # final and preview together
+    assert len(files_of(tmp_path, recent)) == 2
+    assert result["freed_bytes"] == 200 and result["bytes"] == 200
+
+
+def test_quota_pass_removes_oldest_jobs_until_under_budget(tmp_path):
+    retention = VideoRetention(str(tmp_path), max_age=7 * DAY, max_bytes=350, min_age=600)
+    oldest, older, newer = render(tmp_path, 3 * 3600), render(tmp_path, 2 * 3600), render(tmp_path, 3600)
+
+    result = retention.sweep(now=NOW)
+    assert result["removed"] == [oldest, older]  # 600 bytes over a 350 budget: oldest first, down to 200
+    assert len(files_of(tmp_path, newer)) == 2
+    assert retention.stats()["bytes"] == 200 and retention.stats()["jobs"] == 1
+
+
+def test_files_younger_than_min_age_are_never_removed(tmp_path):
+    retention = VideoRetention(str(tmp_path), max_age=0, max_bytes=0, min_age=600)
+    fresh = render(tmp_path, 599)
+    writing = tmp_path / "partial.mp4.tmp.mp4"  # a preview encode still in progress
+    writing.write_bytes(b"x")
+    os.utime(writing, (NOW - 10, NOW - 10))
+
+    assert retention.sweep(now=NOW)["removed"] == []
+    assert len(files_of(tmp_path, fresh)) == 2 and writing.exists()
+
+
+def test_a_job_counts_as_new_as_its_newest_file(tmp_path):
+    retention = VideoRetention(str(tmp_path), max_age=7 * DAY, max_bytes=10**9, min_age=600)
+    job_id = render(tmp_path, 8 * DAY, preview=False)
+    preview = tmp_path / f"{job_id}_preview.mp4"
+    preview.write_bytes(b"x")
+    os.utime(preview, (NOW - 60, NOW - 60))  # preview only just finished
+
+    assert retention.sweep(now=NOW)["removed"] == []
+
+
+def test_stale_partial_writes_are_removed_and_foreign_files_kept(tmp_path):
+    retention = VideoRetention(str(tmp_path), min_age=600)
+    stale, foreign = tmp_path / "x_preview.mp4.tmp.mp4", tmp_path / "intro.mp4"
+    for path in (stale, foreign):
+        path.write_bytes(b"x")
+        os.utime(path, (NOW - 3600, NOW - 3600))
+
+    retention.sweep(now=NOW)
+    assert not stale.exists() and foreign.exists()
@@ -0,0 +1,153 @@
+import os
+import asyncio
+import re
+import shutil
+import subprocess
+import tempfile
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Protocol, Type
+
+from asset_cache import AssetCache
+from logs import get_logger
+
+log = get_logger("tts")
+
+
+# --- BACKENDS ---
+class TTSBackend(Protocol):
+    name: str
+    extension: str  # "mp3" or "wav"; chunks are joined according to it
+
+    def synthesize(self, text: str, lang: str, voice: str, out_path: str) -> None: ...
+
+
+class GTTSBackend:
+    name = "gtts"
+    extension = "mp3"
+    # gTTS has no voices as such; the Google Translate domain selects the accent.
+    VOICE_TLDS = {"default": "com", "us": "com", "uk": "co.uk", "au": "com.au", "in": "co.in", "ca": "ca"}
+
+    def synthesize(self, text: str, lang: str, voice: str, out_path: str) -> None:
+        from gtts import gTTS
+        gTTS(text=text, lang=lang, tld=self.VOICE_TLDS.get(voice, "com"), slow=False).save(out_path)
+
+
+class EspeakBackend:
+    # Fully offline engine for air-gapped deployments (needs espeak-ng or espeak on PATH).
+    name = "espeak"
+    extension = "wav"
+
+    def synthesize(self, text: str, lang: str, voice: str, out_path: str) -> None:
+        binary = shutil.which("espeak-ng") or shutil.which("espeak")
+        if not binary:
+            raise RuntimeError("TTS_BACKEND=espeak but neither espeak-ng nor espeak is installed.")
+        espeak_voice = lang if voice == "default" else f"{lang}+{voice}"
+        subprocess.run([binary, "-v", espeak_voice, "-w", out_path, text], check=True, capture_output=True)
+
+
+class SilenceBackend:
+    # Deterministic, dependency-free stand-in for tests and benchmarks: silence
+    # lasting roughly as long as the text would take to read aloud.
+    name = "silence"
+    extension = "wav"
+    WORDS_PER_SECOND = 2.5
+    SAMPLE_RATE = 16000
+
+    def synthesize(self, text: str, lang: str, voice: str, out_path: str) -> None:
+        seconds = max(0.5, len(text.split()) / self.WORDS_PER_SECOND)
+        with wave.open(out_path, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(self.SAMPLE_RATE)
+            out.writeframes(b"\x00\x00" * int(seconds * self.SAMPLE_RATE))
+
+
+BACKENDS: Dict[str, Type] = {"gtts": GTTSBackend, "espeak": EspeakBackend, "silence": SilenceBackend}
+
+def get_backend(name: str = None) -> TTSBackend:
+    name = (name or os.environ.get("TTS_BACKEND", "gtts")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown TTS backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+# --- CHUNKING ---
+def split_sentences(text: str, max_chars: int = 300) -> List[str]:
+    # Pack whole sentences into chunks of up to max_chars. A single sentence longer
+    # than that stays whole: cutting mid-sentence sounds worse than a long request.
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s]
+    chunks, current = [], ""
+    for sentence in sentences:
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+def join_audio(parts: List[str], extension: str, out_path: str):
+    if extension == "mp3":
+        # gTTS emits bare MPEG frames (no ID3 header), so byte concatenation is a valid stream.
+        with open(out_path, "wb") as out:
+            for part in parts:
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, out)
+    elif extension == "wav":
+        with wave.open(parts[0], "rb") as first:
+            params = first.getparams()
+        with wave.open(out_path, "wb") as out:
+            out.setparams(params)
+            for part in parts:
+                with wave.open(part, "rb") as f:
+                    out.writeframes(f.readframes(f.getnframes()))
+    else:
+        raise ValueError(f"Don't know how to join '{extension}' audio.")
+
+
+# --- TTS STAGE ---
+class TTSStage:
+    def __init__(self, cache: AssetCache, backend: TTSBackend = None, max_workers: int = 4, chunk_chars: int = 300):
+        self.cache = cache
+        self.backend = backend or get_backend()
+        self.max_workers = max_workers
+        self.chunk_chars = chunk_chars
+
+    @classmethod
+    def from_env(cls, cache: AssetCache) -> "TTSStage":
+        return cls(cache, get_backend(),
+                   max_workers=int(os.environ.get("TTS_MAX_WORKERS", 4)),
+                   chunk_chars=int(os.environ.get("TTS_CHUNK_CHARS", 300)))
+
+    def cache_name(self, text: str, lang: str, voice: str) -> str:
+        normalized = re.sub(r"\s+", " ", text).strip()
+        return f"{AssetCache.digest(self.backend.name, normalized, lang, voice)}.{self.backend.extension}"
+
+    async def synthesize(self, text: str, lang: str = "en", voice: str = "default") -> Path:
+        """Returns a cached audio file for `text`; callers should hold cache.lease() on it while in use."""
+        name = self.cache_name(text, lang, voice)
+        cached = self.cache.get_file("tts", name)
+        if cached is not None:
+            log.info("tts.cache_hit", backend=self.backend.name)
+            return cached
+
+        chunks = split_sentences(text, self.chunk_chars) or [text]
+        tmp_path = self.cache.temp_path_for("tts", name)
+        try:
+            if len(chunks) == 1:
+                await asyncio.to_thread(self.backend.synthesize, chunks[0], lang, voice, str(tmp_path))
+            else:
+                log.info("tts.chunked", backend=self.backend.name, chunks=len(chunks))
+                loop = asyncio.get_running_loop()
+                with tempfile.TemporaryDirectory() as work_dir, ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                    parts = [os.path.join(work_dir, f"part{i:04d}.{self.backend.extension}") for i in range(len(chunks))]
+                    await asyncio.gather(*(loop.run_in_executor(pool, self.backend.synthesize, chunk, lang, voice, part)
+                                           for chunk, part in zip(chunks, parts)))
+                    await asyncio.to_thread(join_audio, parts, self.backend.extension, str(tmp_path))
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return self.cache.commit_file(tmp_path, "tts", name)
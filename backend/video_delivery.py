@@ -0,0 +1,137 @@
+import asyncio
+import os
+import re
+import subprocess
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from imageio_ffmpeg import get_ffmpeg_exe
+
+from logs import get_logger
+
+log = get_logger("video_delivery")
+
+# Moves the moov atom (the index) to the front of the MP4, so players can start
+# before the whole file has arrived, and seek with range requests right away.
+FASTSTART_ARGS = ["-movflags", "+faststart"]
+
+# Renders are written as <job_id>_final.mp4, with an optional <job_id>_preview.mp4 next to it.
+VIDEO_NAME_RE = re.compile(r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})_(final|preview)\.mp4$")
+# Names are unique per job and files are never rewritten, so clients and CDNs may keep them.
+VIDEO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def video_url(path: str) -> str:
+    return f"/videos/{os.path.basename(path)}"
+
+def preview_path_for(video_path: str) -> str:
+    return re.sub(r"_final\.mp4$", "_preview.mp4", video_path)
+
+
+# --- PREVIEW VARIANT ---
+# A small, low-bitrate copy for mobile and for the in-page player; the full 1080x1920
+# file stays available for download. VIDEO_PREVIEW_HEIGHT=0 turns it off.
+class PreviewSettings:
+    def __init__(self, height: int = 640, crf: int = 30, audio_bitrate: str = "64k", preset: str = "veryfast"):
+        self.height = height
+        self.crf = crf
+        self.audio_bitrate = audio_bitrate
+        self.preset = preset
+
+    @classmethod
+    def from_env(cls) -> "PreviewSettings":
+        return cls(height=int(os.environ.get("VIDEO_PREVIEW_HEIGHT", 640)),
+                   crf=int(os.environ.get("VIDEO_PREVIEW_CRF", 30)),
+                   preset=os.environ.get("VIDEO_PREVIEW_PRESET", "veryfast"))
+
+    @property
+    def enabled(self) -> bool:
+        return self.height > 0
+
+def render_preview(source_path: str, dest_path: str, settings: PreviewSettings, threads: int = 2):
+    tmp_path = dest_path + ".tmp.mp4"
+    command = [get_ffmpeg_exe(), "-y", "-hide_banner", "-loglevel", "error", "-i", source_path,
+               "-vf", f"scale=-2:{settings.height}", "-c:v", "libx264", "-preset", settings.preset,
+               "-crf", str(settings.crf), "-threads", str(threads), "-c:a", "aac", "-b:a", settings.audio_bitrate,
+               *FASTSTART_ARGS, tmp_path]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise RuntimeError(f"preview encode failed: {result.stderr.strip()[-300:]}")
+    os.replace(tmp_path, dest_path)
+
+
+# --- RETENTION ---
+# Deletes finished videos older than `max_age`, then the oldest ones until the directory
+# fits in `max_bytes`. Whole jobs go at once (final + preview). Files younger than
+# `min_age` are never touched, so a render still being written is safe.
+class VideoRetention:
+    def __init__(self, video_dir: str, max_age: float = 7 * 86400, max_bytes: int = 5 * 1024 ** 3,
+                 min_age: float = 600, interval: float = 600):
+        self.video_dir = Path(video_dir)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self.interval = interval
+        self.counters = {"sweeps": 0, "removed_jobs": 0, "freed_bytes": 0}
+        self.last = {"bytes": 0, "jobs": 0}
+
+    @classmethod
+    def from_env(cls, video_dir: str) -> "VideoRetention":
+        return cls(video_dir,
+                   max_age=float(os.environ.get("VIDEO_RETENTION_DAYS", 7)) * 86400,
+                   max_bytes=int(os.environ.get("VIDEO_DIR_MAX_BYTES", 5 * 1024 ** 3)),
+                   interval=float(os.environ.get("VIDEO_SWEEP_INTERVAL", 600)))
+
+    def sweep(self, now: Optional[float] = None) -> dict:
+        now = time.time() if now is None else now
+        jobs: Dict[str, list] = {}  # job_id -> [newest mtime, bytes, paths]
+        for path in self.video_dir.glob("*.mp4"):
+            match = VIDEO_NAME_RE.match(path.name)
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if not match:
+                # A preview encode that died mid-write; anything else we didn't create is left alone.
+                if path.name.endswith(".tmp.mp4") and now - stat.st_mtime > self.min_age:
+                    path.unlink(missing_ok=True)
+                continue
+            entry = jobs.setdefault(match.group(1), [0.0, 0, []])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1] += stat.st_size
+            entry[2].append(path)
+        total = sum(size for _, size, _ in jobs.values())
+        removed, freed = [], 0
+        for job_id, (mtime, size, paths) in sorted(jobs.items(), key=lambda item: item[1][0]):
+            age = now - mtime
+            if age < self.min_age or (age < self.max_age and total <= self.max_bytes):
+                continue
+            for path in paths:
+                path.unlink(missing_ok=True)
+            removed.append(job_id)
+            total -= size
+            freed += size
+        self.counters["sweeps"] += 1
+        self.counters["removed_jobs"] += len(removed)
+        self.counters["freed_bytes"] += freed
+        self.last = {"bytes": total, "jobs": len(jobs) - len(removed)}
+        return {"removed": removed, "freed_bytes": freed, "bytes": total}
+
+    async def run(self, on_removed: Callable[[str], None]):
+        # Background task for the API process; on_removed (run in a thread) lets job records drop dead URLs.
+        while True:
+            try:
+                result = await asyncio.to_thread(self.sweep)
+                for job_id in result["removed"]:
+                    await asyncio.to_thread(on_removed, job_id)
+                if result["removed"]:
+                    log.info("video_retention.swept", removed=len(result["removed"]), freed_bytes=result["freed_bytes"],
+                             bytes=result["bytes"])
+            except Exception as e:
+                log.warning("video_retention.sweep_failed", error=str(e))
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {**self.counters, **self.last, "max_bytes": self.max_bytes, "max_age_s": self.max_age}
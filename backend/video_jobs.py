@@ -0,0 +1,252 @@
+import os
+import asyncio
+import json
+import multiprocessing
+import signal
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, wait as wait_futures
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Optional
+
+from logs import get_logger
+from metrics import video_jobs_finished, video_stage_seconds
+from video_delivery import video_url
+
+log = get_logger("video_jobs")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class RenderFailed(Exception):
+    # What a worker raises back to the API process. Exceptions cross the process boundary
+    # pickled, and some (httpx.HTTPStatusError, with keyword-only arguments) can't be
+    # unpickled, which would break the whole pool; a one-string exception always can.
+    pass
+
+
+# --- JOB STORE ---
+# One small JSON file per job. Both the API process and the render workers
+# read and write it, so status survives across processes.
+class JobStore:
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.json"
+
+    def get(self, job_id: str) -> Optional[dict]:
+        try:
+            return json.loads(self._path(job_id).read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def update(self, job_id: str, **fields) -> dict:
+        record = self.get(job_id) or {"job_id": job_id}
+        record.update(fields, updated_at=time.time())
+        tmp_path = self._path(job_id).with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(record), encoding="utf-8")
+        os.replace(tmp_path, self._path(job_id))  # atomic, so readers never see half a file
+        return record
+
+
+# One Redis hash per job, for workers spread over several hosts. Each field is stored
+# JSON-encoded; HSET is per field, so concurrent updates never drop each other's fields.
+class RedisJobStore:
+    def __init__(self, url: str, ttl: float = 7 * 24 * 3600, prefix: str = "app:job:"):
+        from shared_state import redis_client
+        self.client = redis_client(url, asyncio_client=False)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def get(self, job_id: str) -> Optional[dict]:
+        fields = self.client.hgetall(self.prefix + job_id)
+        return {k: json.loads(v) for k, v in fields.items()} or None
+
+    def update(self, job_id: str, **fields) -> dict:
+        fields.update(job_id=job_id, updated_at=time.time())
+        with self.client.pipeline() as pipe:
+            pipe.hset(self.prefix + job_id, mapping={k: json.dumps(v) for k, v in fields.items()})
+            pipe.expire(self.prefix + job_id, self.ttl)
+            pipe.execute()
+        return self.get(job_id) or fields
+
+
+def job_store_from_env(jobs_dir: str):
+    # Job files in a shared directory already work for every worker on one host.
+    url = os.environ.get("SHARED_STATE_URL", "")
+    return RedisJobStore(url) if url.startswith(("redis://", "rediss://", "unix://")) else JobStore(jobs_dir)
+
+
+# --- WORKER ENTRY POINT ---
+def ignore_sigint():
+    # Ctrl-C reaches the whole process group; renders should stop only when the API process
+    # decides so (see VideoJobManager.drain), not mid-encode.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def run_render_job(job_id: str, script: str, idea: str, video_dir: str, jobs_dir: str, asset_dir: str) -> str:
+    # Executed in a worker process. Imports the heavy video stack here, not in the API process.
+    from video_pipeline import StageTimer, render_video
+    from asset_cache import AssetCache
+    from loop_monitor import LoopBlockingMonitor
+
+    store = job_store_from_env(jobs_dir)
+    cache = AssetCache.from_env(asset_dir)
+    timer = StageTimer(job_id)
+    started = time.time()
+    store.update(job_id, status="running", stage="starting", progress=0.0, started_at=started)
+
+    def report(stage: str, progress: float):
+        store.update(job_id, stage=stage, progress=round(progress, 3))
+
+    async def monitored_render():
+        loop_monitor = LoopBlockingMonitor.from_env()
+        if loop_monitor:
+            loop_monitor.start()
+        try:
+            return await render_video(job_id, script, idea, video_dir, cache, report, timer=timer)
+        finally:
+            if loop_monitor:
+                loop_monitor.stop()
+
+    try:
+        result = asyncio.run(monitored_render())
+    except Exception as e:
+        log.exception("video_job.failed", job_id=job_id, error=str(e))
+        store.update(job_id, status="failed", stage="failed", error=str(e), timings=timer.summary(),
+                     finished_at=time.time())
+        raise RenderFailed(f"{type(e).__name__}: {e}") from None
+    finally:
+        try:
+            log.info("asset_cache.sweep", **cache.cleanup())
+        except Exception as e:
+            log.warning("asset_cache.sweep_failed", error=str(e))
+    video_path = result["video_path"]
+    store.update(job_id, status="done", stage="done", progress=1.0, timings=result["timings"],
+                 video_url=video_url(video_path),
+                 preview_url=video_url(result["preview_path"]) if result.get("preview_path") else None,
+                 finished_at=time.time())
+    return video_path
+
+
+# --- JOB MANAGER ---
+class VideoJobManager:
+    def __init__(self, video_dir: str, jobs_dir: str, asset_dir: str, max_workers: int = 2, max_queue: int = 8,
+                 drain_timeout: float = 300.0):
+        self.video_dir = str(video_dir)
+        self.jobs_dir = str(jobs_dir)
+        self.asset_dir = str(asset_dir)
+        self.store = job_store_from_env(jobs_dir)
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.drain_timeout = drain_timeout
+        self.draining = False
+        self.executor = self._new_executor()
+        self._in_flight: Dict[str, Future] = {}
+        self.counters = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0}
+
+    @classmethod
+    def from_env(cls, video_dir: str, jobs_dir: str, asset_dir: str) -> "VideoJobManager":
+        return cls(video_dir, jobs_dir, asset_dir,
+                   max_workers=int(os.environ.get("VIDEO_MAX_WORKERS", 2)),
+                   max_queue=int(os.environ.get("VIDEO_MAX_QUEUE", 8)),
+                   drain_timeout=float(os.environ.get("VIDEO_DRAIN_TIMEOUT", 300)))
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the API process holds an event loop and gRPC threads that don't survive a fork.
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=ignore_sigint)
+
+    async def submit(self, script: str, idea: str) -> dict:
+        if self.draining:
+            self.counters["rejected"] += 1
+            raise QueueFull("Server is shutting down; not accepting new render jobs.")
+        if len(self._in_flight) >= self.max_workers + self.max_queue:
+            self.counters["rejected"] += 1
+            raise QueueFull(f"Video render queue is full ({len(self._in_flight)} jobs in flight).")
+        job_id = str(uuid.uuid4())
+        record = await asyncio.to_thread(self.store.update, job_id, status="queued", stage="queued",
+                                         progress=0.0, created_at=time.time())
+        args = (run_render_job, job_id, script, idea, self.video_dir, self.jobs_dir, self.asset_dir)
+        try:
+            future = self.executor.submit(*args)
+        except BrokenProcessPool:
+            # A worker died (OOM kill, crash); its jobs have already failed. Start a fresh pool.
+            log.warning("video_jobs.pool_rebuilt")
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._new_executor()
+            future = self.executor.submit(*args)
+        self._in_flight[job_id] = future
+        self.counters["submitted"] += 1
+        future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f))
+        return record
+
+    def _on_done(self, job_id: str, future: Future):
+        self._in_flight.pop(job_id, None)
+        failed = future.cancelled() or future.exception() is not None
+        if failed:
+            self.counters["failed"] += 1
+            video_jobs_finished.inc(status="cancelled" if future.cancelled() else "failed")
+            if future.cancelled():
+                error = "Server shut down before the render started."
+            elif isinstance(future.exception(), Exception):
+                error = str(future.exception())
+            else:
+                return
+            # A cancelled job, or a crashed worker (BrokenProcessPool), never got to write its own failure.
+            record = self.store.get(job_id) or {}
+            if record.get("status") not in ("failed", "done"):
+                self.store.update(job_id, status="failed", stage="failed", error=error, finished_at=time.time())
+        else:
+            self.counters["completed"] += 1
+            video_jobs_finished.inc(status="done")
+        # Stage spans are measured in the worker process; they reach this process's metrics
+        # registry through the job record. A failed render has the spans it got through.
+        timings = (self.store.get(job_id) or {}).get("timings") or {}
+        for stage, seconds in timings.items():
+            video_stage_seconds.observe(seconds, stage=stage, status="failed" if failed else "done")
+
+    def expire(self, job_id: str):
+        # Called by the retention sweeper once a job's files are gone.
+        record = self.store.get(job_id)
+        if record is not None and record.get("status") == "done":
+            self.store.update(job_id, status="expired", video_url=None, preview_url=None,
+                              error="The video was removed by the retention policy.")
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def stats(self) -> dict:
+        in_flight = len(self._in_flight)
+        running = min(in_flight, self.max_workers)
+        return {**self.counters, "running": running, "queue_depth": in_flight - running,
+                "max_workers": self.max_workers, "max_queue": self.max_queue}
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Stops taking jobs, waits up to `timeout` seconds for the ones in flight, then shuts down."""
+        self.draining = True
+        timeout = self.drain_timeout if timeout is None else timeout
+        pending = list(self._in_flight.values())
+        if pending:
+            log.info("video_jobs.draining", jobs=len(pending), timeout_s=timeout)
+            _, not_done = await asyncio.to_thread(wait_futures, pending, timeout)
+            if not_done:
+                log.warning("video_jobs.drain_timeout", unfinished=len(not_done))
+        self.shutdown(terminate=True)
+
+    def shutdown(self, terminate: bool = False):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if terminate:
+            # Whatever is still rendering after the drain is stopped now rather than holding up exit.
+            for job_id in list(self._in_flight):
+                record = self.store.get(job_id) or {}
+                if record.get("status") not in ("failed", "done"):
+                    self.store.update(job_id, status="failed", stage="failed", finished_at=time.time(),
+                                      error="Server shut down during the render.")
+            for process in multiprocessing.active_children():
+                process.terminate()
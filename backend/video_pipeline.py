@@ -0,0 +1,314 @@
+import os
+import asyncio
+import subprocess
+import time
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, ExitStack
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from imageio_ffmpeg import get_ffmpeg_exe
+from asset_cache import AssetCache
+from tts import TTSStage
+from ffmpeg_render import FFmpegRenderError, probe_duration, render_ffmpeg
+from video_delivery import FASTSTART_ARGS, PreviewSettings, preview_path_for, render_preview
+from logs import get_logger
+
+PEXELS_API_BASE = os.environ.get("PEXELS_API_BASE", "https://api.pexels.com")
+PEXELS_VIDEO_SEARCH_URL = f"{PEXELS_API_BASE}/videos/search"
+RENDER_ENGINES = ("ffmpeg", "moviepy")
+log = get_logger("video")
+
+# (path, already normalized to 1080x1920 @ 24fps)
+ClipSource = Tuple[Path, bool]
+
+
+class VideoGenerationError(Exception):
+    pass
+
+
+# --- STAGE TIMING ---
+class StageTimer:
+    # Stages overlap (TTS runs alongside search and downloads), so each stage
+    # reports its wall-clock span from first start to last finish. The summary
+    # ends up in the job record (failed jobs included), from which the API process
+    # feeds the video_stage_duration_seconds histogram; individual spans are logged at debug level.
+    def __init__(self, job_id: str = ""):
+        self.job_id = job_id
+        self._spans: Dict[str, List[float]] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def track(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            span = self._spans.setdefault(stage, [start, end])
+            span[0], span[1] = min(span[0], start), max(span[1], end)
+            log.debug("video.span", job_id=self.job_id, stage=stage, duration_ms=round((end - start) * 1000, 1))
+
+    def summary(self) -> Dict[str, float]:
+        timings = {stage: round(end - start, 3) for stage, (start, end) in self._spans.items()}
+        timings["total"] = round(time.perf_counter() - self._started, 3)
+        return timings
+
+
+# --- PIPELINE STEPS ---
+async def search_stock_videos(client: httpx.AsyncClient, cache: AssetCache, idea: str, api_key: str) -> List[dict]:
+    cached = await asyncio.to_thread(cache.get_search, idea)
+    if cached is not None:
+        log.info("video.search_cache_hit")
+        return cached
+    response = await client.get(PEXELS_VIDEO_SEARCH_URL, params={"query": idea, "per_page": 5, "page": 1},
+                                headers={"Authorization": api_key})
+    response.raise_for_status()
+    videos = response.json().get("videos", [])
+    if videos:
+        await asyncio.to_thread(cache.put_search, idea, videos)
+    return videos
+
+def pick_video_file(video: dict) -> Optional[dict]:
+    return next((vf for vf in sorted(video.get("video_files", []), key=lambda x: x.get("height") or 0, reverse=True) if vf.get("height") and 720 <= vf["height"] <= 1920), None)
+
+# moviepy (and numpy/imageio with it) is only imported by the moviepy engine, so workers
+# rendering with ffmpeg never load it.
+def preprocess_clip(path: str):
+    from moviepy.editor import VideoFileClip
+    clip = VideoFileClip(path).set_fps(24)
+    clip = clip.resize(height=1920)
+    return clip.crop(x_center=clip.w/2, width=1080)
+
+def normalize_clip(source_path: str, dest_path: str):
+    # Bake the 1080x1920 @ 24fps conversion into a file so repeat renders skip it.
+    # Same scale + centre crop as preprocess_clip, but done in one ffmpeg pass rather than frame by frame in Python.
+    command = [get_ffmpeg_exe(), "-y", "-loglevel", "error", "-i", source_path,
+               "-vf", "fps=24,scale=-2:1920,crop='min(iw,1080)':1920",
+               "-an", "-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p", dest_path]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise VideoGenerationError(f"ffmpeg normalization failed: {result.stderr.strip()[-500:]}")
+
+def select_clips(durations: Sequence[float], target: float) -> int:
+    # Keep Pexels' relevance order and stop once the narration is covered.
+    count, total = 0, 0.0
+    for duration in durations:
+        if total >= target:
+            break
+        count += 1
+        total += duration
+    return count
+
+async def download_file(client: httpx.AsyncClient, url: str, dest: str, buffer_size: int = 1024 * 1024):
+    # Disk writes happen in a worker thread, batched into ~1 MB so the thread hop stays cheap;
+    # the event loop only ever touches the network.
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        f = await asyncio.to_thread(open, dest, "wb")
+        try:
+            buffer = bytearray()
+            async for chunk in response.aiter_bytes():
+                buffer += chunk
+                if len(buffer) >= buffer_size:
+                    await asyncio.to_thread(f.write, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await asyncio.to_thread(f.write, bytes(buffer))
+        finally:
+            await asyncio.to_thread(f.close)
+
+
+# --- COMPOSITION ENGINES ---
+def compose_with_ffmpeg(sources: List[ClipSource], audio_path: Path, video_path: str, preset: str, threads: int):
+    audio_duration = probe_duration(audio_path)
+    log.info("video.audio_duration", seconds=round(audio_duration, 2))
+    usable, durations = [], []
+    for source in sources:
+        try:
+            durations.append(probe_duration(source[0]))
+            usable.append(source)
+        except FFmpegRenderError as e:
+            log.warning("video.clip_skipped", clip=source[0].name, error=str(e))
+    selected = usable[:select_clips(durations, audio_duration)]
+    if not selected:
+        raise VideoGenerationError("Failed to download or process any video clips.")
+    render_ffmpeg([path for path, _ in selected], audio_path, audio_duration, video_path, preset=preset,
+                  threads=threads, uniform=all(normalized for _, normalized in selected))
+
+def compose_with_moviepy(sources: List[ClipSource], audio_path: Path, video_path: str, preset: str, threads: int,
+                         pool: ThreadPoolExecutor):
+    from moviepy.editor import AudioFileClip, VideoFileClip, concatenate_videoclips
+
+    def open_clip(source: ClipSource):
+        path, normalized = source
+        try:
+            return VideoFileClip(str(path)) if normalized else preprocess_clip(str(path))
+        except Exception as e:
+            log.warning("video.clip_open_failed", clip=path.name, error=str(e))
+            return None
+
+    clips, audio_clip, final_video_clip = [], None, None
+    try:
+        clips = [clip for clip in pool.map(open_clip, sources) if clip is not None]
+        audio_clip = AudioFileClip(str(audio_path))
+        audio_duration = audio_clip.duration
+        log.info("video.audio_duration", seconds=round(audio_duration, 2))
+        final_clips = clips[:select_clips([clip.duration for clip in clips], audio_duration)]
+        if not final_clips:
+            raise VideoGenerationError("Failed to download or process any video clips.")
+        final_video_clip = concatenate_videoclips(final_clips).subclip(0, audio_duration)
+        final_video_clip = final_video_clip.set_audio(audio_clip)
+        final_video_clip.write_videofile(video_path, codec="libx264", audio_codec="aac", preset=preset,
+                                         threads=threads, ffmpeg_params=FASTSTART_ARGS, logger=None)
+    finally:
+        if audio_clip: audio_clip.close()
+        for clip in clips:
+            clip.close()
+        if final_video_clip: final_video_clip.close()
+
+
+# --- RENDER PIPELINE ---
+# Runs inside a worker process (see video_jobs), never on the API event loop.
+# `report(stage, progress)` is called as the render moves through its steps.
+async def render_video(job_id: str, script: str, idea: str, video_dir: str, cache: AssetCache,
+                       report: Callable[[str, float], None], tts_stage: Optional[TTSStage] = None,
+                       timer: Optional[StageTimer] = None) -> dict:
+    log.info("video.start", job_id=job_id)
+    os.makedirs(video_dir, exist_ok=True)
+
+    PEXELS_API_KEY = os.environ.get("PEXELS_API_KEY")
+    if not PEXELS_API_KEY:
+        raise VideoGenerationError("PEXELS_API_KEY not found in environment variables.")
+
+    tts_stage = tts_stage or TTSStage.from_env(cache)
+    video_path = os.path.join(video_dir, f"{job_id}_final.mp4")
+    download_concurrency = int(os.environ.get("VIDEO_DOWNLOAD_CONCURRENCY", 4))
+    timer = timer or StageTimer(job_id)  # pass one in to read the spans of a render that failed
+    loop = asyncio.get_running_loop()
+    normalize_assets = os.environ.get("ASSET_CACHE_NORMALIZE", "1").lower() not in ("0", "false", "no", "off")
+    preprocess_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("VIDEO_PREPROCESS_THREADS", 4)))
+    render_engine = os.environ.get("VIDEO_RENDER_ENGINE", "ffmpeg").lower()
+    if render_engine not in RENDER_ENGINES:
+        raise VideoGenerationError(f"Unknown VIDEO_RENDER_ENGINE '{render_engine}'. Choose one of: {', '.join(RENDER_ENGINES)}")
+    encoder_preset = os.environ.get("VIDEO_ENCODER_PRESET", "medium")
+    encoder_threads = int(os.environ.get("VIDEO_ENCODER_THREADS", 4))
+    preview = PreviewSettings.from_env()
+    leases = ExitStack()
+    temp_video_files = []
+    tts_task = None
+
+    async def timed_tts():
+        leases.enter_context(cache.lease(cache.path_for("tts", tts_stage.cache_name(script, "en", "default"))))
+        with timer.track("tts"):
+            return await tts_stage.synthesize(script, lang="en", voice="default")
+
+    try:
+        # Steps 1 + 2 overlap: TTS runs in a thread while we search and download.
+        report("tts", 0.05)
+        tts_task = asyncio.create_task(timed_tts())
+
+        semaphore = asyncio.Semaphore(download_concurrency)
+        done_count = 0
+
+        async def fetch_and_prepare(client: httpx.AsyncClient, video: dict):
+            nonlocal done_count
+            video_file = pick_video_file(video)
+            if not video_file:
+                return None
+            source_name = f"{video['id']}_{video_file['height']}.mp4"
+            normalized_name = f"{video['id']}_{video_file['height']}_1080x1920_24fps.mp4"
+            # Lease before looking, so a concurrent cleanup can't evict what we're about to use.
+            leases.enter_context(cache.lease(cache.path_for("files", source_name)))
+            leases.enter_context(cache.lease(cache.path_for("normalized", normalized_name)))
+            try:
+                normalized_path = cache.get_file("normalized", normalized_name)
+                if normalized_path is not None:
+                    log.info("video.clip_cache_hit", job_id=job_id, clip=video['id'], kind="normalized")
+                    return normalized_path, True
+
+                source_path = cache.get_file("files", source_name)
+                if source_path is None:
+                    tmp_path = cache.temp_path_for("files", source_name)
+                    temp_video_files.append(str(tmp_path))
+                    async with semaphore:
+                        with timer.track("download"):
+                            await download_file(client, video_file["link"], str(tmp_path))
+                    source_path = cache.commit_file(tmp_path, "files", source_name)
+                else:
+                    log.info("video.clip_cache_hit", job_id=job_id, clip=video['id'], kind="source")
+
+                if not normalize_assets:
+                    # Both engines can scale and crop the raw source themselves.
+                    return source_path, False
+                with timer.track("preprocess"):
+                    tmp_path = cache.temp_path_for("normalized", normalized_name)
+                    temp_video_files.append(str(tmp_path))
+                    await loop.run_in_executor(preprocess_pool, normalize_clip, str(source_path), str(tmp_path))
+                return cache.commit_file(tmp_path, "normalized", normalized_name), True
+            except Exception as e:
+                log.warning("video.clip_failed", job_id=job_id, clip=video['id'], error=str(e))
+                return None
+            finally:
+                done_count += 1
+                report("download", 0.2 + 0.4 * done_count / len(videos))
+
+        limits = httpx.Limits(max_connections=download_concurrency)
+        # Building the client loads the CA bundle from disk (~50 ms); keep that off the loop too.
+        client = await asyncio.to_thread(httpx.AsyncClient, limits=limits, timeout=60, follow_redirects=True)
+        async with client:
+            report("search", 0.1)
+            with timer.track("search"):
+                videos = await search_stock_videos(client, cache, idea, PEXELS_API_KEY)
+            if not videos:
+                raise VideoGenerationError(f"Could not find any stock videos for the idea: '{idea}'")
+            log.info("video.search_done", job_id=job_id, videos=len(videos))
+            report("download", 0.2)
+            prepared = await asyncio.gather(*(fetch_and_prepare(client, video) for video in videos))
+
+        sources = [source for source in prepared if source is not None]
+        if not sources:
+            raise VideoGenerationError("Failed to download or process any video clips.")
+        audio_path = await tts_task
+
+        report("encode", 0.65)
+        with timer.track("encode"):
+            if render_engine == "ffmpeg":
+                try:
+                    await asyncio.to_thread(compose_with_ffmpeg, sources, audio_path, video_path,
+                                            encoder_preset, encoder_threads)
+                except FFmpegRenderError as e:
+                    log.warning("video.ffmpeg_fallback", job_id=job_id, error=str(e))
+                    render_engine = "moviepy"
+            if render_engine == "moviepy":
+                await asyncio.to_thread(compose_with_moviepy, sources, audio_path, video_path,
+                                        encoder_preset, encoder_threads, preprocess_pool)
+
+        preview_path = None
+        if preview.enabled:
+            report("preview", 0.9)
+            with timer.track("preview"):
+                try:
+                    await asyncio.to_thread(render_preview, video_path, preview_path_for(video_path), preview,
+                                            encoder_threads)
+                    preview_path = preview_path_for(video_path)
+                except Exception as e:
+                    # The full-size video is done; a missing preview isn't worth failing the job.
+                    log.warning("video.preview_failed", job_id=job_id, error=str(e))
+
+        timings = timer.summary()
+        log.info("video.done", job_id=job_id, engine=render_engine, **timings)
+        return {"video_path": video_path, "preview_path": preview_path, "timings": timings}
+
+    finally:
+        if tts_task is not None:
+            # An early failure can leave TTS still writing its file; let it finish first.
+            await asyncio.gather(tts_task, return_exceptions=True)
+        preprocess_pool.shutdown(wait=False)
+        leases.close()
+
+        # Cached clips and audio stay on disk; only unfinished partial writes are removed.
+        for f in temp_video_files:
+            if f and os.path.exists(f):
+                try: os.remove(f)
+                except Exception as e: log.warning("video.cleanup_failed", path=f, error=str(e))
@@ -0,0 +1,82 @@
+import os
+import re
+from typing import Dict, Tuple
+
+# --- SCORING MODES ---
+# pipelined: each version is scored by the LLM as soon as it is generated, overlapping the
+#            remaining generations instead of a serial scoring call at the end (default).
+# heuristic: a local rule-based score (below). No LLM call, no added latency.
+# deferred:  /generate returns unscored versions; the client asks /score when it wants them.
+VIRALITY_MODES = ("pipelined", "heuristic", "deferred")
+
+
+def virality_mode_from_env() -> str:
+    mode = os.environ.get("VIRALITY_MODE", "pipelined").lower()
+    if mode not in VIRALITY_MODES:
+        raise ValueError(f"VIRALITY_MODE must be one of {VIRALITY_MODES}, got {mode!r}")
+    return mode
+
+
+# --- HEURISTIC SCORER ---
+# Cheap proxy for the LLM's opinion: length in the platform's sweet spot, a hook up front,
+# a call to action, and hashtag/emoji counts that are present but not spammy.
+# Per platform: (ideal chars), (ideal hashtags), (ideal emojis)
+PLATFORM_TARGETS: Dict[str, Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]] = {
+    "X": ((80, 280 * 4), (1, 2), (0, 3)),
+    "Instagram": ((150, 1500), (3, 10), (1, 6)),
+    "LinkedIn": ((400, 1800), (1, 5), (0, 3)),
+}
+DEFAULT_TARGETS = ((100, 1500), (1, 5), (0, 4))
+
+HOOK_WORDS = {"how", "why", "what", "stop", "secret", "secrets", "mistake", "mistakes", "truth", "never", "nobody",
+              "you", "your", "new", "free", "now", "finally", "proven", "surprising", "imagine", "here's", "this"}
+CALL_TO_ACTION = ("comment", "share", "follow", "tag ", "save this", "link in bio", "let me know", "what do you think",
+                  "dm ", "sign up", "join", "repost", "drop a")
+
+_HASHTAG = re.compile(r"#\w+")
+_EMOJI = re.compile("[\U0001F300-\U0001FAFF\U00002600-\U000027BF\U0001F1E6-\U0001F1FF]")
+_WORD = re.compile(r"[\w']+")
+
+
+def _in_range(value: int, bounds: Tuple[int, int]) -> bool:
+    return bounds[0] <= value <= bounds[1]
+
+
+def heuristic_score(text: str, platform: str) -> dict:
+    (chars_range, tags_range, emoji_range) = PLATFORM_TARGETS.get(platform, DEFAULT_TARGETS)
+    stripped = text.strip()
+    first_line = stripped.split("\n", 1)[0]
+    first_words = [w.lower() for w in _WORD.findall(first_line)[:12]]
+    hashtags = len(_HASHTAG.findall(stripped))
+    emojis = len(_EMOJI.findall(stripped))
+    lowered = stripped.lower()
+
+    score, strengths, weaknesses = 40, [], []
+    if _in_range(len(stripped), chars_range):
+        score += 15
+        strengths.append("good length")
+    else:
+        score -= 10
+        weaknesses.append("too short" if len(stripped) < chars_range[0] else "too long")
+    if "?" in first_line or any(w in HOOK_WORDS for w in first_words) or re.search(r"\d", first_line):
+        score += 20
+        strengths.append("strong hook")
+    else:
+        weaknesses.append("weak opening line")
+    if any(phrase in lowered for phrase in CALL_TO_ACTION) or stripped.rstrip().endswith("?"):
+        score += 10
+        strengths.append("clear call to action")
+    if _in_range(hashtags, tags_range):
+        score += 10
+    elif hashtags > tags_range[1]:
+        score -= 5 * min(hashtags - tags_range[1], 4)
+        weaknesses.append(f"{hashtags} hashtags is spammy")
+    if _in_range(emojis, emoji_range):
+        score += 5
+    elif emojis > emoji_range[1]:
+        score -= 5
+        weaknesses.append("emoji-heavy")
+
+    score = max(0, min(100, score))
+    summary = "; ".join(part for part in (", ".join(strengths), ", ".join(weaknesses)) if part)
+    return {"virality_score": score, "justification": f"{summary[:1].upper()}{summary[1:]} (heuristic)."}